@@ -16,6 +16,7 @@ from enum import Enum
 import hashlib
 import base64
 from faker import Faker
+from security_module import llm_gateway
 
 # Configuration MULTIVERS V11.0 OFFICIELLE
 MULTIVERS_CONFIG = {
@@ -401,9 +402,15 @@ class MultiverseNavigationSystem:
             return {"error": str(e)}
 
 class SanctuaryAIHuman:
-    """Sanctuaire IA-Humain V11.0 avec Interface Éthérée"""
+    """Sanctuaire IA-Humain V11.0 avec Interface Éthérée
+
+    Avec une passerelle LLM (security_llm.LLMGateway) configurée pour
+    "openai", la réponse textuelle du TRIO est générée par le modèle;
+    sinon (ou en cas d'indisponibilité) les réponses prédéfinies sont utilisées.
+    """
     
-    def __init__(self):
+    def __init__(self, llm_gateway=None):
+        self.llm_gateway = llm_gateway
         self.active_sessions = {}
         self.voice_patterns = {}
         self.cognitive_mirrors = {}
@@ -554,6 +561,16 @@ class SanctuaryAIHuman:
         }
         
         response = responses.get(language, responses["fr"])
+        if self.llm_gateway is not None and self.llm_gateway.has_provider("openai"):
+            try:
+                result = await self.llm_gateway.complete("openai", [
+                    {"role": "system", "content": f"RIMAREUM V11.0 Sanctuaire IA-Humain, écosystème "
+                                                  f"{session.ecosystem_id}. Répondez en langue '{language}'."},
+                    {"role": "user", "content": input_text}
+                ])
+                response = result["content"]
+            except Exception as e:
+                logging.warning(f"TRIO LLM indisponible, réponse prédéfinie: {e}")
         
         return {
             "text_response": response,
@@ -802,7 +819,7 @@ class DashboardCEOGlobalV11:
 
 # Instances globales V11.0
 multiverse_navigation = MultiverseNavigationSystem()
-sanctuary_ai_human = SanctuaryAIHuman()
+sanctuary_ai_human = SanctuaryAIHuman(llm_gateway)  # Passerelle LLM partagée (security_module)
 dashboard_ceo_global_v11 = DashboardCEOGlobalV11()
 
 # Base de données simulée V11.0
@@ -0,0 +1,192 @@
+"""
+🛍️ CATALOGUE PRODUITS RIMAREUM
+Clé primaire, index secondaires (catégorie, mise en avant, tags) et vues immuables
+"""
+
+import copy
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+# Champs indexés: nom -> index secondaire (valeur -> identifiants, dans l'ordre du catalogue)
+INDEXED_FIELDS = ("category", "is_featured", "tags")
+
+
+def dict_field(product: Dict[str, Any], name: str) -> Any:
+    return product.get(name)
+
+
+def attribute_field(product: Any, name: str) -> Any:
+    return getattr(product, name, None)
+
+
+def freeze(value: Any) -> Any:
+    """Copie en lecture seule: dict -> MappingProxyType, listes -> tuples, ensembles -> frozenset"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+
+class ProductCatalog:
+    """Catalogue indexé par identifiant avec index secondaires et vues instantanées.
+
+    Les produits sont des dict (API) ou des objets (`field_of=attribute_field`).
+    Une liste filtrée part du plus petit index concerné au lieu de parcourir
+    tout le catalogue; le résultat est un tuple mis en cache jusqu'à la
+    prochaine modification: les lectures répétées ne copient ni ne filtrent
+    rien. Les vues contiennent des instantanés des produits (`snapshot`, pris
+    une fois par écriture): lecture seule pour les dict (`freeze`), copie
+    profonde pour les objets. Modifier un élément de vue ne touche donc jamais
+    le catalogue; `get` renvoie le produit enregistré.
+    """
+
+    def __init__(self, products: Iterable[Any] = (), key: str = "id",
+                 field_of: Callable[[Any, str], Any] = dict_field, max_views: int = 1024,
+                 snapshot: Optional[Callable[[Any], Any]] = None):
+        self.key = key
+        self.field_of = field_of
+        self.max_views = max_views
+        self.snapshot = snapshot or (freeze if field_of is dict_field else copy.deepcopy)
+        self.by_id: Dict[str, Any] = {}
+        self.snapshots: Dict[str, Any] = {}  # Même ordre que by_id
+        self.indexes: Dict[str, Dict[Hashable, Dict[str, None]]] = {name: {} for name in INDEXED_FIELDS}
+        self.version = 0
+        self.view_hits = 0
+        self.view_misses = 0
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        self._views: Dict[Tuple, Tuple[Any, ...]] = {}
+        # Appelés avec (identifiant, produit) après ajout/modification, (identifiant, None) après retrait
+        self.listeners: List[Callable[[str, Optional[Any]], None]] = []
+        for product in products:
+            self._insert(product)
+
+    def _values(self, product: Any, name: str) -> Tuple[Hashable, ...]:
+        value = self.field_of(product, name)
+        if name == "tags":
+            return tuple(value or ())
+        return () if value is None else (value,)
+
+    def _insert(self, product: Any):
+        product_id = self.field_of(product, self.key)
+        if product_id in self.by_id:
+            self._unindex(self.by_id[product_id], product_id)
+        else:
+            self._sequence[product_id] = self._next_sequence
+            self._next_sequence += 1
+        self.by_id[product_id] = product
+        self.snapshots[product_id] = self.snapshot(product)
+        for name, index in self.indexes.items():
+            for value in self._values(product, name):
+                index.setdefault(value, {})[product_id] = None
+
+    def _unindex(self, product: Any, product_id: str):
+        for name, index in self.indexes.items():
+            for value in self._values(product, name):
+                postings = index.get(value)
+                if postings is not None:
+                    postings.pop(product_id, None)
+                    if not postings:
+                        del index[value]
+
+    def _changed(self, changes: Iterable[Tuple[str, Optional[Any]]] = ()):
+        self.version += 1
+        self._views.clear()
+        for product_id, product in changes:
+            for listener in self.listeners:
+                listener(product_id, product)
+
+    def upsert(self, product: Any):
+        """Ajouter ou remplacer un produit (réindexé, même rang dans le catalogue)"""
+        self._insert(product)
+        self._changed([(self.field_of(product, self.key), product)])
+
+    def replace_all(self, products: Iterable[Any]):
+        """Recharger tout le catalogue"""
+        removed = [(product_id, None) for product_id in self.by_id]
+        self.by_id.clear()
+        self.snapshots.clear()
+        self._sequence.clear()
+        for index in self.indexes.values():
+            index.clear()
+        for product in products:
+            self._insert(product)
+        self._changed(removed + list(self.by_id.items()))
+
+    def remove(self, product_id: str) -> Optional[Any]:
+        product = self.by_id.pop(product_id, None)
+        if product is not None:
+            self._unindex(product, product_id)
+            del self.snapshots[product_id]
+            del self._sequence[product_id]
+            self._changed([(product_id, None)])
+        return product
+
+    def reindex(self, product_id: str):
+        """À appeler après modification en place d'un produit (index et instantané)"""
+        product = self.by_id.get(product_id)
+        if product is not None:
+            self._unindex(product, product_id)
+            self.snapshots[product_id] = self.snapshot(product)
+            for name, index in self.indexes.items():
+                for value in self._values(product, name):
+                    index.setdefault(value, {})[product_id] = None
+            self._changed([(product_id, product)])
+
+    def get(self, product_id: str) -> Optional[Any]:
+        """Produit enregistré (modifiable: appeler `reindex` après modification en place)"""
+        return self.by_id.get(product_id)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self.by_id
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def view(self, category: Optional[str] = None, featured: Optional[bool] = None,
+             tag: Optional[str] = None) -> Tuple[Any, ...]:
+        """Instantanés des produits correspondant à tous les filtres donnés, dans l'ordre du catalogue"""
+        view_key = (category, featured, tag)
+        cached = self._views.get(view_key)
+        if cached is not None:
+            self.view_hits += 1
+            return cached
+        self.view_misses += 1
+
+        filters = [self.indexes[name].get(value, {})
+                   for name, value in (("category", category), ("is_featured", featured), ("tags", tag))
+                   if value is not None]
+        if not filters:
+            products = tuple(self.snapshots.values())
+        else:
+            filters.sort(key=len)
+            smallest, others = filters[0], filters[1:]
+            ids = [product_id for product_id in smallest if all(product_id in other for other in others)]
+            ids.sort(key=self._sequence.__getitem__)
+            products = tuple(self.snapshots[product_id] for product_id in ids)
+
+        if len(self._views) >= self.max_views:
+            self._views.clear()
+        self._views[view_key] = products
+        return products
+
+    def values(self, name: str) -> List[Hashable]:
+        """Valeurs distinctes d'un champ indexé (catégories, tags...)"""
+        return list(self.indexes[name])
+
+    def counts(self, name: str) -> Dict[Hashable, int]:
+        return {value: len(postings) for value, postings in self.indexes[name].items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.view_hits + self.view_misses
+        return {
+            "products": len(self.by_id),
+            "categories": len(self.indexes["category"]),
+            "tags": len(self.indexes["tags"]),
+            "version": self.version,
+            "cached_views": len(self._views),
+            "view_hit_rate": self.view_hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,385 @@
+"""
+🔎 RECHERCHE PRODUITS RIMAREUM
+Index inversé BM25: normalisation FR/EN/AR/ES (accents), préfixes, tolérance aux fautes,
+filtre de catégorie appliqué dans l'index, scores vectorisés (NumPy) et mises à jour incrémentales
+"""
+
+import bisect
+import math
+import re
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+from product_catalog import dict_field
+from security_chatbot import STOPWORDS
+
+_TOKEN = re.compile(r"\w+")
+# Marques combinantes après décomposition NFKD: accents latins, voyelles et hamza arabes
+_COMBINING = re.compile("[\u0300-\u036f\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ى": "ي", "ة": "ه"})
+
+# Poids des champs (BM25F simplifié: fréquences pondérées)
+SEARCH_FIELDS = {"name": 3.0, "tags": 2.0, "category": 1.0, "description": 1.0}
+
+# Correspondances approchées: contribution réduite par rapport au mot exact
+PREFIX_FACTOR = 0.8
+TYPO_FACTOR = 0.6
+# Termes du vocabulaire examinés pour un préfixe (les `max_expansions` plus fréquents sont retenus)
+PREFIX_SCAN = 256
+# Paliers de l'histogramme des scores servant à isoler les meilleurs résultats avant le tri
+SCORE_LEVELS = 1024
+
+
+def fold(text: str) -> str:
+    """Minuscules, accents et diacritiques arabes retirés, variantes d'alif/hamza unifiées"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return _COMBINING.sub("", text).translate(_LIGATURES)
+
+
+SEARCH_STOPWORDS = frozenset(fold(word) for word in STOPWORDS)
+
+
+def analyze(text: str) -> List[str]:
+    """Jetons normalisés d'un texte (mots vides retirés)"""
+    return [token for token in _TOKEN.findall(fold(text)) if token not in SEARCH_STOPWORDS]
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distance de Damerau-Levenshtein restreinte (transpositions adjacentes), arrêt au-delà de `limit`"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class ProductSearchIndex:
+    """Index inversé BM25 des produits, mis à jour produit par produit.
+
+    Les listes d'occurrences sont partitionnées par catégorie
+    (terme -> catégorie -> produit -> fréquence pondérée): un filtre de
+    catégorie ne lit que sa partition. Le dernier mot de la requête est aussi
+    cherché comme préfixe (saisie en cours); un mot absent du vocabulaire est
+    rapproché des termes à une faute près (deux à partir de 8 lettres) via un
+    index de suppressions. Pour chaque mot de la requête, un produit garde la
+    meilleure de ses correspondances (exacte, préfixe ou approchée).
+
+    Chaque produit occupe un emplacement dense (réutilisé après retrait):
+    les impacts BM25 d'un terme sont mis en cache sous forme de tableaux
+    (emplacements, impacts) et les scores de tous les produits sont cumulés
+    en une passe vectorisée par mot de la requête. Un ajout ou un retrait
+    n'invalide que les listes des termes du produit concerné. Le total est
+    toujours exact; à score égal, l'ordre d'insertion départage.
+    `on_change` se branche sur les écouteurs de ProductCatalog.
+
+    Limite connue: l'objectif p99 < 1 ms sur 100k produits n'est pas atteint.
+    Mesuré (bench "search", 1 CPU): p50 ~1 ms, p99 ~2,5 à 5 ms. Le report des
+    listes des termes très fréquents (dizaines de milliers d'emplacements) et
+    les mots à plusieurs expansions dominent; descendre sous la milliseconde
+    demanderait un élagage par blocs (bornes maximales par bloc, type
+    Block-Max WAND), que cet index ne fait pas.
+    """
+
+    def __init__(self, fields: Mapping[str, float] = SEARCH_FIELDS, key: str = "id",
+                 category_field: str = "category", field_of: Callable[[Any, str], Any] = dict_field,
+                 k1: float = 1.2, b: float = 0.75, max_expansions: int = 8,
+                 max_impact_lists: int = 4096):
+        self.fields = dict(fields)
+        self.key = key
+        self.category_field = category_field
+        self.field_of = field_of
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self.max_impact_lists = max_impact_lists
+        self.postings: Dict[str, Dict[Any, Dict[str, float]]] = {}
+        self.document_frequency: Dict[str, int] = {}
+        self.documents: Dict[str, Tuple[Any, Dict[str, float], float]] = {}  # id -> (catégorie, tf, longueur)
+        self.slots: Dict[str, int] = {}  # id -> emplacement dense
+        self.slot_ids: List[Optional[str]] = []  # emplacement -> id (None si libre)
+        self._free_slots: List[int] = []
+        self.total_length = 0.0
+        self.vocabulary: List[str] = []  # Trié, pour les préfixes
+        self.deletes: Dict[str, Set[str]] = {}  # Variante à une suppression -> termes
+        # (terme, catégorie) -> (normes, emplacements, fréquences, longueurs, impacts)
+        self._impact_cache: Dict[Tuple[str, Any], Tuple[Tuple[float, float], np.ndarray, np.ndarray,
+                                                        np.ndarray, np.ndarray]] = {}
+        self.sequences: Dict[str, int] = {}  # id -> rang d'insertion (départage à score égal)
+        self._slot_sequence = np.zeros(0, dtype=np.int64)  # emplacement -> rang d'insertion
+        self._next_sequence = 0
+        self.searches = 0
+
+    # --- Indexation ---
+
+    def _field_text(self, product: Any, name: str) -> str:
+        value = self.field_of(product, name)
+        if value is None:
+            return ""
+        if isinstance(value, (list, tuple, set)):
+            return " ".join(str(item) for item in value)
+        return str(value)
+
+    def add(self, product: Any):
+        """Indexer (ou réindexer) un produit"""
+        product_id = self.field_of(product, self.key)
+        sequence = self.sequences.get(product_id)  # Réindexé: garde son rang
+        self.remove(product_id)
+        if sequence is None:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for name, weight in self.fields.items():
+            for token in analyze(self._field_text(product, name)):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+        category = self.field_of(product, self.category_field)
+        self.documents[product_id] = (category, frequencies, length)
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self.slot_ids[slot] = product_id
+        else:
+            slot = len(self.slot_ids)
+            self.slot_ids.append(product_id)
+        self.slots[product_id] = slot
+        self.sequences[product_id] = sequence
+        if slot >= len(self._slot_sequence):
+            self._slot_sequence = np.resize(self._slot_sequence, max(16, 2 * len(self._slot_sequence)))
+        self._slot_sequence[slot] = sequence
+        self.total_length += length
+        self._invalidate(frequencies, category)
+        for term, frequency in frequencies.items():
+            partitions = self.postings.get(term)
+            if partitions is None:
+                partitions = self.postings[term] = {}
+                self._add_term(term)
+            partitions.setdefault(category, {})[product_id] = frequency
+            self.document_frequency[term] = self.document_frequency.get(term, 0) + 1
+
+    def remove(self, product_id: str):
+        document = self.documents.pop(product_id, None)
+        if document is None:
+            return
+        category, frequencies, length = document
+        self._invalidate(frequencies, category)
+        del self.sequences[product_id]
+        slot = self.slots.pop(product_id)
+        self.slot_ids[slot] = None
+        self._free_slots.append(slot)
+        self.total_length -= length
+        for term in frequencies:
+            partitions = self.postings[term]
+            partition = partitions[category]
+            del partition[product_id]
+            if not partition:
+                del partitions[category]
+            remaining = self.document_frequency[term] - 1
+            if remaining:
+                self.document_frequency[term] = remaining
+            else:
+                del self.document_frequency[term]
+                del self.postings[term]
+                self._remove_term(term)
+
+    def _invalidate(self, terms: Iterable[str], category: Any):
+        """Oublier les listes d'impacts des termes d'un produit ajouté ou retiré (sa partition et le total)"""
+        for term in terms:
+            self._impact_cache.pop((term, category), None)
+            self._impact_cache.pop((term, None), None)
+
+    def _add_term(self, term: str):
+        bisect.insort(self.vocabulary, term)
+        for variant in _deletes(term) | {term}:
+            self.deletes.setdefault(variant, set()).add(term)
+
+    def _remove_term(self, term: str):
+        position = bisect.bisect_left(self.vocabulary, term)
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            del self.vocabulary[position]
+        for variant in _deletes(term) | {term}:
+            terms = self.deletes.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.deletes[variant]
+
+    def on_change(self, product_id: str, product: Optional[Any]):
+        """Écouteur de ProductCatalog: produit ajouté/modifié, ou retiré (None)"""
+        if product is None:
+            self.remove(product_id)
+        else:
+            self.add(product)
+
+    def rebuild(self, products: Iterable[Any]):
+        self.postings.clear()
+        self.document_frequency.clear()
+        self.documents.clear()
+        self.slots.clear()
+        self.slot_ids.clear()
+        self._free_slots.clear()
+        self.vocabulary.clear()
+        self.deletes.clear()
+        self._impact_cache.clear()
+        self.sequences.clear()
+        self._next_sequence = 0
+        self.total_length = 0.0
+        for product in products:
+            self.add(product)
+
+    # --- Recherche ---
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        """Termes les plus fréquents parmi les premiers du vocabulaire qui commencent par `prefix`"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:start + PREFIX_SCAN]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        terms.sort(key=self.document_frequency.__getitem__, reverse=True)
+        return terms[:self.max_expansions]
+
+    def _typo_terms(self, token: str) -> List[str]:
+        limit = 2 if len(token) >= 8 else 1
+        variants = _deletes(token) | {token}
+        if limit == 2:
+            variants |= {variant for deleted in _deletes(token) for variant in _deletes(deleted)}
+        candidates = set()
+        for variant in variants:
+            candidates |= self.deletes.get(variant, set())
+        matches = [term for term in candidates if edit_distance(token, term, limit) <= limit]
+        matches.sort(key=lambda term: -self.document_frequency[term])
+        return matches[:self.max_expansions]
+
+    def expand(self, token: str, prefix: bool = False) -> Dict[str, float]:
+        """Termes de l'index retenus pour un mot de la requête, avec leur facteur"""
+        expansions: Dict[str, float] = {}
+        if token in self.document_frequency:
+            expansions[token] = 1.0
+        if prefix and len(token) >= 2:
+            for term in self._prefix_terms(token):
+                expansions.setdefault(term, PREFIX_FACTOR)
+        if not expansions and len(token) >= 4:
+            for term in self._typo_terms(token):
+                expansions[term] = TYPO_FACTOR
+        return expansions
+
+    def _idf(self, term: str) -> float:
+        frequency = self.document_frequency[term]
+        return math.log(1 + (len(self.documents) - frequency + 0.5) / (frequency + 0.5))
+
+    def _norms(self) -> Tuple[float, float]:
+        average = self.total_length / len(self.documents) if self.documents else 1.0
+        return self.k1 * (1 - self.b), self.k1 * self.b / (average or 1.0)
+
+    def _impacts(self, term: str, category: Optional[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """(emplacements, impacts BM25 hors IDF) d'un terme.
+
+        Les emplacements, fréquences et longueurs restent en cache tant qu'aucun
+        produit contenant le terme ne change; les impacts ne sont recalculés
+        (sans repasser par Python) que si la longueur moyenne a bougé entre-temps.
+        """
+        key = (term, category)
+        norms = self._norms()
+        cached = self._impact_cache.get(key)
+        if cached is not None:
+            cached_norms, slots, frequencies, lengths, impacts = cached
+            if cached_norms == norms:
+                return slots, impacts
+        else:
+            partitions = self.postings[term]
+            selected = partitions.values() if category is None else (partitions.get(category, {}),)
+            documents = self.documents
+            slots = np.fromiter((self.slots[product_id] for partition in selected for product_id in partition),
+                                dtype=np.intp)
+            frequencies = np.fromiter((frequency for partition in selected for frequency in partition.values()),
+                                      dtype=np.float64, count=len(slots))
+            lengths = np.fromiter((documents[product_id][2] for partition in selected for product_id in partition),
+                                  dtype=np.float64, count=len(slots))
+            order = np.argsort(slots)  # Emplacements croissants: report séquentiel dans le tableau des scores
+            slots, frequencies, lengths = slots[order], frequencies[order], lengths[order]
+            if len(self._impact_cache) >= self.max_impact_lists:
+                self._impact_cache.clear()
+        norm_base, norm_length = norms
+        impacts = (self.k1 + 1) * frequencies / (frequencies + norm_base + norm_length * lengths)
+        self._impact_cache[key] = (norms, slots, frequencies, lengths, impacts)
+        return slots, impacts
+
+    def search(self, query: str, category: Optional[Any] = None, offset: int = 0,
+               limit: int = 20) -> Dict[str, Any]:
+        """Produits classés par score BM25 (à score égal, dans l'ordre d'insertion).
+
+        Pour chaque mot de la requête, les contributions de ses termes
+        (IDF x impact x facteur) sont reportées sur le tableau des scores:
+        somme directe pour un terme unique, maximum par produit sinon. Seuls
+        les produits du palier des `offset + limit` meilleurs scores et
+        au-dessus sont ensuite triés.
+        """
+        self.searches += 1
+        tokens = analyze(query)
+        if not tokens or not self.documents:
+            return {"total": 0, "hits": [], "tokens": tokens}
+
+        unique_tokens = list(dict.fromkeys(tokens))
+        size = len(self.slot_ids)
+        scores = None
+        for position, token in enumerate(unique_tokens):
+            expansions = self.expand(token, prefix=position == len(unique_tokens) - 1)
+            if len(expansions) == 1:
+                term, factor = next(iter(expansions.items()))
+                slots, impacts = self._impacts(term, category)
+                if scores is None:
+                    scores = np.bincount(slots, impacts * (self._idf(term) * factor), minlength=size)
+                else:
+                    np.add.at(scores, slots, impacts * (self._idf(term) * factor))
+            elif expansions:
+                best = np.zeros(size)
+                for term, factor in expansions.items():
+                    slots, impacts = self._impacts(term, category)
+                    np.maximum.at(best, slots, impacts * (self._idf(term) * factor))
+                if scores is None:
+                    scores = best
+                else:
+                    scores += best
+        if scores is None:
+            return {"total": 0, "hits": [], "tokens": tokens}
+
+        matched = scores > 0
+        total = int(np.count_nonzero(matched))
+        wanted = offset + limit
+        if total > wanted:
+            # Histogramme des scores: le seuil est le palier qui contient le `wanted`-ième meilleur
+            levels = (scores * ((SCORE_LEVELS - 1) / scores.max())).astype(np.intp)
+            above = np.cumsum(np.bincount(levels, minlength=SCORE_LEVELS)[::-1])
+            level = SCORE_LEVELS - 1 - int(np.searchsorted(above, wanted))
+            candidates = np.flatnonzero((levels >= level) & matched)
+        else:
+            candidates = np.flatnonzero(matched)
+        ranked = candidates[np.lexsort((self._slot_sequence[candidates], -scores[candidates]))][offset:wanted]
+        return {"total": total,
+                "hits": [(self.slot_ids[slot], float(scores[slot])) for slot in ranked], "tokens": tokens}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "terms": len(self.postings),
+            "cached_impact_lists": len(self._impact_cache),
+            "typo_variants": len(self.deletes),
+            "searches": self.searches
+        }
@@ -0,0 +1,313 @@
+"""
+📜 JOURNAL D'AUDIT RIMAREUM - SENTINEL CORE
+File bornée, écriture par lots hors boucle asyncio, segments binaires rotatifs
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # Sérialiseur optionnel: repli sur json
+    orjson = None
+    import json
+
+# Format des segments: en-tête de fichier puis blocs (un bloc = un lot d'événements)
+SEGMENT_MAGIC = b"RAUDIT01"
+SEGMENT_SUFFIX = ".rlog"
+_BLOCK_HEADER = struct.Struct("<BIII")  # drapeaux, taille brute, taille stockée, crc32
+_RECORD_HEADER = struct.Struct("<I")
+_FLAG_ZLIB = 0x01
+
+# Politiques quand la file est pleine
+POLICY_DROP = "drop"  # Abandonner l'événement (compté)
+POLICY_WAIT = "wait"  # Attendre une place au plus `backpressure_timeout`
+
+# Sévérités qui attendent une place au lieu d'être abandonnées directement
+_CRITICAL_SEVERITIES = {"HIGH", "CRITICAL"}
+
+# Pas de sondage de la file pendant le remplissage d'un lot (secondes)
+_FILL_POLL_INTERVAL = 0.01
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def serialize_event(event: Dict[str, Any]) -> bytes:
+    """Sérialiser un événement (orjson si disponible)"""
+    if orjson is not None:
+        return orjson.dumps(event, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(event, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize_event(data: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_block(events: List[Dict[str, Any]], compress: bool, level: int = 1) -> bytes:
+    """Encoder un lot: enregistrements préfixés par leur taille, compressés ou non"""
+    records = bytearray()
+    for event in events:
+        payload = serialize_event(event)
+        records += _RECORD_HEADER.pack(len(payload))
+        records += payload
+
+    raw = bytes(records)
+    stored, flags = raw, 0
+    if compress:
+        stored, flags = zlib.compress(raw, level), _FLAG_ZLIB
+    return _BLOCK_HEADER.pack(flags, len(raw), len(stored), zlib.crc32(stored)) + stored
+
+
+def read_audit_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Relire les événements d'un segment (un bloc tronqué ou corrompu arrête la lecture)"""
+    with open(path, "rb") as segment:
+        if segment.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise ValueError(f"Segment d'audit invalide: {path}")
+
+        while True:
+            header = segment.read(_BLOCK_HEADER.size)
+            if len(header) < _BLOCK_HEADER.size:
+                return
+            flags, raw_size, stored_size, checksum = _BLOCK_HEADER.unpack(header)
+            stored = segment.read(stored_size)
+            if len(stored) < stored_size or zlib.crc32(stored) != checksum:
+                logging.error(f"Bloc d'audit corrompu dans {path}")
+                return
+
+            raw = zlib.decompress(stored) if flags & _FLAG_ZLIB else stored
+            offset = 0
+            while offset < raw_size:
+                (length,) = _RECORD_HEADER.unpack_from(raw, offset)
+                offset += _RECORD_HEADER.size
+                yield deserialize_event(raw[offset:offset + length])
+                offset += length
+
+
+def list_audit_segments(directory: str) -> List[str]:
+    """Segments du répertoire, du plus ancien au plus récent"""
+    return sorted(glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}")))
+
+
+class SegmentWriter:
+    """Écriture des blocs dans des segments rotatifs (taille et âge), appelée
+    uniquement depuis le thread d'écriture"""
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float, max_segments: int,
+                 fsync: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_segments = max_segments
+        self.fsync = fsync
+        self.rotations = 0
+        self._file = None
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._sequence = 0
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        self._path = os.path.join(
+            self.directory, f"audit-{stamp}-{os.getpid()}-{self._sequence:05d}{SEGMENT_SUFFIX}"
+        )
+        self._file = open(self._path, "ab")
+        self._file.write(SEGMENT_MAGIC)
+        self._size = len(SEGMENT_MAGIC)
+        self._opened_at = time.time()
+
+    def _rotate_if_needed(self, incoming: int):
+        if self._file is None:
+            self._open()
+            return
+        if self._size + incoming > self.max_bytes or time.time() - self._opened_at > self.max_age:
+            self.close()
+            self.rotations += 1
+            self._open()
+            self._prune()
+
+    def _prune(self):
+        """Ne conserver que les `max_segments` segments les plus récents"""
+        segments = list_audit_segments(self.directory)
+        for stale in segments[:-self.max_segments] if self.max_segments > 0 else []:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def write(self, block: bytes):
+        self._rotate_if_needed(len(block))
+        self._file.write(block)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += len(block)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def current_path(self) -> Optional[str]:
+        return self._path
+
+
+class AsyncAuditPipeline:
+    """Pipeline d'audit non bloquant.
+
+    `submit()` dépose l'événement dans une file bornée et rend la main;
+    une tâche de fond vide la file par lots (au plus `batch_size` événements
+    ou `flush_interval` secondes) et confie sérialisation, compression,
+    écriture et fsync à un thread dédié. File pleine: l'événement est
+    abandonné et compté, sauf pour les sévérités critiques qui attendent une
+    place au plus `backpressure_timeout` secondes (politique "wait": toutes).
+    Chaque lot écrit est ensuite transmis aux `sinks` (ex. magasin
+    d'événements interrogeable), dans le même thread.
+    """
+
+    def __init__(self, directory: str, queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_segment_age: float = 3600, max_segments: int = 48, compress: bool = True,
+                 policy: str = POLICY_DROP, backpressure_timeout: float = 0.005,
+                 fsync: bool = True,
+                 sinks: Optional[List[Callable[[List[Dict[str, Any]]], Any]]] = None):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.policy = policy
+        self.backpressure_timeout = backpressure_timeout
+        self.writer = SegmentWriter(directory, max_segment_bytes, max_segment_age,
+                                    max_segments, fsync=fsync)
+        self.sinks = list(sinks or [])
+        self.stats = {
+            "submitted": 0, "written": 0, "dropped": 0, "dropped_critical": 0,
+            "backpressure_waits": 0, "batches": 0, "bytes_written": 0, "write_errors": 0,
+            "sink_errors": 0,
+            "max_queue_depth": 0, "last_write_ms": 0.0
+        }
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rimareum-audit")
+
+    def _ensure_writer(self):
+        if self._writer_task is not None and not self._writer_task.done():
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._writer_task = asyncio.get_running_loop().create_task(self._writer_loop())
+
+    async def submit(self, event: Dict[str, Any]) -> bool:
+        """Déposer un événement; False s'il a été abandonné (file pleine)"""
+        self._ensure_writer()
+        self.stats["submitted"] += 1
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            critical = event.get("severity") in _CRITICAL_SEVERITIES
+            if self.policy == POLICY_WAIT or critical:
+                self.stats["backpressure_waits"] += 1
+                try:
+                    await asyncio.wait_for(self._queue.put(event), timeout=self.backpressure_timeout)
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+            self.stats["dropped"] += 1
+            if critical:
+                self.stats["dropped_critical"] += 1
+            return False
+
+        depth = self._queue.qsize()
+        if depth > self.stats["max_queue_depth"]:
+            self.stats["max_queue_depth"] = depth
+        return True
+
+    async def _writer_loop(self):
+        """Vider la file par lots et écrire hors de la boucle"""
+        loop = asyncio.get_running_loop()
+        # Attente par petits sommeils plutôt que wait_for(queue.get()): sous 3.11,
+        # wait_for peut absorber l'annulation et bloquer l'arrêt de la boucle
+        poll = min(_FILL_POLL_INTERVAL, self.flush_interval)
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, poll))
+
+            await self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        try:
+            written = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._encode_and_write, batch
+            )
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["bytes_written"] += written
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logging.error(f"Erreur écriture audit ({len(batch)} événements): {e}")
+        self.stats["last_write_ms"] = (time.perf_counter() - start) * 1000
+
+    def _encode_and_write(self, batch: List[Dict[str, Any]]) -> int:
+        block = encode_block(batch, self.compress)
+        self.writer.write(block)
+        for sink in self.sinks:
+            try:
+                sink(batch)
+            except Exception as e:
+                self.stats["sink_errors"] += 1
+                logging.error(f"Erreur transmission lot d'audit: {e}")
+        return len(block)
+
+    async def flush(self):
+        """Attendre l'écriture de tous les événements en file"""
+        if self._queue is not None and self._writer_task is not None and not self._writer_task.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.writer.close)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "segment_rotations": self.writer.rotations,
+            "current_segment": self.writer.current_path,
+            "serializer": "orjson" if orjson is not None else "json"
+        }
@@ -0,0 +1,250 @@
+"""
+💬 MOTEUR DE CORRESPONDANCE CHATBOT RIMAREUM - SENTINEL CORE
+Index inversé mots-clés -> FAQ/intentions, détecteur de langue compilé et classement par score,
+cache LRU des réponses conversationnelles
+"""
+
+import heapq
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+# Mots vides ignorés dans les questions de FAQ (ils ne suffisent pas à désigner une entrée)
+STOPWORDS = frozenset({
+    # fr
+    "le", "la", "les", "un", "une", "des", "de", "du", "d", "l", "qu", "que", "qui", "quoi", "est",
+    "ce", "c", "et", "ou", "à", "a", "au", "aux", "en", "pour", "comment", "je", "j", "vous", "mon",
+    # en
+    "the", "a", "an", "is", "are", "what", "how", "to", "of", "and", "or", "in", "on", "for", "i",
+    "my", "do", "does", "it",
+    # es
+    "el", "los", "las", "es", "qué", "cómo", "y", "o", "para", "por", "mi", "un", "una",
+    # ar
+    "ما", "هو", "هي", "كيف", "في", "من", "على",
+})
+
+Term = Tuple[str, ...]
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots en minuscules (Unicode: lettres arabes et accentuées comprises)"""
+    return _TOKEN.findall(text.lower())
+
+
+def question_terms(question: str) -> List[Term]:
+    """Termes indexés d'une question de FAQ: ses mots hors mots vides (tous si elle n'a que des mots vides)"""
+    tokens = tokenize(question)
+    return [(token,) for token in tokens if token not in STOPWORDS] or [(token,) for token in tokens]
+
+
+def keyword_terms(keywords: Iterable[str]) -> List[Term]:
+    """Termes d'une intention: chaque mot-clé (éventuellement composé, ex. "au revoir") est une expression"""
+    return [tuple(tokenize(keyword)) for keyword in keywords if tokenize(keyword)]
+
+
+class LanguageDetector:
+    """Une seule expression compilée pour toutes les langues (un groupe nommé par langue).
+
+    Un seul parcours du texte compte les marqueurs de chaque langue; les
+    marqueurs doivent être des mots entiers.
+    """
+
+    def __init__(self, patterns: Mapping[str, str], default: str = "fr"):
+        self.default = default
+        alternatives = "|".join(f"(?P<{language}>{pattern})" for language, pattern in patterns.items())
+        self.regex = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+    def scores(self, text: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for match in self.regex.finditer(text.lower()):
+            counts[match.lastgroup] = counts.get(match.lastgroup, 0) + 1
+        return counts
+
+    def detect(self, text: str) -> str:
+        counts = self.scores(text)
+        return max(counts, key=counts.get) if counts else self.default
+
+
+@dataclass
+class IndexEntry:
+    entry_id: str
+    terms: List[Term]
+    payload: Any
+    rank: int  # Priorité avant le score (plus petit d'abord)
+    order: int
+
+
+class KeywordIndex:
+    """Index inversé premier mot d'un terme -> entrées (FAQ, intentions).
+
+    La recherche ne parcourt que les listes des mots du message: son coût
+    dépend de la longueur du message, pas du nombre d'entrées. Le score d'une
+    entrée est la somme des IDF de ses termes présents dans le message. Le
+    classement suit d'abord `rank` (plus petit d'abord: FAQ avant intentions,
+    puis priorité des intentions), puis le score. `add` et `remove` mettent
+    l'index à jour de façon incrémentale.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, IndexEntry] = {}
+        self.postings: Dict[str, Dict[str, List[Term]]] = {}
+        self.document_frequency: Dict[Term, int] = {}
+        self.heads: Dict[str, Set[Term]] = {}  # Premier mot -> termes indexés qui commencent par lui
+        self._bounds: Dict[str, Tuple[int, float]] = {}  # Vidé à chaque modification (IDF changés)
+        self._order = 0
+
+    def add(self, entry_id: str, terms: Sequence[Term], payload: Any, rank: int = 0):
+        """Ajouter ou remplacer une entrée"""
+        self.remove(entry_id)
+        self._bounds.clear()
+        unique_terms = list(dict.fromkeys(term for term in terms if term))
+        self._order += 1
+        self.entries[entry_id] = IndexEntry(entry_id, unique_terms, payload, rank, self._order)
+        for term in unique_terms:
+            self.postings.setdefault(term[0], {}).setdefault(entry_id, []).append(term)
+            self.document_frequency[term] = self.document_frequency.get(term, 0) + 1
+            self.heads.setdefault(term[0], set()).add(term)
+
+    def remove(self, entry_id: str):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._bounds.clear()
+        for term in entry.terms:
+            postings = self.postings.get(term[0])
+            if postings is not None:
+                postings.pop(entry_id, None)
+                if not postings:
+                    del self.postings[term[0]]
+            remaining = self.document_frequency.get(term, 0) - 1
+            if remaining > 0:
+                self.document_frequency[term] = remaining
+            else:
+                self.document_frequency.pop(term, None)
+                heads = self.heads.get(term[0])
+                if heads is not None:
+                    heads.discard(term)
+                    if not heads:
+                        del self.heads[term[0]]
+
+    def _idf(self, term: Term) -> float:
+        return math.log(1 + len(self.entries) / self.document_frequency.get(term, 1))
+
+    def _bound(self, token: str) -> Tuple[int, float]:
+        """Meilleure entrée atteignable par un mot: plus petit rang de sa liste et plus forte
+        somme, pour une même entrée, des IDF de ses termes qui commencent par lui"""
+        bound = self._bounds.get(token)
+        if bound is None:
+            postings = self.postings[token]
+            bound = self._bounds[token] = (
+                min(self.entries[entry_id].rank for entry_id in postings),
+                max(sum(self._idf(term) for term in terms) for terms in postings.values())
+            )
+        return bound
+
+    def search(self, tokens: Sequence[str], limit: int = 5) -> List[Tuple[float, IndexEntry]]:
+        """Entrées candidates classées par rang puis par score décroissant.
+
+        Les mots sont traités par rang atteignable puis du plus discriminant au
+        plus courant. Dès que les `limit` meilleurs candidats battent tout ce
+        que les mots restants peuvent encore produire (rang plus petit, ou même
+        rang et score supérieur à la somme de leurs bornes), les listes de ces
+        mots ne servent plus qu'à compléter le score des candidats déjà trouvés.
+        """
+        positions: Dict[str, List[int]] = {}
+        for position, token in enumerate(tokens):
+            if token in self.heads:
+                positions.setdefault(token, []).append(position)
+        bounds = {token: self._bound(token) for token in positions}
+        visit = sorted(bounds, key=lambda token: (bounds[token][0], -bounds[token][1]))
+
+        scores: Dict[str, float] = {}
+        matched: Dict[str, Set[Term]] = {}
+        for step, token in enumerate(visit):
+            postings = self.postings[token]
+            prune = False
+            if len(scores) >= limit:
+                rank, negative_score = heapq.nsmallest(limit, ((self.entries[entry_id].rank, -score)
+                                                               for entry_id, score in scores.items()))[-1]
+                # Le plus petit rang encore atteignable est celui du mot courant (ordre de visite); à rang
+                # égal, une entrée non vue ne marque qu'avec les mots restants qui atteignent ce rang
+                prune = rank < bounds[token][0] or (rank == bounds[token][0] and -negative_score > sum(
+                    bounds[later][1] for later in visit[step:] if bounds[later][0] == rank
+                ))
+            if prune:
+                candidates = [(entry_id, postings[entry_id]) for entry_id in scores if entry_id in postings]
+            else:
+                candidates = postings.items()
+            for entry_id, terms in candidates:
+                for term in terms:
+                    if term in matched.get(entry_id, ()):
+                        continue
+                    if len(term) == 1 or any(tuple(tokens[position:position + len(term)]) == term
+                                             for position in positions[token]):
+                        matched.setdefault(entry_id, set()).add(term)
+                        scores[entry_id] = scores.get(entry_id, 0.0) + self._idf(term)
+
+        ranked = [(score, self.entries[entry_id]) for entry_id, score in scores.items()]
+        ranked.sort(key=lambda item: (item[1].rank, -item[0], item[1].order))
+        return ranked[:limit]
+
+    def best(self, tokens: Sequence[str]) -> Optional[IndexEntry]:
+        ranked = self.search(tokens, limit=1)
+        return ranked[0][1] if ranked else None
+
+
+class ResponseCache:
+    """Cache LRU des réponses conversationnelles, indexé par (langue, intention, signature du panier).
+
+    Les réponses ne dépendent que de ces éléments: une question répétée est
+    servie sans recalcul. Le demandeur ajoute ensuite les champs propres à
+    chaque requête (horodatage).
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Tuple, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_build(self, key: Tuple, build: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,446 @@
+"""
+🔐 REGISTRE DES IDENTIFIANTS RIMAREUM - SENTINEL CORE
+Clés API et sessions indexées par empreinte et par utilisateur, expiration par tas, persistance optionnelle
+"""
+
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Plateformes sans fcntl: fusion du fichier sans verrou
+    fcntl = None
+
+KIND_API_KEY = "api_key"
+KIND_SESSION = "session"
+
+
+def token_hash(token: str) -> str:
+    """Empreinte SHA256 d'un identifiant: seule forme conservée en mémoire et sur disque"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@dataclass
+class Credential:
+    key_hash: str
+    user_id: str
+    kind: str
+    created: float
+    expires: Optional[float]  # None: sans expiration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "kind": self.kind,
+            "created": self.created,
+            "expires": self.expires,
+            "active": True
+        }
+
+
+class CredentialRegistry:
+    """Clés API et sessions avec recherche O(1) par identifiant et par utilisateur.
+
+    Les identifiants ne sont conservés que sous forme d'empreinte. Un tas
+    (échéance, empreinte) et une seule tâche de fond suppriment par lot les
+    identifiants expirés, qu'ils soient encore utilisés ou non; une
+    révocation les retire immédiatement des index. La mémoire est bornée:
+    au plus `max_per_user` identifiants par utilisateur et par type (le plus
+    ancien est évincé) et `max_credentials` au total (le plus proche de son
+    échéance est évincé). Avec `persist_path`, les identifiants actifs sont
+    écrits périodiquement (fusion sous verrou entre workers) et rechargés au
+    démarrage. Entre deux écritures, le fichier est relu dès que sa signature
+    (mtime, inode, taille) change: les émissions des autres workers sont
+    ajoutées et leurs révocations retirées (listeners notifiés), au plus
+    `persist_interval` après leur écriture.
+    """
+
+    def __init__(self, persist_path: Optional[str] = None, max_credentials: int = 100000,
+                 max_per_user: int = 20, batch_size: int = 1000, persist_interval: float = 5.0,
+                 max_sleep: float = 60.0):
+        self.persist_path = persist_path
+        self.max_credentials = max_credentials
+        self.max_per_user = max_per_user
+        self.batch_size = batch_size
+        self.persist_interval = persist_interval
+        self.max_sleep = max_sleep
+        self.by_hash: Dict[str, Credential] = {}
+        self.by_user: Dict[str, Set[str]] = {}
+        self.stats = {"issued": 0, "revoked": 0, "expired": 0, "evicted": 0, "persisted": 0,
+                      "revoked_elsewhere": 0}
+        # Appelés avec l'empreinte de chaque identifiant retiré (révocation, expiration, éviction)
+        self.listeners: List[Callable[[str], None]] = []
+        self._heap: List[Tuple[float, str]] = []
+        self._removed: Set[str] = set()
+        # Empreintes présentes dans le fichier lors de la dernière lecture ou écriture
+        self._on_disk: Set[str] = set()
+        self._file_signature: Optional[Tuple[int, int, int]] = None
+        self._dirty = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._persist_task: Optional[asyncio.Task] = None
+
+        if persist_path:
+            self.load()
+
+    def issue(self, user_id: str, ttl: Optional[float], kind: str = KIND_API_KEY,
+              token: Optional[str] = None) -> str:
+        """Émettre (ou enregistrer) un identifiant; `ttl` None: sans expiration"""
+        token = token or secrets.token_urlsafe(32)
+        now = time.time()
+        self._add(Credential(token_hash(token), user_id, kind, now,
+                             now + ttl if ttl is not None else None))
+        self.stats["issued"] += 1
+        return token
+
+    def _add(self, credential: Credential):
+        self._enforce_limits(credential.user_id, credential.kind)
+        self.by_hash[credential.key_hash] = credential
+        self.by_user.setdefault(credential.user_id, set()).add(credential.key_hash)
+        self._removed.discard(credential.key_hash)
+        self._dirty = True
+        if credential.expires is not None:
+            heapq.heappush(self._heap, (credential.expires, credential.key_hash))
+            if len(self._heap) > 2 * len(self.by_hash) + 1024:
+                self._heap = [(entry.expires, key_hash) for key_hash, entry in self.by_hash.items()
+                              if entry.expires is not None]
+                heapq.heapify(self._heap)
+            self._ensure_tasks()
+            if self._heap[0][1] == credential.key_hash and self._wakeup is not None:
+                self._wakeup.set()
+
+    def _enforce_limits(self, user_id: str, kind: str):
+        owned = [self.by_hash[key_hash] for key_hash in self.by_user.get(user_id, ())
+                 if self.by_hash[key_hash].kind == kind]
+        if len(owned) >= self.max_per_user:
+            oldest = min(owned, key=lambda entry: entry.created)
+            self._remove(oldest.key_hash)
+            self.stats["evicted"] += 1
+
+        if len(self.by_hash) >= self.max_credentials:
+            self.expire_due()
+        while len(self.by_hash) >= self.max_credentials and self._heap:
+            _, key_hash = heapq.heappop(self._heap)
+            if self._remove(key_hash):
+                self.stats["evicted"] += 1
+
+    def _remove(self, key_hash: str) -> Optional[Credential]:
+        credential = self.by_hash.pop(key_hash, None)
+        if credential is None:
+            return None
+        owned = self.by_user.get(credential.user_id)
+        if owned is not None:
+            owned.discard(key_hash)
+            if not owned:
+                del self.by_user[credential.user_id]
+        self._removed.add(key_hash)
+        self._dirty = True
+        for listener in self.listeners:
+            try:
+                listener(key_hash)
+            except Exception as e:
+                logging.error(f"Erreur notification retrait d'identifiant: {e}")
+        return credential
+
+    def validate(self, token: str, now: Optional[float] = None) -> Optional[Credential]:
+        """Identifiant actif correspondant au jeton (O(1)), None sinon"""
+        if self.persist_path:
+            self._ensure_tasks()  # Relecture périodique, même sans émission locale
+        credential = self.by_hash.get(token_hash(token))
+        if credential is None:
+            return None
+        if credential.expires is not None and credential.expires <= (time.time() if now is None else now):
+            return None  # Supprimé au prochain balayage
+        return credential
+
+    def revoke(self, token: str) -> bool:
+        """Révoquer un identifiant (retiré immédiatement des index)"""
+        return self.revoke_hash(token_hash(token))
+
+    def revoke_hash(self, key_hash: str) -> bool:
+        if self._remove(key_hash) is None:
+            return False
+        self.stats["revoked"] += 1
+        return True
+
+    def revoke_user(self, user_id: str, kind: Optional[str] = None) -> int:
+        """Révoquer tous les identifiants d'un utilisateur (d'un type donné si précisé)"""
+        revoked = 0
+        for key_hash in list(self.by_user.get(user_id, ())):
+            if kind is None or self.by_hash[key_hash].kind == kind:
+                revoked += self.revoke_hash(key_hash)
+        return revoked
+
+    def credentials_for(self, user_id: str) -> List[Credential]:
+        return [self.by_hash[key_hash] for key_hash in self.by_user.get(user_id, ())]
+
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """Supprimer par lot les identifiants arrivés à échéance"""
+        now = time.time() if now is None else now
+        expired = 0
+        while self._heap and self._heap[0][0] <= now and expired < self.batch_size:
+            expires, key_hash = heapq.heappop(self._heap)
+            credential = self.by_hash.get(key_hash)
+            if credential is None or credential.expires != expires:
+                continue  # Entrée périmée (révocation ou éviction)
+            self._remove(key_hash)
+            expired += 1
+
+        self.stats["expired"] += expired
+        return expired
+
+    def _ensure_tasks(self):
+        """Démarrer les tâches de fond dès qu'une boucle asyncio tourne"""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._sweep_loop())
+        if self.persist_path:
+            self._persist_task = loop.create_task(self._persist_loop())
+
+    async def _sweep_loop(self):
+        """Tâche unique: dormir jusqu'à la prochaine échéance puis balayer par lot"""
+        while True:
+            try:
+                delay = self.max_sleep
+                if self._heap:
+                    delay = min(max(self._heap[0][0] - time.time(), 0.0), self.max_sleep)
+                # Comme BlockExpiryScheduler: asyncio.wait ne perd pas une annulation
+                # concomitante au réveil (wait_for, Python 3.11)
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=delay)
+                finally:
+                    waiter.cancel()
+                self._wakeup.clear()
+
+                while self.expire_due() >= self.batch_size:
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur balayage des identifiants: {e}")
+                await asyncio.sleep(1)
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                if self._dirty:
+                    await self.persist()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur relecture des identifiants: {e}")
+
+    async def persist(self):
+        """Persister les identifiants actifs sans bloquer la boucle asyncio"""
+        self._dirty = False
+        active, removed = [asdict(entry) for entry in self.by_hash.values()], self._removed
+        self._removed = set()
+        try:
+            merged, signature = await asyncio.get_running_loop().run_in_executor(
+                None, self._write_snapshot, active, removed, set(self._on_disk)
+            )
+            self.stats["persisted"] += 1
+        except Exception as e:
+            self._dirty = True
+            self._removed |= removed
+            logging.error(f"Erreur persistance des identifiants: {e}")
+            return
+        self._reconcile(merged, signature)
+
+    async def refresh(self) -> int:
+        """Relire le fichier s'il a changé (écrit par un autre worker); nombre de changements"""
+        if self._signature() == self._file_signature:
+            return 0
+        entries, signature = await asyncio.get_running_loop().run_in_executor(None, self._read_locked)
+        return self._reconcile(entries, signature)
+
+    def _reconcile(self, entries: List[Dict[str, Any]], signature: Optional[Tuple[int, int, int]]) -> int:
+        """Aligner la mémoire sur le fichier: ajouts et retraits faits par les autres workers"""
+        now = time.time()
+        on_disk = {}
+        for entry in entries:
+            try:
+                credential = Credential(**entry)
+            except TypeError:
+                continue
+            if credential.expires is None or credential.expires > now:
+                on_disk[credential.key_hash] = credential
+
+        dirty = self._dirty
+        changes = 0
+        # Présent au dernier passage, absent maintenant: révoqué (ou expiré) ailleurs
+        for key_hash in self._on_disk - on_disk.keys():
+            credential = self._remove(key_hash)
+            if credential is not None:
+                self._removed.discard(key_hash)  # Déjà absent du fichier
+                if credential.expires is None or credential.expires > now:
+                    self.stats["revoked_elsewhere"] += 1
+                changes += 1
+        for key_hash, credential in on_disk.items():
+            if key_hash not in self.by_hash and key_hash not in self._removed:
+                self._add(credential)
+                changes += 1
+        self._dirty = dirty  # Rien de nouveau à écrire
+        self._on_disk = set(on_disk)
+        self._file_signature = signature
+        return changes
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.persist_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def _lock(self, exclusive: bool) -> int:
+        lock_fd = os.open(self.persist_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_fd
+
+    def _read_locked(self) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int, int]]]:
+        """Lire le fichier et sa signature sous verrou partagé (pas d'écriture concurrente)"""
+        lock_fd = self._lock(exclusive=False)
+        try:
+            return self._read_snapshot(), self._signature()
+        finally:
+            os.close(lock_fd)
+
+    def _write_snapshot(self, active: List[Dict[str, Any]], removed: Set[str], known: Set[str]):
+        """Fusionner avec le fichier existant (autres workers) et écrire atomiquement.
+
+        Une entrée déjà lue dans le fichier (`known`) qui n'y figure plus a été
+        révoquée par un autre worker: elle n'est pas réécrite.
+        """
+        lock_fd = self._lock(exclusive=True)
+        try:
+            now = time.time()
+            current = self._read_snapshot()
+            on_disk = {entry["key_hash"] for entry in current}
+            merged = {
+                entry["key_hash"]: entry for entry in current
+                if entry["key_hash"] not in removed and (entry["expires"] is None or entry["expires"] > now)
+            }
+            merged.update((entry["key_hash"], entry) for entry in active
+                          if entry["key_hash"] not in known or entry["key_hash"] in on_disk)
+
+            temporary_path = f"{self.persist_path}.{os.getpid()}.tmp"
+            fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(list(merged.values()), f)
+            os.replace(temporary_path, self.persist_path)
+            return list(merged.values()), self._signature()
+        finally:
+            os.close(lock_fd)
+
+    def _read_snapshot(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.persist_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logging.error(f"Fichier d'identifiants illisible {self.persist_path}: {e}")
+            return []
+
+    def load(self) -> int:
+        """Recharger les identifiants persistés encore valides"""
+        return self._reconcile(*self._read_locked())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self.by_hash),
+            "users": len(self.by_user),
+            "heap_size": len(self._heap),
+            **self.stats
+        }
+
+
+class VerifiedTokenCache:
+    """Cache LRU à TTL court des identifiants déjà vérifiés, indexé par empreinte.
+
+    Un client qui répète ses requêtes ne paie plus qu'un hachage et un accès
+    dictionnaire. Seules les vérifications réussies sont mises en cache (un
+    jeton émis juste après un échec reste valide). Une entrée n'est jamais
+    servie au-delà de l'échéance de l'identifiant; `invalidate` (branché sur
+    les retraits du registre) la supprime immédiatement à la révocation. Entre
+    workers, une révocation faite ailleurs est appliquée quand le registre
+    relit le fichier persisté (voir CredentialRegistry): au plus environ
+    deux `persist_interval` après la révocation, indépendamment de `ttl`.
+    """
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key_hash: str, now: Optional[float] = None) -> Optional[Any]:
+        entry = self._entries.get(key_hash)
+        if entry is not None:
+            if entry[0] > (time.time() if now is None else now):
+                self._entries.move_to_end(key_hash)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key_hash]
+        self.misses += 1
+        return None
+
+    def put(self, key_hash: str, value: Any, expires: Optional[float] = None,
+            now: Optional[float] = None):
+        """Mettre en cache jusqu'à min(now + ttl, échéance de l'identifiant)"""
+        until = (time.time() if now is None else now) + self.ttl
+        if expires is not None:
+            until = min(until, expires)
+        self._entries[key_hash] = (until, value)
+        self._entries.move_to_end(key_hash)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key_hash: str):
+        if self._entries.pop(key_hash, None) is not None:
+            self.invalidations += 1
+
+    def verify(self, token: str, verifier: Callable[[str], Optional[Any]],
+               expires_of: Callable[[Any], Optional[float]] = lambda value: None) -> Optional[Any]:
+        """Résultat en cache ou `verifier(token)` (mis en cache s'il réussit)"""
+        key_hash = token_hash(token)
+        value = self.get(key_hash)
+        if value is None:
+            value = verifier(token)
+            if value is not None:
+                self.put(key_hash, value, expires_of(value))
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,509 @@
+"""
+🗄️ MAGASIN D'ÉVÉNEMENTS RIMAREUM - SENTINEL CORE
+Événements de sécurité interrogeables (SQLite/WAL indexé + agrégats pré-calculés)
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Granularité des agrégats pré-calculés (secondes): une fenêtre ne lit dans la
+# table brute que ses deux bords partiels, soit au plus 2 x BUCKET_SECONDS d'événements
+BUCKET_SECONDS = 300
+HOUR_SECONDS = 3600
+
+# Champs stockés en colonnes; le reste de l'événement part dans `details` (JSON)
+_COLUMNS = ("event_id", "ts", "ip", "user_agent", "path", "method",
+            "threat_type", "severity", "blocked", "risk_score")
+_MAPPED_KEYS = {"id", "event_id", "timestamp", "ip", "ip_address", "user_agent", "path",
+                "request_path", "method", "threat_type", "type", "severity", "blocked",
+                "risk_score", "ml_score", "details"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    event_id TEXT,
+    ts REAL NOT NULL,
+    ip TEXT,
+    user_agent TEXT,
+    path TEXT,
+    method TEXT,
+    threat_type TEXT,
+    severity TEXT,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    risk_score REAL,
+    details TEXT
+);
+-- Index couvrants: les bords de fenêtre s'agrègent sans lire la table
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts, threat_type, severity, blocked, ip);
+CREATE INDEX IF NOT EXISTS events_ip_ts ON events (ip, ts, blocked);
+CREATE INDEX IF NOT EXISTS events_threat_ts ON events (threat_type, ts);
+CREATE INDEX IF NOT EXISTS events_severity_ts ON events (severity, ts);
+CREATE TABLE IF NOT EXISTS threat_rollup (
+    bucket INTEGER NOT NULL,
+    threat_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    PRIMARY KEY (bucket, threat_type, severity)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ip_rollup (
+    bucket INTEGER NOT NULL,
+    ip TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    PRIMARY KEY (bucket, ip)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ip_rollup_ip ON ip_rollup (ip, bucket);
+"""
+
+_PERIOD_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$")
+_PERIOD_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_period(period: str, default: float = 86400) -> float:
+    """Convertir une période ("15m", "24h", "7d") en secondes"""
+    match = _PERIOD_RE.match(period or "")
+    if not match:
+        return default
+    return float(match.group(1)) * _PERIOD_UNITS[match.group(2)]
+
+
+# Horodatages acceptés: de l'epoch à la fin de l'an 9999 (limite de datetime)
+MAX_TIMESTAMP = 253402300799.0
+
+
+def timestamp_in_range(ts: Optional[float]) -> bool:
+    """Horodatage fini et représentable en datetime (sinon rejeté)"""
+    return ts is not None and math.isfinite(ts) and 0 <= ts <= MAX_TIMESTAMP
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Horodatage epoch (secondes) depuis un epoch, un datetime ou une date ISO 8601.
+
+    Les dates sans fuseau sont interprétées en UTC (datetime.utcnow() partout ailleurs).
+    Les valeurs invalides, non finies (nan, inf) ou hors de [0, MAX_TIMESTAMP]
+    renvoient None.
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            ts = float(value)
+        except OverflowError:
+            return None
+        return ts if timestamp_in_range(ts) else None
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        text = str(value).strip()
+        try:
+            ts = float(text)
+        except ValueError:
+            pass
+        else:
+            return ts if timestamp_in_range(ts) else None
+        try:
+            moment = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    ts = moment.timestamp()
+    return ts if timestamp_in_range(ts) else None
+
+
+def _isoformat(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).isoformat()
+
+
+def _finite_float(value: Any) -> Optional[float]:
+    """Nombre fini ou None (nan, inf et entiers démesurés ne sont pas stockés)"""
+    if not isinstance(value, (int, float)):
+        return None
+    try:
+        number = float(value)
+    except OverflowError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _text(value: Any) -> Optional[str]:
+    """Colonne texte: les valeurs non textuelles d'un signalement sont converties"""
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def normalize_event(event: Dict[str, Any]) -> Tuple:
+    """Ligne `events` depuis un événement (journal d'audit ou signalement API)"""
+    details = event.get("details")
+    risk_score = event.get("risk_score", event.get("ml_score"))
+    if risk_score is None and isinstance(details, dict):
+        risk_score = details.get("risk_score")
+    extras = {key: value for key, value in event.items() if key not in _MAPPED_KEYS}
+    if isinstance(details, dict):
+        extras.update(details)
+    elif details is not None:
+        extras["details"] = details
+    ts = parse_timestamp(event.get("timestamp"))
+    return (
+        _text(event.get("id") or event.get("event_id")),
+        ts if ts is not None else time.time(),
+        _text(event.get("ip") or event.get("ip_address")),
+        _text(event.get("user_agent")),
+        _text(event.get("path") or event.get("request_path")),
+        _text(event.get("method")),
+        _text(event.get("threat_type") or event.get("type") or "UNKNOWN"),
+        str(event.get("severity") or "LOW").upper(),
+        1 if event.get("blocked") else 0,
+        _finite_float(risk_score),
+        json.dumps(extras, default=str, separators=(",", ":")) if extras else None,
+    )
+
+
+class SecurityEventStore:
+    """Magasin d'événements de sécurité embarqué.
+
+    Les événements sont écrits par lots dans une base SQLite en mode WAL
+    (lecteurs jamais bloqués par l'écrivain, partage possible entre
+    processus), indexée sur l'horodatage, l'IP, le type de menace et la
+    sévérité. Chaque lot met aussi à jour des agrégats par tranche de
+    BUCKET_SECONDS (par type et sévérité, par IP): une agrégation sur une
+    fenêtre lit les tranches complètes dans les agrégats et seulement les
+    bords partiels dans la table brute, d'où un coût indépendant du nombre
+    d'événements.
+
+    Une seule connexion d'écriture (thread dédié); les lectures utilisent
+    une connexion par thread. Les variantes `async` exécutent ces appels
+    hors de la boucle asyncio.
+    """
+
+    def __init__(self, path: str, retention_days: float = 30, read_workers: int = 2):
+        self.path = path
+        self.retention = retention_days * 86400
+        self.stats = {"inserted": 0, "batches": 0, "pruned": 0, "write_errors": 0,
+                      "last_insert_ms": 0.0}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._last_prune = 0.0
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rimareum-events-w")
+        self._read_executor = ThreadPoolExecutor(max_workers=read_workers,
+                                                 thread_name_prefix="rimareum-events-r")
+
+    # --- Connexions ---
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        connection.execute("PRAGMA mmap_size=268435456")
+        return connection
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect()
+            self._writer.executescript(_SCHEMA)
+        return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            with self._write_lock:
+                self._writer_connection()  # Garantit l'existence du schéma
+            connection = self._connect()
+            connection.execute("PRAGMA query_only=ON")
+            self._local.connection = connection
+        return connection
+
+    # --- Écriture ---
+
+    def insert_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Insérer un lot d'événements et mettre à jour les agrégats (une transaction)"""
+        rows = [normalize_event(event) for event in events]
+        if not rows:
+            return 0
+
+        threats: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+        ips: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+        for row in rows:
+            bucket = int(row[1] // BUCKET_SECONDS)
+            counters = threats[(bucket, row[6], row[7])]
+            counters[0] += 1
+            counters[1] += row[8]
+            if row[2]:
+                counters = ips[(bucket, row[2])]
+                counters[0] += 1
+                counters[1] += row[8]
+
+        start = time.perf_counter()
+        with self._write_lock:
+            connection = self._writer_connection()
+            try:
+                with connection:
+                    connection.executemany(
+                        f"INSERT INTO events ({', '.join(_COLUMNS)}, details) "
+                        f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})", rows
+                    )
+                    connection.executemany(
+                        "INSERT INTO threat_rollup VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (bucket, threat_type, severity) DO UPDATE SET "
+                        "count = count + excluded.count, blocked = blocked + excluded.blocked",
+                        [(*key, *counters) for key, counters in threats.items()]
+                    )
+                    connection.executemany(
+                        "INSERT INTO ip_rollup VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (bucket, ip) DO UPDATE SET "
+                        "count = count + excluded.count, blocked = blocked + excluded.blocked",
+                        [(*key, *counters) for key, counters in ips.items()]
+                    )
+            except sqlite3.Error as e:
+                self.stats["write_errors"] += 1
+                logging.error(f"Erreur écriture événements ({len(rows)}): {e}")
+                return 0
+
+            self.stats["inserted"] += len(rows)
+            self.stats["batches"] += 1
+            self.stats["last_insert_ms"] = (time.perf_counter() - start) * 1000
+            if self.retention > 0 and time.time() - self._last_prune > HOUR_SECONDS:
+                self._prune(time.time() - self.retention)
+        return len(rows)
+
+    def _prune(self, before: float):
+        """Supprimer les événements et agrégats antérieurs à `before` (verrou d'écriture tenu)"""
+        self._last_prune = time.time()
+        bucket = int(before // BUCKET_SECONDS)
+        try:
+            with self._writer:
+                cursor = self._writer.execute("DELETE FROM events WHERE ts < ?", (bucket * BUCKET_SECONDS,))
+                self._writer.execute("DELETE FROM threat_rollup WHERE bucket < ?", (bucket,))
+                self._writer.execute("DELETE FROM ip_rollup WHERE bucket < ?", (bucket,))
+            self.stats["pruned"] += cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Erreur purge événements: {e}")
+
+    # --- Lecture ---
+
+    @staticmethod
+    def _window(since: Optional[float], until: Optional[float]) -> Tuple[float, float, int, int]:
+        """Fenêtre [since, until) et plage de tranches entièrement couverte [first, last)"""
+        until = time.time() + 1 if until is None else until
+        since = 0.0 if since is None else since
+        first = math.ceil(since / BUCKET_SECONDS)
+        last = max(first, math.floor(until / BUCKET_SECONDS))
+        return since, until, first, last
+
+    @staticmethod
+    def _edges(since: float, until: float, first: int, last: int) -> List[Tuple[float, float]]:
+        """Bords partiels de la fenêtre, lus dans la table brute"""
+        if first == last:
+            return [(since, until)]
+        return [(since, first * BUCKET_SECONDS), (last * BUCKET_SECONDS, until)]
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              ip: Optional[str] = None, threat_type: Optional[str] = None,
+              severity: Optional[str] = None, blocked: Optional[bool] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """Événements les plus récents correspondant aux filtres"""
+        clauses, params = [], []
+        for column, value in (("ip", ip), ("threat_type", threat_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if severity is not None:
+            clauses.append("severity = ?")
+            params.append(severity.upper())
+        if blocked is not None:
+            clauses.append("blocked = ?")
+            params.append(1 if blocked else 0)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self._reader().execute(
+            f"SELECT {', '.join(_COLUMNS)}, details FROM events {where} "
+            f"ORDER BY ts DESC LIMIT ?", (*params, limit)
+        )
+        events = []
+        for row in cursor:
+            event = dict(zip(_COLUMNS, row))
+            event["timestamp"] = _isoformat(event.pop("ts"))
+            event["blocked"] = bool(event["blocked"])
+            event["details"] = json.loads(row[-1]) if row[-1] else {}
+            events.append(event)
+        return events
+
+    def count(self, since: Optional[float] = None, until: Optional[float] = None,
+              ip: Optional[str] = None) -> Dict[str, int]:
+        """Nombre d'événements (et de blocages) sur la fenêtre"""
+        since, until, first, last = self._window(since, until)
+        connection = self._reader()
+        total = blocked = 0
+
+        rollup, raw = "threat_rollup WHERE", "events WHERE"
+        params: List[Any] = []
+        if ip is not None:
+            rollup, raw = "ip_rollup WHERE ip = ? AND", "events WHERE ip = ? AND"
+            params = [ip]
+
+        if first < last:
+            row = connection.execute(
+                f"SELECT COALESCE(SUM(count), 0), COALESCE(SUM(blocked), 0) FROM {rollup} "
+                f"bucket >= ? AND bucket < ?", (*params, first, last)
+            ).fetchone()
+            total, blocked = row
+        for start, end in self._edges(since, until, first, last):
+            row = connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(blocked), 0) FROM {raw} ts >= ? AND ts < ?",
+                (*params, start, end)
+            ).fetchone()
+            total += row[0]
+            blocked += row[1]
+        return {"total": total, "blocked": blocked}
+
+    def _union(self, rollup_sql: str, raw_sql: str, since: float, until: float,
+               first: int, last: int) -> Tuple[str, List]:
+        """Sous-requête UNION ALL: agrégats pour les tranches complètes, table brute pour les bords"""
+        parts, params = [], []
+        if first < last:
+            parts.append(rollup_sql)
+            params += [first, last]
+        for start, end in self._edges(since, until, first, last):
+            parts.append(raw_sql)
+            params += [start, end]
+        return " UNION ALL ".join(parts), params
+
+    def top_offenders(self, since: Optional[float] = None, until: Optional[float] = None,
+                      limit: int = 10) -> List[Dict[str, Any]]:
+        """IPs à l'origine du plus grand nombre d'événements sur la fenêtre"""
+        since, until, first, last = self._window(since, until)
+        union, params = self._union(
+            "SELECT ip, count AS c, blocked AS b FROM ip_rollup WHERE bucket >= ? AND bucket < ?",
+            "SELECT ip, COUNT(*) AS c, SUM(blocked) AS b FROM events "
+            "WHERE ts >= ? AND ts < ? AND ip IS NOT NULL GROUP BY ip",
+            since, until, first, last
+        )
+        cursor = self._reader().execute(
+            f"SELECT ip, SUM(c) AS total, SUM(b) FROM ({union}) "
+            f"GROUP BY ip ORDER BY total DESC LIMIT ?", (*params, limit)
+        )
+        return [{"ip": ip, "events": total, "blocked": blocked} for ip, total, blocked in cursor]
+
+    def threat_distribution(self, since: Optional[float] = None, until: Optional[float] = None,
+                            ip: Optional[str] = None) -> Dict[str, Any]:
+        """Répartition des menaces: par type, par sévérité et par heure (d'une IP si précisée)"""
+        since, until, first, last = self._window(since, until)
+        hour_of_event = f"CAST(ts / {HOUR_SECONDS} AS INTEGER)"
+        if ip is not None:
+            # Pas d'agrégat par (IP, type): lecture de la table brute via l'index (ip, ts)
+            cursor = self._reader().execute(
+                f"SELECT {hour_of_event}, threat_type, severity, COUNT(*), SUM(blocked) FROM events "
+                f"WHERE ip = ? AND ts >= ? AND ts < ? GROUP BY 1, 2, 3", (ip, since, until)
+            )
+        else:
+            # Chaque branche est déjà regroupée par heure; la fusion se fait ci-dessous
+            union, params = self._union(
+                f"SELECT bucket * {BUCKET_SECONDS} / {HOUR_SECONDS}, threat_type, severity, "
+                f"SUM(count), SUM(blocked) FROM threat_rollup WHERE bucket >= ? AND bucket < ? "
+                f"GROUP BY 1, 2, 3",
+                # Un bord peut chevaucher deux tranches (fenêtre plus courte qu'une tranche)
+                f"SELECT {hour_of_event}, threat_type, severity, "
+                f"COUNT(*), SUM(blocked) FROM events WHERE ts >= ? AND ts < ? GROUP BY 1, 2, 3",
+                since, until, first, last
+            )
+            cursor = self._reader().execute(union, params)
+
+        by_type: Dict[str, int] = defaultdict(int)
+        by_severity: Dict[str, int] = defaultdict(int)
+        hourly: Dict[int, Dict[str, int]] = {}
+        blocked_total = 0
+        for hour, threat_type, severity, count, blocked in cursor:
+            by_type[threat_type] += count
+            by_severity[severity] += count
+            hourly.setdefault(hour, defaultdict(int))[threat_type] += count
+            blocked_total += blocked
+
+        return {
+            "by_type": dict(by_type),
+            "by_severity": dict(by_severity),
+            "hourly": [{"hour": _isoformat(hour * HOUR_SECONDS), "threats": dict(counts)}
+                       for hour, counts in sorted(hourly.items())],
+            "total": sum(by_type.values()),
+            "blocked": blocked_total
+        }
+
+    def distinct_ips(self, since: Optional[float] = None, until: Optional[float] = None,
+                     blocked_only: bool = False) -> int:
+        """Nombre d'IPs distinctes (éventuellement bloquées) sur la fenêtre"""
+        since, until, first, last = self._window(since, until)
+        condition = " AND blocked > 0" if blocked_only else ""
+        union, params = self._union(
+            f"SELECT ip FROM ip_rollup WHERE bucket >= ? AND bucket < ?{condition}",
+            f"SELECT ip FROM events WHERE ts >= ? AND ts < ? AND ip IS NOT NULL{condition}",
+            since, until, first, last
+        )
+        row = self._reader().execute(
+            f"SELECT COUNT(DISTINCT ip) FROM ({union})", params
+        ).fetchone()
+        return row[0]
+
+    def summary(self, since: Optional[float] = None, until: Optional[float] = None,
+                ip: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+        """Vue d'audit complète de la fenêtre (comptes, répartition, principaux attaquants).
+
+        Pour une IP: ses comptes et sa répartition, sans classement des attaquants.
+        """
+        if ip is not None:
+            distribution = self.threat_distribution(since, until, ip=ip)
+            return {
+                "counts": {"total": distribution["total"], "blocked": distribution["blocked"]},
+                "distribution": distribution
+            }
+        distribution = self.threat_distribution(since, until)
+        return {
+            "counts": {"total": distribution["total"], "blocked": distribution["blocked"]},
+            "distribution": distribution,
+            "top_offenders": self.top_offenders(since, until, limit=top),
+            "blocked_ips": self.distinct_ips(since, until, blocked_only=True)
+        }
+
+    # --- Variantes asynchrones (hors boucle) ---
+
+    async def add(self, events: List[Dict[str, Any]]) -> int:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._write_executor, self.insert_many, events
+        )
+
+    async def run(self, method: str, *args, **kwargs):
+        """Exécuter une lecture (`query`, `summary`, ...) dans un thread lecteur"""
+        function = getattr(self, method)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._read_executor, lambda: function(*args, **kwargs)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "path": self.path, "retention_days": self.retention / 86400}
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
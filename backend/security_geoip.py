@@ -0,0 +1,413 @@
+"""
+🌍 GÉOLOCALISATION RIMAREUM - SENTINEL CORE
+Base GeoIP locale (plages triées, recherche binaire, mmap partagé, rechargement à chaud)
+et enrichissement distant optionnel hors du chemin des requêtes
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import socket
+import struct
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+# Format compilé: en-tête, table des pays, puis colonnes IPv4 et IPv6
+_MAGIC = b"RGEOIP01"
+_HEADER = struct.Struct("<8sIII")  # magic, plages IPv4, plages IPv6, pays
+_IPV4 = struct.Struct("!I")
+_IPV4_MAPPED_PREFIX = b"\0" * 10 + b"\xff\xff"
+
+
+def _align(offset: int, alignment: int = 16) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _parse_address(text: str) -> Tuple[int, int]:
+    """Adresse IP texte -> (version, entier)"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+
+
+def _parse_range(fields: List[str]) -> Optional[Tuple[int, int, int, str]]:
+    """Ligne `réseau,pays` (CIDR) ou `début,fin,pays` -> (version, début, fin, pays)"""
+    try:
+        if len(fields) == 2:
+            address, _, prefix = fields[0].strip().partition("/")
+            version, value = _parse_address(address)
+            bits = 32 if version == 4 else 128
+            host_bits = bits - int(prefix) if prefix else 0
+            if not 0 <= host_bits <= bits:
+                return None
+            host_mask = (1 << host_bits) - 1
+            start, end = value & ~host_mask, value | host_mask
+        elif len(fields) == 3:
+            version, start = _parse_address(fields[0].strip())
+            end_version, end = _parse_address(fields[1].strip())
+            if version != end_version or end < start:
+                return None
+        else:
+            return None
+    except (OSError, ValueError):
+        return None
+
+    country = fields[-1].strip().upper()
+    if len(country) != 2:
+        return None
+    return version, start, end, country
+
+
+def _flatten_ranges(rows: List[Tuple[int, int, str]],
+                    country_index: Dict[str, int]) -> List[Tuple[int, int, int]]:
+    """Aplatir des plages éventuellement imbriquées en plages disjointes triées.
+
+    La plage la plus spécifique l'emporte (un /16 à l'intérieur d'un /8);
+    les plages adjacentes d'un même pays sont fusionnées.
+    """
+    flattened: List[Tuple[int, int, int]] = []
+
+    def emit(start: int, end: int, index: int):
+        if start > end:
+            return
+        if flattened and flattened[-1][2] == index and flattened[-1][1] + 1 == start:
+            flattened[-1] = (flattened[-1][0], end, index)
+        else:
+            flattened.append((start, end, index))
+
+    # Plages englobantes ouvertes: (fin, pays), la plus interne au sommet
+    open_ranges: List[Tuple[int, int]] = []
+    cursor = 0
+    for start, end, country in sorted(rows, key=lambda row: (row[0], -row[1])):
+        while open_ranges and open_ranges[-1][0] < start:
+            open_end, open_index = open_ranges.pop()
+            emit(cursor, open_end, open_index)
+            cursor = max(cursor, open_end + 1)
+        if open_ranges:
+            emit(cursor, start - 1, open_ranges[-1][1])
+            # Chevauchement partiel: la plage reste contenue dans l'englobante
+            end = min(end, open_ranges[-1][0])
+        cursor = max(cursor, start)
+        open_ranges.append((end, country_index[country]))
+
+    while open_ranges:
+        open_end, open_index = open_ranges.pop()
+        emit(cursor, open_end, open_index)
+        cursor = max(cursor, open_end + 1)
+
+    return flattened
+
+
+def compile_geoip_table(source_path: str, compiled_path: str) -> Dict[str, int]:
+    """Compiler le fichier CIDR -> pays en tableau binaire trié prêt pour mmap.
+
+    Les plages imbriquées sont aplaties (la plus spécifique l'emporte); le
+    fichier est écrit sous un nom temporaire puis renommé atomiquement.
+    """
+    ranges: Dict[int, List[Tuple[int, int, str]]] = {4: [], 6: []}
+    rejected = 0
+
+    with open(source_path, "r", encoding="utf-8") as source:
+        for line in source:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parsed = _parse_range(line.split(","))
+            if parsed is None:
+                rejected += 1  # En-tête CSV ou ligne invalide
+                continue
+            version, start, end, country = parsed
+            ranges[version].append((start, end, country))
+
+    countries: List[str] = sorted({country for rows in ranges.values() for _, _, country in rows})
+    country_index = {country: index for index, country in enumerate(countries)}
+
+    merged: Dict[int, List[Tuple[int, int, int]]] = {
+        version: _flatten_ranges(rows, country_index) for version, rows in ranges.items()
+    }
+
+    v4, v6 = merged[4], merged[6]
+    blob = bytearray(_HEADER.pack(_MAGIC, len(v4), len(v6), len(countries)))
+    blob += "".join(countries).encode("ascii")
+
+    def column(values, dtype) -> bytes:
+        return np.array(values, dtype=dtype).tobytes()
+
+    for rows, key_dtype, to_key in (
+        (v4, "<u4", lambda value: value),
+        (v6, "S16", lambda value: value.to_bytes(16, "big")),
+    ):
+        for position, dtype in ((0, key_dtype), (1, key_dtype), (2, "<u2")):
+            blob += b"\0" * (_align(len(blob)) - len(blob))
+            values = [to_key(row[position]) if position < 2 else row[2] for row in rows]
+            blob += column(values, dtype)
+
+    temp_path = f"{compiled_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as compiled:
+        compiled.write(blob)
+    os.replace(temp_path, compiled_path)
+
+    return {"ipv4_ranges": len(v4), "ipv6_ranges": len(v6), "countries": len(countries),
+            "rejected_lines": rejected}
+
+
+class GeoIPTable:
+    """Table compilée mappée en mémoire: les colonnes sont des vues numpy sur le mmap,
+    partagées entre workers via le cache de pages du système"""
+
+    def __init__(self, compiled_path: str):
+        with open(compiled_path, "rb") as compiled:
+            self._mmap = mmap.mmap(compiled.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, v4_count, v6_count, country_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Format GeoIP inconnu: {compiled_path}")
+
+        offset = _HEADER.size
+        codes = self._mmap[offset:offset + 2 * country_count].decode("ascii")
+        self.countries: List[str] = [codes[i:i + 2] for i in range(0, len(codes), 2)]
+        offset += 2 * country_count
+
+        columns = []
+        for count, key_dtype, key_size in ((v4_count, "<u4", 4), (v6_count, "S16", 16)):
+            for dtype, size in ((key_dtype, key_size), (key_dtype, key_size), ("<u2", 2)):
+                offset = _align(offset)
+                columns.append(np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset))
+                offset += count * size
+
+        self.v4_starts, self.v4_ends, self.v4_countries = columns[:3]
+        self.v6_starts, self.v6_ends, self.v6_countries = columns[3:]
+
+    def __len__(self) -> int:
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Code pays ISO de l'IP, None si inconnue ou invalide"""
+        try:
+            packed = socket.inet_pton(socket.AF_INET, ip)
+        except (OSError, TypeError):
+            try:
+                packed = socket.inet_pton(socket.AF_INET6, ip)
+            except (OSError, TypeError):
+                return None
+            if packed[:12] == _IPV4_MAPPED_PREFIX:
+                packed = packed[12:]
+
+        if len(packed) == 4:
+            key, starts, ends, countries = (np.uint32(_IPV4.unpack(packed)[0]), self.v4_starts,
+                                            self.v4_ends, self.v4_countries)
+        else:
+            # Les valeurs S16 sont lues sans leurs octets nuls finaux (ordre inchangé)
+            key, starts, ends, countries = (packed.rstrip(b"\0"), self.v6_starts,
+                                            self.v6_ends, self.v6_countries)
+
+        index = int(starts.searchsorted(key, side="right")) - 1
+        if index < 0 or key > ends[index]:
+            return None
+        return self.countries[countries[index]]
+
+
+class GeoIPDatabase:
+    """Base GeoIP locale rechargée à chaud.
+
+    Le fichier source (`réseau,pays` ou `début,fin,pays` par ligne) est
+    compilé dans `<source>.bin`, que chaque worker mappe en mémoire. Au plus
+    toutes les `reload_interval` secondes, un changement du fichier source
+    déclenche une recompilation et la nouvelle table remplace l'ancienne
+    par simple affectation de référence.
+    """
+
+    def __init__(self, source_path: Optional[str], reload_interval: float = 30.0):
+        self.source_path = source_path
+        self.compiled_path = f"{source_path}.bin" if source_path else None
+        self.reload_interval = reload_interval
+        self.table: Optional[GeoIPTable] = None
+        self.stats = {"lookups": 0, "hits": 0, "reloads": 0, "reload_errors": 0}
+        self._source_signature: Optional[Tuple[float, int]] = None
+        self._next_check = 0.0
+        self._missing_logged = False
+        self._reload_task: Optional[asyncio.Future] = None
+        self.reload()
+
+    def _signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.source_path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _needs_reload(self) -> Optional[Tuple[float, int]]:
+        """Signature du fichier source s'il a changé depuis le dernier chargement"""
+        signature = self._signature()
+        if signature is None:
+            if not self._missing_logged:
+                logging.warning(f"Base GeoIP introuvable ({self.source_path}): pays inconnus autorisés")
+                self._missing_logged = True
+            return None
+        if signature == self._source_signature and self.table is not None:
+            return None
+        return signature
+
+    def reload(self) -> bool:
+        """(Re)charger la table si le fichier source a changé (synchrone)"""
+        signature = self._needs_reload()
+        if signature is None:
+            return False
+        return self._load(signature)
+
+    def _load(self, signature: Tuple[float, int]) -> bool:
+        try:
+            try:
+                compiled_stat = os.stat(self.compiled_path)
+                up_to_date = compiled_stat.st_mtime >= signature[0]
+            except OSError:
+                up_to_date = False
+            if not up_to_date:
+                summary = compile_geoip_table(self.source_path, self.compiled_path)
+                logging.info(f"Base GeoIP compilée: {summary}")
+
+            # Échange par référence: les recherches en cours gardent l'ancienne table
+            self.table = GeoIPTable(self.compiled_path)
+            self._source_signature = signature
+            self._missing_logged = False
+            self.stats["reloads"] += 1
+            return True
+        except Exception as e:
+            self.stats["reload_errors"] += 1
+            logging.error(f"Erreur chargement base GeoIP: {e}")
+            return False
+
+    def _check_reload(self):
+        """Vérification périodique; la recompilation part dans un thread si une boucle tourne"""
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        signature = self._needs_reload()
+        if signature is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._load(signature)
+            return
+        self._reload_task = loop.run_in_executor(None, self._load, signature)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Code pays de l'IP (quelques microsecondes, aucune E/S réseau)"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self._check_reload()
+
+        self.stats["lookups"] += 1
+        table = self.table
+        if table is None:
+            return None
+
+        country = table.lookup(ip)
+        if country is not None:
+            self.stats["hits"] += 1
+        return country
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "ranges": len(self.table) if self.table is not None else 0,
+            "source_path": self.source_path
+        }
+
+
+class GeoIPRemoteEnrichment:
+    """Enrichissement optionnel via un service de géolocalisation externe.
+
+    Les IPs absentes de la base locale sont mises en file et résolues en
+    arrière-plan avec un client HTTP partagé; la requête en cours n'attend
+    jamais. Les résultats vont dans un cache LRU borné avec expiration.
+    """
+
+    def __init__(self, url_template: str = "https://ipapi.co/{ip}/country/",
+                 cache_size: int = 10000, cache_ttl: float = 3600, queue_size: int = 1000,
+                 timeout: float = 5.0):
+        self.url_template = url_template
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self.stats = {"queued": 0, "dropped": 0, "resolved": 0, "errors": 0}
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: set = set()
+        self._worker_task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def get(self, ip: str) -> Optional[str]:
+        """Pays résolu à distance, si déjà en cache"""
+        entry = self.cache.get(ip)
+        if entry is None:
+            return None
+        country, expires_at = entry
+        if time.time() >= expires_at:
+            del self.cache[ip]
+            return None
+        self.cache.move_to_end(ip)
+        return country
+
+    def request(self, ip: str):
+        """Demander la résolution en arrière-plan (sans attendre)"""
+        if ip in self._pending or ip in self.cache:
+            return
+        if not self._ensure_worker():
+            return
+        try:
+            self._queue.put_nowait(ip)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self._pending.add(ip)
+        self.stats["queued"] += 1
+
+    def _ensure_worker(self) -> bool:
+        if self._worker_task is not None and not self._worker_task.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._pending.clear()
+        self._worker_task = loop.create_task(self._worker())
+        return True
+
+    async def _worker(self):
+        """Résoudre les IPs en file une par une"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        while True:
+            ip = await self._queue.get()
+            country = None
+            try:
+                response = await self._client.get(self.url_template.format(ip=ip))
+                if response.status_code == 200:
+                    country = response.text.strip().upper() or None
+                    self.stats["resolved"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"Erreur géolocalisation IP {ip}: {e}")
+            finally:
+                self._pending.discard(ip)
+
+            self.cache[ip] = (country, time.time() + self.cache_ttl)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "cache_size": len(self.cache),
+            "pending": len(self._pending)
+        }
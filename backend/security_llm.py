@@ -0,0 +1,487 @@
+"""
+🤖 ANALYSES LLM RIMAREUM - SENTINEL CORE
+Empreinte des menaces, cache TTL/LRU à vol unique, passerelle LLM partagée
+(pool HTTP/2, limites par fournisseur, disjoncteur, streaming SSE) et doublures locales
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from security_metrics import WindowedHistogram
+
+try:
+    import h2  # noqa: F401 - HTTP/2 de httpx (optionnel)
+    HTTP2_AVAILABLE = True
+except ImportError:  # Repli sur HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = False
+
+# Découpage d'un texte en jetons factices (mot + espaces qui suivent)
+_STREAM_TOKEN = re.compile(r"\s*\S+\s*")
+
+# États du disjoncteur
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Segments de chemin variables remplacés par un gabarit (ordre significatif)
+_PATH_PLACEHOLDERS = (
+    (re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I), "{uuid}"),
+    (re.compile(r"^\d+$"), "{n}"),
+    (re.compile(r"^[0-9a-f]{16,}$", re.I), "{hex}"),
+    (re.compile(r"^[A-Za-z0-9_\-]{24,}$"), "{token}"),
+)
+
+
+def path_pattern(path: str) -> str:
+    """Gabarit d'un chemin: sans requête, identifiants remplacés (/users/42 -> /users/{n})"""
+    path = path.split("?", 1)[0].split("#", 1)[0]
+    segments = []
+    for segment in path.split("/"):
+        for pattern, placeholder in _PATH_PLACEHOLDERS:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return "/".join(segments).lower()
+
+
+def severity_bucket(severity: str, ml_score: float, step: float = 0.2) -> str:
+    """Sévérité déclarée et score ML quantifié (des scores proches partagent l'analyse)"""
+    return f"{str(severity).upper()}:{int(max(0.0, min(ml_score, 1.0)) / step)}"
+
+
+def threat_fingerprint(threat_type: str, request_path: str, severity: str, ml_score: float = 0.0,
+                       method: str = "") -> str:
+    """Empreinte d'une menace: des événements quasi identiques (IP, identifiants et
+    paramètres différents) partagent la même analyse"""
+    key = "|".join((str(threat_type), method.upper(), path_pattern(request_path),
+                    severity_bucket(severity, ml_score)))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class SingleFlightCache:
+    """Cache TTL/LRU de résultats asynchrones avec vol unique par clé.
+
+    Un appel en cache est servi directement; des appels concurrents pour une
+    même clé absente attendent le même calcul (une seule exécution de
+    `factory`). Le calcul tourne dans sa propre tâche: l'annulation d'un
+    appelant ne l'interrompt pas pour les autres. Les erreurs sont transmises
+    à tous les appelants en attente mais ne sont pas mises en cache.
+    """
+
+    def __init__(self, ttl: float = 600.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0}
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= (time.monotonic() if now is None else now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get_or_compute(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.get_running_loop().create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._complete(key, done))
+        return await asyncio.shield(task)
+
+    def _complete(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.stats["errors"] += 1
+            return
+        if task.result() is not None and self.ttl > 0:
+            self.put(key, task.result())
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hit_rate": (self.stats["hits"] + self.stats["coalesced"]) / lookups if lookups else 0.0
+        }
+
+
+class FakeLLM:
+    """LLM factice local: latence simulée, réponse déterministe, appels comptés.
+
+    Remplace le client réel dans les benchmarks et les essais locaux
+    (`GPTSecurityAssistant(llm=FakeLLM())`).
+    """
+
+    def __init__(self, latency: float = 0.05,
+                 respond: Optional[Callable[[str, Dict[str, Any]], Dict[str, Any]]] = None):
+        self.latency = latency
+        self.respond = respond
+        self.calls = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def __call__(self, prompt: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.concurrent -= 1
+        if self.respond is not None:
+            return self.respond(prompt, context)
+        return {
+            "threat_analysis": f"Analyse factice de {context.get('threat_type', 'unknown')}",
+            "severity_assessment": 5,
+            "prompt_chars": len(prompt)
+        }
+
+
+class FakeTokenStream:
+    """Générateur de jetons factice: rejoue un texte mot à mot, un délai par jeton.
+
+    Même forme que `LLMGateway.stream` (itérateur asynchrone de fragments):
+    remplace le modèle pour les essais locaux du streaming. Les flux terminés
+    et abandonnés (déconnexion du client) sont comptés.
+    """
+
+    def __init__(self, token_delay: float = 0.02, first_token_delay: float = 0.0):
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    async def __call__(self, text: str) -> AsyncIterator[str]:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.first_token_delay)
+            for token in _STREAM_TOKEN.findall(text):
+                await asyncio.sleep(self.token_delay)
+                yield token
+        except (GeneratorExit, asyncio.CancelledError):
+            self.cancelled += 1
+            raise
+        self.completed += 1
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Événement Server-Sent Events nommé, données JSON sur une ligne"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class LLMError(RuntimeError):
+    """Réponse invalide ou refusée par le fournisseur"""
+
+
+class LLMUnavailable(LLMError):
+    """Fournisseur indisponible: disjoncteur ouvert, saturation ou délai dépassé"""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"LLM {provider} indisponible ({reason})")
+        self.provider = provider
+        self.reason = reason
+
+
+@dataclass
+class LLMProvider:
+    """Fournisseur compatible avec l'API chat completions (OpenAI, DeepSeek...)"""
+    name: str
+    base_url: str
+    model: str
+    api_key: Optional[str] = None
+    max_concurrency: int = 8
+    timeout: float = 30.0  # Durée maximale d'un appel complet (secondes)
+    connect_timeout: float = 5.0
+    queue_timeout: float = 5.0  # Attente maximale d'une place sous le sémaphore
+    path: str = "/chat/completions"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class CircuitBreaker:
+    """Disjoncteur: ouvert après `failure_threshold` échecs consécutifs, un seul
+    appel d'essai (semi-ouvert) après `reset_timeout` secondes"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        # Ouvert depuis assez longtemps, ou essai semi-ouvert resté sans réponse: nouvel essai
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = CIRCUIT_HALF_OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self.trips += 1
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """Client LLM asynchrone partagé par tous les assistants.
+
+    Un seul httpx.AsyncClient (HTTP/2 si `h2` est installé, sinon HTTP/1.1
+    keep-alive) réutilise les connexions; un sémaphore par fournisseur borne
+    les appels simultanés (attente limitée à `queue_timeout`). Les prompts
+    identiques en cours partagent un seul appel (et un cache de `dedupe_ttl`
+    secondes si non nul). Chaque appel est borné par `timeout`; les échecs
+    réseau, délais, 429 et 5xx alimentent un disjoncteur par fournisseur qui
+    rejette immédiatement les appels tant qu'il est ouvert. `transport`
+    permet de cibler un serveur factice local (create_stub_llm_app).
+    """
+
+    def __init__(self, providers: List[LLMProvider], max_connections: int = 100,
+                 max_keepalive_connections: int = 20, dedupe_ttl: float = 0.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.providers = {provider.name: provider for provider in providers}
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.transport = transport
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name in self.providers}
+        self.latency = {name: WindowedHistogram() for name in self.providers}
+        self.stats = {name: {"requests": 0, "streams": 0, "errors": 0,
+                             "timeouts": 0, "rejected_open": 0, "rejected_saturated": 0}
+                      for name in self.providers}
+        self._dedupe = SingleFlightCache(ttl=dedupe_ttl, maxsize=1024)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def has_provider(self, name: str) -> bool:
+        return name in self.providers
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE and self.transport is None,
+                limits=self.limits,
+                transport=self.transport
+            )
+        return self._client
+
+    def _provider(self, name: str) -> LLMProvider:
+        provider = self.providers.get(name)
+        if provider is None:
+            raise LLMUnavailable(name, "fournisseur non configuré")
+        if not self.breakers[name].allow():
+            self.stats[name]["rejected_open"] += 1
+            raise LLMUnavailable(name, "disjoncteur ouvert")
+        return provider
+
+    @asynccontextmanager
+    async def _slot(self, provider: LLMProvider):
+        """Place sous le sémaphore du fournisseur (attente bornée)"""
+        semaphore = self._semaphores.get(provider.name)
+        if semaphore is None:
+            semaphore = self._semaphores[provider.name] = asyncio.Semaphore(provider.max_concurrency)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=provider.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats[provider.name]["rejected_saturated"] += 1
+            raise LLMUnavailable(provider.name, "saturé")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _request(self, provider: LLMProvider, messages: List[Dict[str, str]], stream: bool,
+                 params: Dict[str, Any]) -> Dict[str, Any]:
+        headers = dict(provider.headers)
+        if provider.api_key:
+            headers["Authorization"] = f"Bearer {provider.api_key}"
+        return {
+            "url": provider.base_url.rstrip("/") + provider.path,
+            "headers": headers,
+            "json": {"model": provider.model, "messages": messages, "stream": stream, **params},
+            "timeout": httpx.Timeout(provider.timeout, connect=provider.connect_timeout)
+        }
+
+    def _failure(self, provider: LLMProvider, error: Exception) -> LLMError:
+        """Classer une erreur d'appel et alimenter le disjoncteur si elle est transitoire"""
+        stats = self.stats[provider.name]
+        stats["errors"] += 1
+        if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+            stats["timeouts"] += 1
+            self.breakers[provider.name].record_failure()
+            return LLMUnavailable(provider.name, "délai dépassé")
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if status == 429 or status >= 500:
+                self.breakers[provider.name].record_failure()
+                return LLMUnavailable(provider.name, f"HTTP {status}")
+            return LLMError(f"LLM {provider.name}: HTTP {status}")
+        if isinstance(error, httpx.TransportError):
+            self.breakers[provider.name].record_failure()
+            return LLMUnavailable(provider.name, type(error).__name__)
+        return LLMError(f"LLM {provider.name}: {error}")
+
+    async def complete(self, provider_name: str, messages: List[Dict[str, str]], **params) -> Dict[str, Any]:
+        """Réponse complète; les appels identiques simultanés sont fusionnés"""
+        provider = self._provider(provider_name)
+        key = hashlib.sha256(json.dumps([provider_name, provider.model, messages, params],
+                                        sort_keys=True, default=str).encode()).hexdigest()
+        return await self._dedupe.get_or_compute(key, lambda: self._complete(provider, messages, params))
+
+    async def _complete(self, provider: LLMProvider, messages: List[Dict[str, str]],
+                        params: Dict[str, Any]) -> Dict[str, Any]:
+        request = self._request(provider, messages, False, params)
+        self.stats[provider.name]["requests"] += 1
+        async with self._slot(provider):
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self._get_client().post(**request), timeout=provider.timeout)
+                response.raise_for_status()
+                body = response.json()
+                content = body["choices"][0]["message"]["content"]
+            except Exception as e:
+                raise self._failure(provider, e) from e
+        self.breakers[provider.name].record_success()
+        self.latency[provider.name].record(time.perf_counter() - start)
+        return {"provider": provider.name, "model": body.get("model", provider.model),
+                "content": content, "usage": body.get("usage", {})}
+
+    async def stream(self, provider_name: str, messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+        """Fragments de texte au fil de l'eau (SSE); la place est rendue à la fin ou à l'abandon"""
+        provider = self._provider(provider_name)
+        request = self._request(provider, messages, True, params)
+        self.stats[provider.name]["streams"] += 1
+        async with self._slot(provider):
+            start = time.perf_counter()
+            try:
+                async with self._get_client().stream("POST", **request) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+            except (GeneratorExit, asyncio.CancelledError):
+                raise  # Abandon côté client: ni succès ni échec du fournisseur
+            except Exception as e:
+                raise self._failure(provider, e) from e
+        self.breakers[provider.name].record_success()
+        self.latency[provider.name].record(time.perf_counter() - start)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE and self.transport is None,
+            "dedupe": self._dedupe.get_stats(),
+            "providers": {
+                name: {
+                    **self.stats[name],
+                    "circuit": self.breakers[name].state,
+                    "circuit_trips": self.breakers[name].trips,
+                    "max_concurrency": provider.max_concurrency,
+                    "latency": self.latency[name].snapshot()
+                }
+                for name, provider in self.providers.items()
+            }
+        }
+
+
+def create_stub_llm_app(latency: float = 0.05, failure_rate: float = 0.0, chunks: int = 8):
+    """Serveur factice compatible chat completions (essais locaux de LLMGateway).
+
+    Utilisable en mémoire via `httpx.ASGITransport(app=...)` ou servi par
+    uvicorn. `app.state.calls` compte les appels reçus.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+    app.state.calls = 0
+    app.state.latency = latency
+    app.state.failure_rate = failure_rate
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        await asyncio.sleep(app.state.latency)
+        if random.random() < app.state.failure_rate:
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=503)
+
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        content = f"stub:{body.get('model')}:{prompt[:64]}"
+        if not body.get("stream"):
+            return {
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split())}
+            }
+
+        async def events():
+            size = max(1, len(content) // chunks)
+            for start in range(0, len(content), size):
+                delta = {"choices": [{"index": 0, "delta": {"content": content[start:start + size]}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
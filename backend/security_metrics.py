@@ -0,0 +1,568 @@
+"""
+📈 MÉTRIQUES RIMAREUM - SENTINEL CORE
+Agrégation en continu et en mémoire constante: compteurs, histogrammes de latence, débit
+"""
+
+import asyncio
+import gc
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Histogramme log-linéaire (style HDR): 2^SUB_BUCKET_BITS valeurs exactes puis
+# 2^(SUB_BUCKET_BITS - 1) sous-tranches par octave, soit ~3% d'erreur relative
+SUB_BUCKET_BITS = 6
+_SUB_COUNT = 1 << SUB_BUCKET_BITS
+_HALF_COUNT = _SUB_COUNT >> 1
+MAX_TRACKABLE_US = (1 << 36) - 1  # ~19 heures
+BUCKET_COUNT = _SUB_COUNT + (MAX_TRACKABLE_US.bit_length() - SUB_BUCKET_BITS) * _HALF_COUNT
+
+# Fenêtres du débit décroissant (secondes) et pas de mise à jour
+RATE_WINDOWS = {"m1": 60, "m5": 300, "m15": 900}
+RATE_TICK = 5.0
+
+QUANTILES = (0.50, 0.95, 0.99)
+
+# Bornes (secondes) des histogrammes cumulés exportés (format Prometheus/OpenMetrics)
+EXPORT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0)
+
+
+def bucket_index(value_us: int) -> int:
+    """Tranche d'une valeur (microsecondes entières)"""
+    if value_us < _SUB_COUNT:
+        return value_us if value_us > 0 else 0
+    if value_us > MAX_TRACKABLE_US:
+        value_us = MAX_TRACKABLE_US
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    return _SUB_COUNT + (shift - 1) * _HALF_COUNT + (value_us >> shift) - _HALF_COUNT
+
+
+def bucket_value(index: int) -> float:
+    """Valeur représentative (milieu) d'une tranche, en microsecondes"""
+    if index < _SUB_COUNT:
+        return float(index)
+    offset = index - _SUB_COUNT
+    shift = offset // _HALF_COUNT + 1
+    lower = (offset % _HALF_COUNT + _HALF_COUNT) << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """Histogramme de latences à tranches fixes: enregistrement O(1), mémoire constante"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKET_COUNT
+        self.reset()
+
+    def reset(self):
+        if any(self.counts):
+            self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        value_us = int(seconds * 1e6)
+        self.counts[bucket_index(value_us)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds < self.min:
+            self.min = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        if not other.count:
+            return
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.min = min(self.min, other.min)
+
+    def quantiles(self, quantiles=QUANTILES) -> List[float]:
+        """Quantiles (secondes), bornés par les extrêmes observés"""
+        if not self.count:
+            return [0.0 for _ in quantiles]
+        targets = [max(1, math.ceil(q * self.count)) for q in quantiles]
+        results: List[float] = []
+        seen = 0
+        position = 0
+        for index, bucket in enumerate(self.counts):
+            if not bucket:
+                continue
+            seen += bucket
+            while position < len(targets) and seen >= targets[position]:
+                value = bucket_value(index) / 1e6
+                results.append(min(self.max, max(self.min, value)))
+                position += 1
+            if position == len(targets):
+                break
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = self.quantiles()
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3),
+            "p99_ms": round(p99 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+
+class WindowedHistogram:
+    """Histogramme glissant: `slots` histogrammes tournants couvrant `window` secondes.
+
+    Une tranche expirée est remise à zéro lors de sa réutilisation; la
+    lecture fusionne les tranches encore dans la fenêtre. Les totaux depuis
+    le démarrage (compte, somme, tranches `buckets`) sont conservés à part
+    pour l'export cumulatif.
+    """
+
+    def __init__(self, window: float = 60.0, slots: int = 6,
+                 buckets: Tuple[float, ...] = EXPORT_BUCKETS):
+        self.slot_seconds = window / slots
+        self.slots = [LatencyHistogram() for _ in range(slots)]
+        self.epochs = [-1] * slots
+        self.lifetime_count = 0
+        self.lifetime_total = 0.0
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # Dernière tranche: +Inf
+
+    def record(self, seconds: float, now: Optional[float] = None):
+        epoch = int((time.monotonic() if now is None else now) / self.slot_seconds)
+        index = epoch % len(self.slots)
+        if self.epochs[index] != epoch:
+            self.slots[index].reset()
+            self.epochs[index] = epoch
+        self.slots[index].record(seconds)
+        self.lifetime_count += 1
+        self.lifetime_total += seconds
+        self.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+
+    def merged(self, now: Optional[float] = None) -> LatencyHistogram:
+        current = int((time.monotonic() if now is None else now) / self.slot_seconds)
+        merged = LatencyHistogram()
+        for epoch, histogram in zip(self.epochs, self.slots):
+            if current - len(self.slots) < epoch <= current:
+                merged.merge(histogram)
+        return merged
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.merged().snapshot(),
+            "window_seconds": self.slot_seconds * len(self.slots),
+            "lifetime_count": self.lifetime_count
+        }
+
+
+class ShardedCounter:
+    """Compteur sans verrou sur le chemin chaud: une cellule par thread, sommée à la lecture"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: List[List[int]] = []
+        self._register = threading.Lock()
+
+    def _cell(self) -> List[int]:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = [0]
+            with self._register:  # Une seule fois par thread
+                self._cells.append(cell)
+            self._local.cell = cell
+        return cell
+
+    def inc(self, amount: int = 1):
+        self._cell()[0] += amount
+
+    @property
+    def value(self) -> int:
+        return sum(cell[0] for cell in self._cells)
+
+
+class DecayingRate:
+    """Débit à décroissance exponentielle (moyennes 1/5/15 min, comme le load average).
+
+    Les événements sont accumulés puis intégrés tous les RATE_TICK secondes;
+    la mise à jour est paresseuse (à l'enregistrement ou à la lecture) et
+    rattrape les pas manqués en une seule opération.
+    """
+
+    def __init__(self, windows: Dict[str, float] = None, tick: float = RATE_TICK):
+        self.tick = tick
+        self.windows = windows or RATE_WINDOWS
+        self.alphas = {name: 1 - math.exp(-tick / seconds) for name, seconds in self.windows.items()}
+        self.rates = {name: 0.0 for name in self.windows}
+        self.pending = 0
+        self.count = 0
+        self.started = time.monotonic()
+        self.last_tick = self.started
+        self.initialized = False
+
+    def _catch_up(self, now: float):
+        elapsed = now - self.last_tick
+        if elapsed < self.tick:
+            return
+        ticks = int(elapsed / self.tick)
+        self.last_tick += ticks * self.tick
+        instant = self.pending / self.tick
+        self.pending = 0
+        for name, alpha in self.alphas.items():
+            if not self.initialized:
+                rate = instant
+            else:
+                rate = self.rates[name] + alpha * (instant - self.rates[name])
+            # Pas suivants sans événement: décroissance pure
+            self.rates[name] = rate * (1 - alpha) ** (ticks - 1)
+        self.initialized = True
+
+    def mark(self, count: int = 1, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if now - self.last_tick >= self.tick:
+            self._catch_up(now)
+        self.pending += count
+        self.count += count
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, float]:
+        now = time.monotonic() if now is None else now
+        self._catch_up(now)
+        elapsed = now - self.started
+        mean = self.count / elapsed if elapsed > 0 else 0.0
+        # Avant le premier pas, les moyennes décroissantes valent le débit moyen observé
+        rates = self.rates if self.initialized else {name: mean for name in self.rates}
+        return {
+            **{f"rps_{name}": round(rate, 3) for name, rate in rates.items()},
+            "rps_mean": round(mean, 3),
+            "total": self.count
+        }
+
+
+class LabeledCounter:
+    """Compteurs indexés par un tuple de valeurs d'étiquettes (ex. décision, raison).
+
+    Le nombre de combinaisons est borné: au-delà de `max_series`, les
+    nouvelles combinaisons sont comptées sous ("other", ...).
+    """
+
+    def __init__(self, labelnames: Tuple[str, ...], max_series: int = 128):
+        self.labelnames = labelnames
+        self.max_series = max_series
+        self.values: Dict[Tuple[str, ...], int] = {}
+
+    def inc(self, *labels: str, amount: int = 1):
+        if labels not in self.values and len(self.values) >= self.max_series:
+            labels = ("other",) * len(self.labelnames)
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class RouteMetrics:
+    """Latence, débit et erreurs d'une route (ou d'un étage)"""
+
+    def __init__(self, window: float, slots: int):
+        self.latency = WindowedHistogram(window, slots)
+        self.rate = DecayingRate()
+        self.errors = ShardedCounter()
+
+    def observe(self, seconds: float, error: bool = False):
+        now = time.monotonic()
+        self.latency.record(seconds, now)
+        self.rate.mark(1, now)
+        if error:
+            self.errors.inc()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"latency": self.latency.snapshot(), "throughput": self.rate.snapshot(),
+                "errors": self.errors.value}
+
+
+class MetricsRegistry:
+    """Métriques par nom (route, étage WAF...) en mémoire bornée.
+
+    Au-delà de `max_series` noms distincts, les nouvelles séries sont
+    regroupées sous `overflow` pour ne pas laisser croître la mémoire avec
+    des chemins arbitraires.
+    """
+
+    def __init__(self, window: float = 60.0, slots: int = 6, max_series: int = 256,
+                 overflow: str = "other"):
+        self.window = window
+        self.slots = slots
+        self.max_series = max_series
+        self.overflow = overflow
+        self.series: Dict[str, RouteMetrics] = {}
+        self.total = RouteMetrics(window, slots)
+
+    def get(self, name: str) -> RouteMetrics:
+        metrics = self.series.get(name)
+        if metrics is None:
+            if len(self.series) >= self.max_series:
+                name = self.overflow
+                metrics = self.series.get(name)
+            if metrics is None:
+                metrics = self.series[name] = RouteMetrics(self.window, self.slots)
+        return metrics
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        metrics = self.series.get(name) or self.get(name)
+        metrics.observe(seconds, error)
+        self.total.observe(seconds, error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.snapshot(),
+            "series": {name: metrics.snapshot() for name, metrics in self.series.items()}
+        }
+
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI: latence et débit par gabarit de route dans un MetricsRegistry.
+
+    ASGI pur (pas de BaseHTTPMiddleware): aucune tâche ni copie de corps par
+    requête. Le gabarit est lu dans le scope une fois la requête routée;
+    une réponse 5xx ou une exception compte comme erreur.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, route_of: Callable[[Dict], str],
+                 watchdog: Optional["BlockingCallWatchdog"] = None):
+        self.app = app
+        self.registry = registry
+        self.route_of = route_of
+        self.watchdog = watchdog
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.watchdog is not None:
+            self.watchdog.track(scope)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.observe(self.route_of(scope), time.perf_counter() - start,
+                                  error=status[0] >= 500)
+
+
+class EventLoopLagProbe:
+    """Mesure continue du retard de la boucle asyncio.
+
+    Une tâche se réveille toutes les `interval` secondes; l'écart entre le
+    réveil prévu et le réveil effectif est le temps pendant lequel la boucle
+    était occupée par d'autres callbacks.
+    """
+
+    def __init__(self, interval: float = 0.5, window: float = 60.0):
+        self.interval = interval
+        self.lag = WindowedHistogram(window)
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self) -> bool:
+        """Démarrer la sonde si une boucle tourne (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._task = loop.create_task(self._run())
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            self.lag.record(self.last_lag)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.lag.snapshot(), "last_lag_ms": round(self.last_lag * 1000, 3),
+                "running": self._task is not None and not self._task.done()}
+
+
+class BlockingCallWatchdog(EventLoopLagProbe):
+    """Détecteur d'appels bloquants (mode d'instrumentation optionnel).
+
+    La sonde de retard tourne avec un pas court (`threshold / 4`); un thread
+    de surveillance vérifie que la boucle s'est réveillée à l'heure prévue.
+    Si un callback occupe la boucle plus de `threshold` secondes, la pile du
+    thread de la boucle est capturée pendant le blocage et rattachée au
+    gabarit de route de la tâche en cours (scopes enregistrés par `track`).
+    La durée totale du blocage est complétée au réveil de la boucle.
+    """
+
+    def __init__(self, threshold: float = 0.1, window: float = 60.0, max_reports: int = 100,
+                 stack_limit: int = 32, route_of: Optional[Callable[[Dict], str]] = None):
+        super().__init__(interval=max(threshold / 4, 0.005), window=window)
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self.route_of = route_of
+        self.reports: deque = deque(maxlen=max_reports)
+        self.stalls = WindowedHistogram(window)
+        self.sites = LabeledCounter(("route", "site"))
+        self._scopes: "weakref.WeakKeyDictionary[asyncio.Task, Dict]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._next_wakeup = math.inf
+        self._pending: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def track(self, scope: Dict):
+        """Associer le scope ASGI à la tâche courante (appelé par le middleware)"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._scopes[task] = scope
+
+    def ensure_started(self) -> bool:
+        if not super().ensure_started():
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="rimareum-loop-watchdog",
+                                            daemon=True)
+            self._thread.start()
+        return True
+
+    async def _run(self):
+        while True:
+            self._next_wakeup = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, time.monotonic() - self._next_wakeup)
+            self.lag.record(self.last_lag)
+
+            pending, self._pending = self._pending, None
+            if pending is not None:
+                pending["blocked_ms"] = round(self.last_lag * 1000, 3)
+                self.stalls.record(self.last_lag)
+
+    def _watch(self):
+        """Thread de surveillance: capturer la pile une fois par blocage"""
+        captured_for = None
+        while not self._stop.wait(self.interval):
+            expected = self._next_wakeup
+            if time.monotonic() - expected > self.threshold and captured_for != expected:
+                captured_for = expected
+                try:
+                    self._capture(time.monotonic() - expected)
+                except Exception as e:
+                    logging.error(f"Erreur capture de pile (boucle bloquée): {e}")
+
+    def _capture(self, overdue: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame, limit=self.stack_limit)
+        del frame
+
+        task = asyncio.current_task(self._loop)
+        scope = self._scopes.get(task) if task is not None else None
+        route = "background"
+        if scope is not None:
+            route = self.route_of(scope) if self.route_of is not None else scope.get("path", "unknown")
+
+        innermost = stack[-1] if stack else None
+        site = (f"{os.path.basename(innermost.filename)}:{innermost.lineno} in {innermost.name}"
+                if innermost is not None else "unknown")
+        report = {
+            "detected_at": time.time(),
+            "route": route,
+            "task": task.get_name() if task is not None else None,
+            "site": site,
+            "blocked_ms": round(overdue * 1000, 3),  # Complété au réveil de la boucle
+            "stack": traceback.format_list(stack)
+        }
+        self.reports.append(report)
+        self.sites.inc(route, site)
+        self._pending = report
+        logging.warning(f"Boucle asyncio bloquée > {self.threshold * 1000:.0f}ms "
+                        f"(route {route}, {site}):\n{''.join(report['stack'])}")
+
+    def stop(self):
+        super().stop()
+        self._stop.set()
+        self._thread = None
+        self._next_wakeup = math.inf
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **super().get_stats(),
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls.snapshot(),
+            "sites": [{"route": route, "site": site, "count": count}
+                      for (route, site), count in sorted(self.sites.values.items(),
+                                                         key=lambda item: -item[1])],
+            "recent": list(self.reports)[-10:]
+        }
+
+
+class GCPauseTracker:
+    """Durée des collectes du ramasse-miettes, par génération (via gc.callbacks)"""
+
+    def __init__(self, window: float = 60.0):
+        self.pauses = {generation: WindowedHistogram(window) for generation in (0, 1, 2)}
+        self.collected = [0, 0, 0]
+        self._started: Optional[float] = None
+        self._installed = False
+
+    def _callback(self, phase: str, info: Dict[str, int]):
+        if phase == "start":
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            generation = info.get("generation", 2)
+            self.pauses[generation].record(time.perf_counter() - self._started)
+            self.collected[generation] += info.get("collected", 0)
+            self._started = None
+
+    def install(self):
+        if not self._installed:
+            gc.callbacks.append(self._callback)
+            self._installed = True
+
+    def uninstall(self):
+        if self._installed:
+            try:
+                gc.callbacks.remove(self._callback)
+            except ValueError:
+                logging.error("Erreur retrait du suivi GC: callback absent")
+            self._installed = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {f"gen{generation}": histogram.snapshot()
+                for generation, histogram in self.pauses.items()}
+
+
+# Sondes de processus partagées (une seule boucle et un seul GC par processus)
+loop_lag_probe = EventLoopLagProbe()
+gc_pause_tracker = GCPauseTracker()
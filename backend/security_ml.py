@@ -0,0 +1,290 @@
+"""
+🧠 SERVICES ML RIMAREUM - SENTINEL CORE
+Features sur octets, données d'entraînement, inférence par micro-lots et
+entraînement hors boucle pour le détecteur de menaces
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from security_metrics import WindowedHistogram
+
+# Bornes des tailles de lots exportées (lignes par appel vectorisé)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def byte_entropy(data: bytes) -> float:
+    """Entropie de Shannon (bits/octet) calculée par np.bincount"""
+    if not data:
+        return 0.0
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    probabilities = counts[counts > 0] / len(data)
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+
+class UserAgentFeatureCache:
+    """Features dérivées du user-agent, mémorisées par chaîne distincte (LRU borné).
+
+    Le trafic réel ne compte que quelques centaines de user-agents distincts:
+    l'entropie n'est calculée qu'une fois pour chacun.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def entropy(self, user_agent: bytes) -> float:
+        entropy = self._entries.get(user_agent)
+        if entropy is not None:
+            self.hits += 1
+            self._entries.move_to_end(user_agent)
+            return entropy
+
+        self.misses += 1
+        entropy = byte_entropy(user_agent)
+        self._entries[user_agent] = entropy
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entropy
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class TrainingRingBuffer:
+    """Données d'entraînement en colonnes float32 dans un tableau préalloué.
+
+    Chaque ajout écrit une ligne en place (O(1), aucune allocation) et
+    `view()` expose les lignes remplies sans copie. Une fois plein, le buffer
+    écrase la ligne la plus ancienne, ou, en mode réservoir, conserve un
+    échantillon uniforme de toutes les requêtes vues depuis le démarrage.
+    """
+
+    def __init__(self, n_features: int, capacity: int = 10000, reservoir: bool = False,
+                 seed: Optional[int] = None):
+        self.capacity = capacity
+        self.reservoir = reservoir
+        self.data = np.zeros((capacity, n_features), dtype=np.float32)
+        self.size = 0
+        self.head = 0  # Prochaine ligne écrasée en mode FIFO
+        self.seen = 0  # Nombre total de lignes proposées
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, row) -> bool:
+        """Ajouter une ligne de features; False si le réservoir l'a écartée"""
+        self.seen += 1
+
+        if self.size < self.capacity:
+            index = self.size
+            self.size += 1
+        elif self.reservoir:
+            # Algorithme R: la ligne remplace une case avec probabilité capacity/seen
+            index = self._random.randrange(self.seen)
+            if index >= self.capacity:
+                return False
+        else:
+            index = self.head
+            self.head = (self.head + 1) % self.capacity
+
+        # Affectation par tranche: accepte (n_features,) comme (1, n_features) sans reshape
+        self.data[index:index + 1] = row
+        return True
+
+    def view(self) -> np.ndarray:
+        """Lignes remplies, sans copie (l'ordre n'importe pas à l'entraînement)"""
+        return self.data[:self.size]
+
+    def snapshot(self) -> np.ndarray:
+        """Copie figée, à transmettre hors du processus"""
+        return self.view().copy()
+
+    def clear(self):
+        self.size = 0
+        self.head = 0
+        self.seen = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "seen": self.seen,
+            "reservoir": self.reservoir,
+            "memory_bytes": self.data.nbytes
+        }
+
+
+@dataclass(frozen=True)
+class ThreatModel:
+    """Modèle de menaces immuable: forêt, scaler et version échangés en bloc.
+
+    L'inférence lit une seule référence vers cet objet, donc un lot est
+    toujours évalué avec un couple (scaler, forêt) cohérent, même si un
+    nouveau modèle est publié pendant le calcul.
+    """
+    model: Any
+    scaler: Any
+    version: str
+    trained_at: datetime
+    fit_seconds: float = 0.0
+    samples: int = 0
+    path: Optional[str] = None
+
+
+def fit_threat_model(X: np.ndarray, model_params: Dict[str, Any], version: str,
+                     feature_names: List[str], artifact_dir: Optional[str] = None) -> ThreatModel:
+    """Entraîner scaler + IsolationForest et écrire l'artefact versionné.
+
+    Fonction de module (picklable) exécutée dans le pool de processus:
+    ni le fit ni joblib.dump ne tiennent le GIL du processus serveur.
+    """
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    model = IsolationForest(**model_params)
+    model.fit(scaler.fit_transform(X))
+    trained_at = datetime.utcnow()
+
+    path = None
+    if artifact_dir:
+        os.makedirs(artifact_dir, exist_ok=True)
+        path = os.path.join(artifact_dir, f"rimareum_ml_model-{version}.pkl")
+        temp_path = f"{path}.tmp"
+        joblib.dump({
+            'model': model,
+            'scaler': scaler,
+            'feature_names': feature_names,
+            'version': version,
+            'last_training': trained_at
+        }, temp_path)
+        os.replace(temp_path, path)
+
+    return ThreatModel(model=model, scaler=scaler, version=version, trained_at=trained_at,
+                       fit_seconds=time.perf_counter() - start, samples=len(X), path=path)
+
+
+def publish_model_artifact(artifact_path: str, current_path: str, keep: int = 3):
+    """Faire pointer `current_path` vers l'artefact (lien symbolique remplacé atomiquement)
+    et ne conserver que les `keep` artefacts les plus récents"""
+    temp_link = f"{current_path}.{os.getpid()}.tmp"
+    if os.path.lexists(temp_link):
+        os.remove(temp_link)
+    os.symlink(artifact_path, temp_link)
+    os.replace(temp_link, current_path)
+
+    artifact_dir = os.path.dirname(artifact_path)
+    artifacts = sorted(glob.glob(os.path.join(artifact_dir, "rimareum_ml_model-*.pkl")),
+                       key=os.path.getmtime, reverse=True)
+    for stale in artifacts[keep:]:
+        if stale != artifact_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+class BatchInferenceService:
+    """Regroupe les vecteurs de features des requêtes concurrentes en micro-lots.
+
+    Chaque requête dépose sa ligne et attend un future; le lot part dès
+    `max_batch_size` lignes ou après `batch_window` secondes, et il est
+    évalué en un seul appel vectorisé dans un thread dédié pour ne pas
+    bloquer la boucle asyncio pendant le calcul sklearn.
+    """
+
+    def __init__(self, score_batch: Callable[[np.ndarray], Tuple[np.ndarray, List[str]]],
+                 batch_window: float = 0.002, max_batch_size: int = 64):
+        self.score_batch = score_batch
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.stats = {"batches": 0, "rows": 0, "max_batch_seen": 0, "errors": 0,
+                      "scoring_seconds": 0.0}
+        self.batch_sizes = WindowedHistogram(buckets=BATCH_SIZE_BUCKETS)
+        self._rows: List[np.ndarray] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rimareum-ml")
+
+    async def predict(self, features: np.ndarray) -> Tuple[float, str]:
+        """Soumettre une ligne (1, n_features) et attendre son score"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append(features.reshape(-1))
+        self._futures.append(future)
+
+        if len(self._rows) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Envoyer le lot courant au thread d'inférence"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._rows:
+            return
+
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self._executor, self._score, np.vstack(rows))
+        task.add_done_callback(lambda done: self._resolve(done, futures))
+
+    def _score(self, batch: np.ndarray):
+        start = time.perf_counter()
+        scores, levels = self.score_batch(batch)
+        return scores, levels, time.perf_counter() - start
+
+    def _resolve(self, done: asyncio.Future, futures: List[asyncio.Future]):
+        """Résoudre le future de chaque requête du lot"""
+        try:
+            scores, levels, elapsed = done.result()
+            self.stats["scoring_seconds"] += elapsed
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.error(f"Erreur inférence ML par lot: {e}")
+            scores, levels = np.zeros(len(futures)), ["prediction_error"] * len(futures)
+
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(futures)
+        self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(futures))
+        self.batch_sizes.record(len(futures))
+
+        for future, score, level in zip(futures, scores, levels):
+            if not future.done():
+                future.set_result((float(score), level))
+
+    def get_stats(self) -> Dict[str, float]:
+        """Statistiques de regroupement (taille moyenne des lots, etc.)"""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "average_batch_size": self.stats["rows"] / batches if batches else 0.0,
+            "batch_window_ms": self.batch_window * 1000,
+            "max_batch_size": self.max_batch_size
+        }
@@ -10,7 +10,7 @@ import logging
 import re
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set, Any, Tuple
+from typing import Dict, List, Optional, Set, Any, Tuple, Callable, Awaitable
 from dataclasses import dataclass, field
 from collections import defaultdict, deque
 import ipaddress
@@ -29,6 +29,35 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from security_ml import (
+    BatchInferenceService,
+    ThreatModel,
+    TrainingRingBuffer,
+    UserAgentFeatureCache,
+    fit_threat_model,
+    publish_model_artifact,
+)
+from security_audit import AsyncAuditPipeline
+from security_chatbot import KeywordIndex, LanguageDetector, keyword_terms, question_terms, tokenize
+from security_credentials import KIND_API_KEY, KIND_SESSION, Credential, CredentialRegistry, VerifiedTokenCache
+from security_events import SecurityEventStore, parse_period
+from security_geoip import GeoIPDatabase, GeoIPRemoteEnrichment
+from security_llm import LLMError, LLMGateway, LLMProvider, SingleFlightCache, threat_fingerprint
+from security_metrics import LabeledCounter, MetricsRegistry
+from security_passwords import (
+    PasswordHashPool, PasswordHashingOverloaded, hash_password_sync, verify_password_sync
+)
+from security_openmetrics import counter, exposition, gauge, labeled_counter, windowed_histogram
+from security_pipeline import AnalysisStage, StagedPipeline
+from security_request import get_request_view, route_name
+from security_signatures import SignatureEngine
+from security_ratelimit import SharedWindowRateCounter, SlidingWindowRateLimiter
+from security_state import (
+    NAMESPACE_FAILED_AUTH, NAMESPACE_HONEYPOT_HITS, BlockExpiryScheduler, WAFStateBackend,
+    create_state_backend
+)
 
 # Configuration sécurité PHASE 7 - SENTINEL CORE
 SECURITY_CONFIG = {
@@ -36,14 +65,44 @@ SECURITY_CONFIG = {
     "max_requests_per_hour": 100,
     "blocked_countries": [],
     "allowed_countries": ["FR", "DZ", "AE"],  # France, Algérie, Dubaï
+    "geoip_database_path": os.environ.get("RIMAREUM_GEOIP_DB", "/tmp/rimareum_geoip.csv"),
+    "geoip_reload_interval": 30,  # Vérification du fichier source (secondes)
+    "geoip_remote_enrichment": os.environ.get("RIMAREUM_GEOIP_REMOTE", "0") == "1",
+    "geoip_remote_cache_size": 10000,
     "maintenance_mode": False,
     "auto_ban_threshold": 3,  # Plus strict pour Phase 7
-    "password_hash_rounds": 12,
+    "password_hash_rounds": int(os.environ.get("RIMAREUM_PASSWORD_HASH_ROUNDS", "12")),
+    # bcrypt hors boucle: pool borné, file d'attente limitée puis délestage (503)
+    "password_hash_workers": min(4, os.cpu_count() or 1),
+    "password_hash_queue_size": 64,
+    "password_hash_queue_timeout": 2.0,  # secondes d'attente maximale d'une place
     "api_key_expiration_hours": 2,
+    # Registre des clés API: bornes mémoire et persistance optionnelle (empreintes uniquement)
+    "api_key_store_path": os.environ.get("RIMAREUM_API_KEY_STORE"),
+    "api_key_max_total": 100000,
+    "api_key_max_per_user": 20,
+    # Sessions émises à la connexion (jetons Bearer), même registre borné et persistable
+    "session_ttl_seconds": 3600,
+    "session_store_path": os.environ.get("RIMAREUM_SESSION_STORE"),
+    "session_max_per_user": 20,
+    # Cache des identifiants vérifiés (invalidé à la révocation)
+    "auth_cache_ttl": 30,  # secondes
+    "auth_cache_size": 10000,
     "audit_interval_hours": 24,
     "ml_model_update_interval": 3600,  # 1 heure
+    "ml_model_path": "/tmp/rimareum_ml_model.pkl",
+    "ml_model_dir": "/tmp/rimareum_ml_models",  # Artefacts versionnés
+    "ml_model_keep": 3,
+    "ml_training_capacity": 10000,  # Lignes de features conservées
+    "ml_training_reservoir": False,  # Échantillon uniforme depuis le démarrage
+    "ml_retrain_every": 1000,  # Réentraîner toutes les N requêtes
+    "ml_user_agent_cache_size": 4096,
     "continuous_monitoring": True,
     "reactive_mode": True,
+    # Métriques en continu: fenêtre glissante des percentiles et séries (routes) max
+    "metrics_window_seconds": 60,
+    "metrics_max_routes": 256,
+    "metrics_refresh_interval": 10,  # Rafraîchissement de performance_metrics (secondes)
     "gpt_security_enabled": True,
     "multilingual_support": ["fr", "en", "ar", "es"],
     "intelligence_level": "HIGH",
@@ -180,8 +239,59 @@ SECURITY_CONFIG = {
     ],
     "high_risk_countries": ["CN", "RU", "KP", "IR", "IQ", "AF", "SY"],
     "ml_threat_threshold": 0.8,
+    "ml_batch_window_ms": 2,  # Fenêtre de regroupement des inférences ML
+    "ml_batch_max_size": 64,
+    # Pipeline d'analyse EnhancedWAF: pondération et budget de latence par étage
+    "analysis_stage_weights": {
+        "ml": 0.3,
+        "behavioral": 0.25,
+        "evasion": 0.2,
+        "zero_day": 0.15,
+        "prediction": 0.1
+    },
+    "analysis_stage_budgets_ms": {
+        "ml": 50,
+        "behavioral": 20,
+        "evasion": 20,
+        "zero_day": 20,
+        "prediction": 20
+    },
     "gpt_analysis_threshold": 0.9,
+    # Passerelle LLM partagée: fournisseurs compatibles chat completions (activés par leur clé)
+    "llm_providers": [
+        provider for provider in (
+            {"name": "openai", "base_url": os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+             "model": "gpt-4o", "api_key": os.environ.get("OPENAI_API_KEY"), "max_concurrency": 16},
+            {"name": "deepseek", "base_url": os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1"),
+             "model": "deepseek-chat", "api_key": os.environ.get("DEEPSEEK_API_KEY"), "max_concurrency": 8},
+        ) if provider["api_key"]
+    ],
+    "llm_timeout": 30.0,  # secondes par appel
+    "llm_queue_timeout": 5.0,  # attente maximale d'une place par fournisseur
+    "llm_max_connections": 100,
+    "llm_dedupe_ttl": 0.0,  # 0: fusion des prompts identiques en cours uniquement
+    "llm_failure_threshold": 5,  # échecs consécutifs avant ouverture du disjoncteur
+    "llm_reset_timeout": 30.0,
+    # Cache des analyses GPT par empreinte de menace (TTL + LRU, vol unique)
+    "gpt_analysis_cache_ttl": 600,  # secondes
+    "gpt_analysis_cache_size": 1024,
     "auto_block_duration": 86400,  # 24 heures
+    "waf_body_scan_max_bytes": 64 * 1024,  # corps analysé par les signatures (au-delà: ignoré)
+    "block_persistence_path": os.environ.get("RIMAREUM_BLOCK_STORE", "/tmp/rimareum_blocks.json"),
+    # Journal d'audit: file bornée + segments binaires rotatifs
+    "audit_log_dir": os.environ.get("RIMAREUM_AUDIT_DIR", "/tmp/rimareum_audit"),
+    "audit_queue_size": 10000,
+    "audit_batch_size": 500,
+    "audit_flush_interval": 0.5,  # secondes
+    "audit_segment_max_bytes": 64 * 1024 * 1024,
+    "audit_segment_max_age": 3600,  # secondes
+    "audit_max_segments": 48,
+    "audit_compress": True,
+    "audit_queue_policy": "drop",  # "drop" ou "wait"
+    "audit_backpressure_timeout": 0.005,  # secondes
+    # Magasin d'événements interrogeable (SQLite/WAL), alimenté par le pipeline d'audit
+    "event_store_path": os.environ.get("RIMAREUM_EVENT_DB", "/tmp/rimareum_events.db"),
+    "event_store_retention_days": 30,
     "escalation_threshold": 5,
     "learning_mode_duration": 604800,  # 7 jours
     "sentinel_response_time": 0.1,  # 100ms max response
@@ -197,9 +307,86 @@ SECURITY_CONFIG = {
     "credential_stuffing_detection": True,
     "advanced_evasion_detection": True,
     "zero_day_protection": True,
-    "threat_hunting_mode": True
+    "threat_hunting_mode": True,
+    # État WAF partagé entre workers: "memory" (processus), "shm" (hôte) ou "redis" (réseau)
+    "state_backend": os.environ.get("RIMAREUM_WAF_STATE_BACKEND", "memory"),
+    "state_backend_url": os.environ.get("RIMAREUM_WAF_STATE_URL"),
+    "state_flush_interval": 0.05,  # 50ms entre deux synchronisations par lot
+    # Relecture de la blocklist réseau (un HGETALL par worker et par intervalle)
+    "state_refresh_interval": float(os.environ.get("RIMAREUM_WAF_STATE_REFRESH", "1.0"))
 }
 
+# Moteur de signatures partagé (compilé une seule fois)
+signature_engine = SignatureEngine(SECURITY_CONFIG["suspicious_patterns"])
+
+# Base GeoIP locale partagée (mmap) et enrichissement distant optionnel
+geoip_database = GeoIPDatabase(
+    SECURITY_CONFIG["geoip_database_path"],
+    reload_interval=SECURITY_CONFIG["geoip_reload_interval"]
+)
+geoip_enrichment = GeoIPRemoteEnrichment(
+    cache_size=SECURITY_CONFIG["geoip_remote_cache_size"]
+) if SECURITY_CONFIG["geoip_remote_enrichment"] else None
+
+# Backend d'état WAF (blocklist, compteurs) partagé par toutes les instances du processus
+waf_state = create_state_backend(
+    SECURITY_CONFIG["state_backend"],
+    SECURITY_CONFIG["state_backend_url"],
+    refresh_interval=SECURITY_CONFIG["state_refresh_interval"],
+    flush_interval=SECURITY_CONFIG["state_flush_interval"]
+)
+
+
+# Expiration des blocages temporaires (une seule tâche, persistée entre redémarrages)
+block_scheduler = BlockExpiryScheduler(waf_state, SECURITY_CONFIG["block_persistence_path"])
+
+# Magasin d'événements indexé (audit, intelligence, rapports)
+event_store = SecurityEventStore(
+    SECURITY_CONFIG["event_store_path"],
+    retention_days=SECURITY_CONFIG["event_store_retention_days"]
+)
+
+# Passerelle LLM partagée (GPTSecurityAssistant, MultilingualChatbot)
+llm_gateway = LLMGateway(
+    [LLMProvider(timeout=SECURITY_CONFIG["llm_timeout"], queue_timeout=SECURITY_CONFIG["llm_queue_timeout"],
+                 **provider)
+     for provider in SECURITY_CONFIG["llm_providers"]],
+    max_connections=SECURITY_CONFIG["llm_max_connections"],
+    dedupe_ttl=SECURITY_CONFIG["llm_dedupe_ttl"],
+    failure_threshold=SECURITY_CONFIG["llm_failure_threshold"],
+    reset_timeout=SECURITY_CONFIG["llm_reset_timeout"]
+)
+
+# Pool de hachage bcrypt partagé (hors boucle asyncio, admission bornée)
+password_pool = PasswordHashPool(
+    rounds=SECURITY_CONFIG["password_hash_rounds"],
+    workers=SECURITY_CONFIG["password_hash_workers"],
+    max_queue=SECURITY_CONFIG["password_hash_queue_size"],
+    queue_timeout=SECURITY_CONFIG["password_hash_queue_timeout"]
+)
+
+# Pipeline d'audit partagé par toutes les instances de SecurityAuditLogger
+audit_pipeline = AsyncAuditPipeline(
+    SECURITY_CONFIG["audit_log_dir"],
+    queue_size=SECURITY_CONFIG["audit_queue_size"],
+    batch_size=SECURITY_CONFIG["audit_batch_size"],
+    flush_interval=SECURITY_CONFIG["audit_flush_interval"],
+    max_segment_bytes=SECURITY_CONFIG["audit_segment_max_bytes"],
+    max_segment_age=SECURITY_CONFIG["audit_segment_max_age"],
+    max_segments=SECURITY_CONFIG["audit_max_segments"],
+    compress=SECURITY_CONFIG["audit_compress"],
+    policy=SECURITY_CONFIG["audit_queue_policy"],
+    backpressure_timeout=SECURITY_CONFIG["audit_backpressure_timeout"],
+    sinks=[event_store.insert_many]
+)
+
+
+def create_rate_limiter(state: WAFStateBackend):
+    """Rate limiter local O(1), ou partagé si l'état WAF l'est"""
+    if state.shared:
+        return SharedWindowRateCounter(state)
+    return SlidingWindowRateLimiter()
+
 @dataclass
 class SecurityEvent:
     """Événement de sécurité Phase 7"""
@@ -232,50 +419,85 @@ class MLThreatDetector:
     """Détecteur de menaces basé sur Machine Learning"""
     
     def __init__(self):
-        self.model = IsolationForest(
-            contamination=0.1,
-            random_state=42,
-            n_estimators=100
+        self.model_params = {
+            "contamination": 0.1,
+            "random_state": 42,
+            "n_estimators": 100
+        }
+        # Modèle actif: remplacé en bloc par référence, jamais modifié en place
+        self.active_model = ThreatModel(
+            model=IsolationForest(**self.model_params),
+            scaler=StandardScaler(),
+            version="1.0.0",
+            trained_at=datetime.utcnow()
         )
-        self.scaler = StandardScaler()
         self.is_trained = False
-        self.training_data = []
         self.feature_names = [
             'request_rate', 'payload_size', 'url_length', 'param_count',
             'header_count', 'user_agent_entropy', 'path_depth', 'suspicious_patterns',
             'geo_risk_score', 'reputation_score', 'time_of_day', 'request_interval'
         ]
+        self.training_data = TrainingRingBuffer(
+            len(self.feature_names),
+            capacity=SECURITY_CONFIG["ml_training_capacity"],
+            reservoir=SECURITY_CONFIG["ml_training_reservoir"]
+        )
         self.threat_cache = {}
-        self.model_version = "1.0.0"
-        self.last_training = datetime.utcnow()
+        self.user_agent_cache = UserAgentFeatureCache(SECURITY_CONFIG["ml_user_agent_cache_size"])
+        self.model_path = SECURITY_CONFIG["ml_model_path"]
+        self.model_dir = SECURITY_CONFIG["ml_model_dir"]
+        
+        # Réentraînement hors boucle asyncio
+        self._training_executor: Optional[ProcessPoolExecutor] = None
+        self._retrain_task: Optional[asyncio.Task] = None
+        self.training_metrics = {
+            "retrains": 0,
+            "retrain_failures": 0,
+            "retrains_skipped": 0,
+            "model_swaps": 0,
+            "last_fit_seconds": 0.0,
+            "total_fit_seconds": 0.0,
+            "last_swap": None
+        }
+        self.swap_events = deque(maxlen=20)
+    
+    @property
+    def model(self):
+        return self.active_model.model
+    
+    @property
+    def scaler(self):
+        return self.active_model.scaler
+    
+    @property
+    def model_version(self) -> str:
+        return self.active_model.version
+    
+    @property
+    def last_training(self) -> datetime:
+        return self.active_model.trained_at
     
     def extract_features(self, request: Request, client_ip: str, context: Dict) -> np.ndarray:
         """Extraire les caractéristiques d'une requête pour le ML"""
         try:
-            # Caractéristiques de base
-            url = str(request.url)
-            headers = dict(request.headers)
-            user_agent = headers.get('user-agent', '')
-            
-            # Calculs des métriques
-            request_rate = context.get('request_rate', 0)
-            payload_size = len(str(request.body) if hasattr(request, 'body') else '')
-            url_length = len(url)
-            param_count = len(request.query_params)
-            header_count = len(headers)
-            user_agent_entropy = self._calculate_entropy(user_agent)
-            path_depth = url.count('/')
-            suspicious_patterns = self._count_suspicious_patterns(url + ' ' + user_agent)
-            geo_risk_score = context.get('geo_risk_score', 0)
-            reputation_score = context.get('reputation_score', 0)
-            time_of_day = datetime.utcnow().hour
-            request_interval = context.get('request_interval', 0)
+            # Vue partagée: octets bruts du scope, URL construite une seule fois
+            view = get_request_view(request)
+            user_agent = view.user_agent_bytes
             
             features = np.array([
-                request_rate, payload_size, url_length, param_count,
-                header_count, user_agent_entropy, path_depth, suspicious_patterns,
-                geo_risk_score, reputation_score, time_of_day, request_interval
-            ])
+                context.get('request_rate', 0),
+                view.content_length,
+                view.url_length,
+                view.param_count,
+                view.header_count,
+                self.user_agent_cache.entropy(user_agent),
+                view.path_depth,
+                view.signature_count(signature_engine, view.url + ' ' + view.user_agent),
+                context.get('geo_risk_score', 0),
+                context.get('reputation_score', 0),
+                int(time.time() // 3600) % 24,
+                context.get('request_interval', 0)
+            ], dtype=float)
             
             return features.reshape(1, -1)
             
@@ -283,32 +505,9 @@ class MLThreatDetector:
             logging.error(f"Erreur extraction features ML: {e}")
             return np.zeros((1, len(self.feature_names)))
     
-    def _calculate_entropy(self, text: str) -> float:
-        """Calculer l'entropie d'un texte"""
-        if not text:
-            return 0.0
-        
-        # Compter les caractères
-        char_counts = {}
-        for char in text:
-            char_counts[char] = char_counts.get(char, 0) + 1
-        
-        # Calculer l'entropie
-        entropy = 0.0
-        length = len(text)
-        for count in char_counts.values():
-            probability = count / length
-            entropy -= probability * np.log2(probability)
-        
-        return entropy
-    
     def _count_suspicious_patterns(self, text: str) -> int:
         """Compter les patterns suspects dans un texte"""
-        count = 0
-        for pattern in SECURITY_CONFIG["suspicious_patterns"]:
-            if re.search(pattern, text, re.IGNORECASE):
-                count += 1
-        return count
+        return signature_engine.count(text)
     
     def predict_threat(self, features: np.ndarray) -> Tuple[float, str]:
         """Prédire si une requête est une menace"""
@@ -316,68 +515,99 @@ class MLThreatDetector:
             return 0.0, "model_not_trained"
         
         try:
-            # Normaliser les features
-            features_scaled = self.scaler.transform(features)
-            
-            # Prédiction
-            anomaly_score = self.model.decision_function(features_scaled)[0]
-            is_anomaly = self.model.predict(features_scaled)[0] == -1
-            
-            # Convertir en score de menace (0-1)
-            threat_score = max(0.0, min(1.0, (1.0 - anomaly_score) / 2.0))
-            
-            threat_level = "high" if threat_score > 0.8 else "medium" if threat_score > 0.5 else "low"
-            
-            return threat_score, threat_level
+            threat_scores, threat_levels = self.predict_threat_batch(features)
+            return float(threat_scores[0]), threat_levels[0]
             
         except Exception as e:
             logging.error(f"Erreur prédiction ML: {e}")
             return 0.0, "prediction_error"
     
-    def train_model(self, training_data: List[Dict]):
-        """Entraîner le modèle ML"""
-        if len(training_data) < 100:
+    def predict_threat_batch(self, features: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """Évaluer un lot (n, 12) en un seul appel vectorisé"""
+        if not self.is_trained:
+            return np.zeros(len(features)), ["model_not_trained"] * len(features)
+        
+        # Une seule lecture du modèle actif: le lot reste cohérent pendant un échange
+        active_model = self.active_model
+        
+        # Normaliser les features puis un seul passage dans la forêt:
+        # le label se déduit du score de décision (predict() == -1 <=> score < 0)
+        features_scaled = active_model.scaler.transform(features)
+        anomaly_scores = active_model.model.decision_function(features_scaled)
+        
+        # Convertir en score de menace (0-1)
+        threat_scores = np.clip((1.0 - anomaly_scores) / 2.0, 0.0, 1.0)
+        
+        threat_levels = [
+            "high" if score > 0.8 else "medium" if score > 0.5 else "low"
+            for score in threat_scores
+        ]
+        
+        return threat_scores, threat_levels
+    
+    def train_model(self, training_data: Optional[List[Dict]] = None):
+        """Entraîner le modèle ML (synchrone, hors serveur)"""
+        if training_data is None:
+            X = self.training_data.view()
+        else:
+            X = self._training_matrix(training_data)
+        
+        if len(X) < 100:
             return False
         
         try:
-            # Préparer les données
-            features_list = []
-            for data in training_data:
-                features = np.array([
-                    data.get('request_rate', 0),
-                    data.get('payload_size', 0),
-                    data.get('url_length', 0),
-                    data.get('param_count', 0),
-                    data.get('header_count', 0),
-                    data.get('user_agent_entropy', 0),
-                    data.get('path_depth', 0),
-                    data.get('suspicious_patterns', 0),
-                    data.get('geo_risk_score', 0),
-                    data.get('reputation_score', 0),
-                    data.get('time_of_day', 0),
-                    data.get('request_interval', 0)
-                ])
-                features_list.append(features)
-            
-            X = np.array(features_list)
-            
-            # Normaliser les données
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Entraîner le modèle
-            self.model.fit(X_scaled)
-            self.is_trained = True
-            self.last_training = datetime.utcnow()
-            
-            # Sauvegarder le modèle
-            self.save_model()
-            
+            trained_model = fit_threat_model(
+                X, self.model_params,
+                self._next_version(), self.feature_names, self.model_dir
+            )
+            self._swap_model(trained_model)
             return True
             
         except Exception as e:
             logging.error(f"Erreur entraînement ML: {e}")
             return False
     
+    def _training_matrix(self, training_data: List[Dict]) -> np.ndarray:
+        """Construire la matrice d'entraînement (n, 12)"""
+        return np.array([
+            [data.get(name, 0) for name in self.feature_names]
+            for data in training_data
+        ], dtype=float)
+    
+    def _next_version(self) -> str:
+        """Version d'artefact unique et ordonnée dans le temps"""
+        return f"1.{self.training_metrics['retrains'] + 1}.{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+    
+    def _swap_model(self, trained_model: ThreatModel):
+        """Publier un nouveau modèle: une seule affectation de référence"""
+        previous_version = self.active_model.version if self.is_trained else None
+        self.active_model = trained_model
+        self.is_trained = True
+        
+        self.training_metrics["retrains"] += 1
+        self.training_metrics["model_swaps"] += 1
+        self.training_metrics["last_fit_seconds"] = trained_model.fit_seconds
+        self.training_metrics["total_fit_seconds"] += trained_model.fit_seconds
+        self.training_metrics["last_swap"] = datetime.utcnow().isoformat()
+        self.swap_events.append({
+            "timestamp": self.training_metrics["last_swap"],
+            "from_version": previous_version,
+            "to_version": trained_model.version,
+            "fit_seconds": round(trained_model.fit_seconds, 4),
+            "samples": trained_model.samples
+        })
+        logging.info(f"Modèle ML {trained_model.version} actif "
+                     f"({trained_model.samples} échantillons, fit {trained_model.fit_seconds:.2f}s)")
+        
+        try:
+            if trained_model.path:
+                publish_model_artifact(trained_model.path, self.model_path,
+                                       SECURITY_CONFIG["ml_model_keep"])
+            else:
+                self.save_model()
+        except Exception as e:
+            logging.error(f"Erreur publication modèle: {e}")
+    
     def save_model(self):
         """Sauvegarder le modèle ML"""
         try:
@@ -388,47 +618,96 @@ class MLThreatDetector:
                 'version': self.model_version,
                 'last_training': self.last_training
             }
-            joblib.dump(model_data, '/tmp/rimareum_ml_model.pkl')
+            temp_path = f"{self.model_path}.tmp"
+            joblib.dump(model_data, temp_path)
+            os.replace(temp_path, self.model_path)
         except Exception as e:
             logging.error(f"Erreur sauvegarde modèle: {e}")
     
     def load_model(self):
         """Charger le modèle ML"""
         try:
-            if os.path.exists('/tmp/rimareum_ml_model.pkl'):
-                model_data = joblib.load('/tmp/rimareum_ml_model.pkl')
-                self.model = model_data['model']
-                self.scaler = model_data['scaler']
+            if os.path.exists(self.model_path):
+                model_data = joblib.load(self.model_path)
                 self.feature_names = model_data['feature_names']
-                self.model_version = model_data['version']
-                self.last_training = model_data['last_training']
+                self.active_model = ThreatModel(
+                    model=model_data['model'],
+                    scaler=model_data['scaler'],
+                    version=model_data['version'],
+                    trained_at=model_data['last_training'],
+                    path=os.path.realpath(self.model_path)
+                )
                 self.is_trained = True
                 return True
         except Exception as e:
             logging.error(f"Erreur chargement modèle: {e}")
         return False
     
-    def update_training_data(self, request_data: Dict):
-        """Mettre à jour les données d'entraînement"""
-        self.training_data.append(request_data)
-        
-        # Limite de données en mémoire
-        if len(self.training_data) > 10000:
-            self.training_data = self.training_data[-5000:]
-        
-        # Réentraîner périodiquement
-        if len(self.training_data) % 1000 == 0:
-            asyncio.create_task(self._retrain_model())
+    def update_training_data(self, features: np.ndarray):
+        """Ajouter un vecteur de features (1, 12) aux données d'entraînement"""
+        self.training_data.append(features)
+        
+        # Réentraîner périodiquement (un seul entraînement à la fois)
+        if self.training_data.seen % SECURITY_CONFIG["ml_retrain_every"] == 0:
+            if self._retrain_task is not None and not self._retrain_task.done():
+                self.training_metrics["retrains_skipped"] += 1
+                return
+            self._retrain_task = asyncio.create_task(self._retrain_model())
+    
+    def _get_training_executor(self) -> ProcessPoolExecutor:
+        """Pool d'un processus (spawn: pas de fork d'un serveur multi-thread)"""
+        if self._training_executor is None:
+            self._training_executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._training_executor
     
     async def _retrain_model(self):
-        """Réentraîner le modèle en arrière-plan"""
-        await asyncio.sleep(1)  # Éviter le blocage
-        self.train_model(self.training_data)
+        """Réentraîner le modèle dans un processus séparé puis l'échanger"""
+        if len(self.training_data) < 100:
+            return
+        
+        try:
+            # Copie figée des données: l'entraînement ne voit pas les ajouts suivants
+            X = self.training_data.snapshot()
+            loop = asyncio.get_running_loop()
+            trained_model = await loop.run_in_executor(
+                self._get_training_executor(), fit_threat_model,
+                X, self.model_params, self._next_version(), self.feature_names, self.model_dir
+            )
+            self._swap_model(trained_model)
+            
+        except Exception as e:
+            self.training_metrics["retrain_failures"] += 1
+            logging.error(f"Erreur réentraînement ML: {e}")
+            # Un pool cassé (processus tué) est recréé au prochain entraînement
+            if self._training_executor is not None:
+                self._training_executor.shutdown(wait=False)
+                self._training_executor = None
+    
+    def get_training_stats(self) -> Dict:
+        """Métriques d'entraînement et d'échange de modèle"""
+        return {
+            **self.training_metrics,
+            "model_version": self.model_version,
+            "is_trained": self.is_trained,
+            "training_samples": len(self.training_data),
+            "training_buffer": self.training_data.get_stats(),
+            "user_agent_cache": self.user_agent_cache.get_stats(),
+            "retrain_in_progress": self._retrain_task is not None and not self._retrain_task.done(),
+            "recent_swaps": list(self.swap_events)
+        }
 
 class GPTSecurityAssistant:
-    """Assistant de sécurité GPT-4 pour l'analyse et les recommandations"""
+    """Assistant de sécurité GPT-4 pour l'analyse et les recommandations
+
+    Les analyses sont mises en cache par empreinte de menace (type, gabarit de
+    chemin, sévérité); les événements concurrents d'une même empreinte
+    partagent un seul appel au LLM. `llm` (coroutine prompt, contexte -> analyse)
+    permet de brancher un client réel ou un FakeLLM local.
+    """
     
-    def __init__(self):
+    def __init__(self, llm: Optional[Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None):
         self.api_key = os.environ.get('OPENAI_API_KEY')
         self.model = "gpt-4o"
         self.system_prompt = """
@@ -443,10 +722,19 @@ class GPTSecurityAssistant:
         
         Répondez toujours en français et soyez précis et actionnable.
         """
-        self.analysis_cache = {}
-        self.threat_history = []
+        self.analysis_cache = SingleFlightCache(
+            ttl=SECURITY_CONFIG["gpt_analysis_cache_ttl"],
+            maxsize=SECURITY_CONFIG["gpt_analysis_cache_size"]
+        )
+        # Contexte récent des prompts; l'historique complet est dans event_store
+        self.threat_history = deque(maxlen=50)
         self.recommendations = []
-        self.active = self.api_key is not None
+        # Appel à l'API GPT-4 via la passerelle partagée, simulation sans fournisseur configuré
+        self.active = self.api_key is not None or llm is not None
+        if llm is None:
+            llm = (self._gateway_analysis if llm_gateway.has_provider("openai")
+                   else lambda prompt, context: self._simulate_gpt_analysis(context))
+        self.llm = llm
     
     async def analyze_threat(self, security_event: SecurityEvent) -> Dict[str, Any]:
         """Analyser une menace avec GPT-4"""
@@ -465,16 +753,40 @@ class GPTSecurityAssistant:
                 "ml_score": security_event.ml_score,
                 "timestamp": security_event.timestamp.isoformat()
             }
+            fingerprint = threat_fingerprint(
+                security_event.threat_type, security_event.request_path, security_event.severity,
+                security_event.ml_score, security_event.method
+            )
+            
+            # Une analyse par empreinte: le prompt n'est construit qu'en cas d'absence du cache
+            analysis = await self.analysis_cache.get_or_compute(
+                fingerprint, lambda: self.llm(self._build_prompt(context), context)
+            )
             
-            # Créer le prompt
-            prompt = f"""
+            # Mettre à jour l'historique
+            self.threat_history.append({
+                "timestamp": datetime.utcnow().isoformat(),
+                "event": context,
+                "fingerprint": fingerprint,
+                "analysis": analysis
+            })
+            
+            return analysis
+            
+        except Exception as e:
+            logging.error(f"Erreur analyse GPT-4: {e}")
+            return {"analysis": f"Erreur d'analyse: {str(e)}", "recommendation": "Analyse manuelle requise"}
+
+    def _build_prompt(self, context: Dict[str, Any]) -> str:
+        """Créer le prompt d'analyse (événement + historique récent)"""
+        return f"""
             Analysez cet événement de sécurité RIMAREUM et fournissez une analyse détaillée :
             
             ÉVÉNEMENT :
             {json.dumps(context, indent=2)}
             
             HISTORIQUE RÉCENT :
-            {json.dumps(self.threat_history[-5:], indent=2) if self.threat_history else "Aucun historique"}
+            {json.dumps(list(self.threat_history)[-5:], indent=2) if self.threat_history else "Aucun historique"}
             
             Fournissez une analyse JSON avec :
             1. "threat_analysis" : Analyse détaillée de la menace
@@ -485,32 +797,20 @@ class GPTSecurityAssistant:
             6. "monitoring_focus" : Éléments à surveiller
             7. "threat_prediction" : Prédiction d'évolution
             """
-            
-            # Appel à l'API GPT-4 (simulation si pas de clé)
-            if self.api_key:
-                # Ici, vous intégreriez l'appel réel à l'API OpenAI
-                # Pour l'instant, simulation intelligente
-                analysis = await self._simulate_gpt_analysis(context)
-            else:
-                analysis = await self._simulate_gpt_analysis(context)
-            
-            # Mettre à jour l'historique
-            self.threat_history.append({
-                "timestamp": datetime.utcnow().isoformat(),
-                "event": context,
-                "analysis": analysis
-            })
-            
-            # Limiter l'historique
-            if len(self.threat_history) > 100:
-                self.threat_history = self.threat_history[-50:]
-            
-            return analysis
-            
-        except Exception as e:
-            logging.error(f"Erreur analyse GPT-4: {e}")
-            return {"analysis": f"Erreur d'analyse: {str(e)}", "recommendation": "Analyse manuelle requise"}
     
+    async def _gateway_analysis(self, prompt: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyse par le fournisseur "openai" de la passerelle (repli: simulation)"""
+        try:
+            result = await llm_gateway.complete(
+                "openai",
+                [{"role": "system", "content": self.system_prompt}, {"role": "user", "content": prompt}],
+                response_format={"type": "json_object"}
+            )
+            return json.loads(result["content"])
+        except (LLMError, ValueError) as e:
+            logging.warning(f"Analyse GPT-4 indisponible, simulation: {e}")
+            return await self._simulate_gpt_analysis(context)
+
     async def _simulate_gpt_analysis(self, context: Dict) -> Dict[str, Any]:
         """Simulation intelligente d'analyse GPT-4"""
         threat_type = context.get("threat_type", "unknown")
@@ -599,20 +899,16 @@ class GPTSecurityAssistant:
     async def generate_security_report(self, time_period: str = "24h") -> Dict[str, Any]:
         """Générer un rapport de sécurité intelligent"""
         try:
-            # Analyser l'historique récent
-            recent_threats = self.threat_history[-50:] if self.threat_history else []
-            
-            # Statistiques
-            threat_counts = {}
-            severity_distribution = {}
-            
-            for threat in recent_threats:
-                threat_type = threat.get("event", {}).get("threat_type", "unknown")
-                severity = threat.get("analysis", {}).get("severity_assessment", 0)
-                
-                threat_counts[threat_type] = threat_counts.get(threat_type, 0) + 1
-                severity_range = "high" if severity >= 8 else "medium" if severity >= 5 else "low"
-                severity_distribution[severity_range] = severity_distribution.get(severity_range, 0) + 1
+            # Analyses récentes (score) et statistiques de toute la période (event_store)
+            recent_threats = list(self.threat_history)
+            since = time.time() - parse_period(time_period)
+            summary = await event_store.run("summary", since, top=5)
+            distribution = summary["distribution"]
+            
+            threat_counts = distribution["by_type"]
+            severity_distribution = {
+                severity.lower(): count for severity, count in distribution["by_severity"].items()
+            }
             
             # Recommandations globales
             global_recommendations = [
@@ -631,9 +927,12 @@ class GPTSecurityAssistant:
             
             return {
                 "period": time_period,
-                "total_threats": len(recent_threats),
+                "total_threats": distribution["total"],
+                "blocked_threats": distribution["blocked"],
                 "threat_distribution": threat_counts,
                 "severity_distribution": severity_distribution,
+                "hourly_distribution": distribution["hourly"],
+                "top_offenders": summary["top_offenders"],
                 "global_recommendations": global_recommendations,
                 "threat_predictions": threat_predictions,
                 "security_score": self._calculate_security_score(recent_threats),
@@ -690,64 +989,68 @@ class GPTSecurityAssistant:
         }
 
 class PasswordHasher:
-    """Gestionnaire de hashage des mots de passe SHA256 + bcrypt"""
+    """Gestionnaire de hashage des mots de passe SHA256 + bcrypt
+
+    Les variantes synchrones bloquent le thread appelant (~250ms à 12 tours);
+    depuis un handler async, utiliser hash_password_async / verify_password_async
+    qui passent par le pool borné `password_pool`.
+    """
     
     @staticmethod
     def hash_password(password: str) -> str:
         """Hasher un mot de passe avec SHA256 + bcrypt"""
-        # Première étape: SHA256
-        sha256_hash = hashlib.sha256(password.encode()).hexdigest()
-        
-        # Deuxième étape: bcrypt avec salt
-        salt = bcrypt.gensalt(rounds=SECURITY_CONFIG["password_hash_rounds"])
-        bcrypt_hash = bcrypt.hashpw(sha256_hash.encode(), salt)
-        
-        return bcrypt_hash.decode()
+        return hash_password_sync(password, SECURITY_CONFIG["password_hash_rounds"])
     
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
         """Vérifier un mot de passe"""
+        return verify_password_sync(password, hashed_password)
+
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hasher hors boucle; 503 si le pool est saturé"""
         try:
-            # Recalculer SHA256
-            sha256_hash = hashlib.sha256(password.encode()).hexdigest()
-            
-            # Vérifier avec bcrypt
-            return bcrypt.checkpw(sha256_hash.encode(), hashed_password.encode())
-        except Exception:
-            return False
+            return await password_pool.hash_password(password)
+        except PasswordHashingOverloaded as e:
+            raise PasswordHasher._overloaded(e)
+
+    @staticmethod
+    async def verify_password_async(password: str, hashed_password: str) -> bool:
+        """Vérifier hors boucle; 503 si le pool est saturé"""
+        try:
+            return await password_pool.verify_password(password, hashed_password)
+        except PasswordHashingOverloaded as e:
+            raise PasswordHasher._overloaded(e)
+
+    @staticmethod
+    def _overloaded(error: PasswordHashingOverloaded) -> HTTPException:
+        logging.warning(f"Délestage authentification: {error}")
+        return HTTPException(
+            status_code=503,
+            detail={"error": "Authentication temporarily overloaded", "reason": error.reason},
+            headers={"Retry-After": str(max(1, round(error.retry_after)))}
+        )
 
 class CountryBlocker:
     """Système de blocage géographique Phase 7"""
     
     def __init__(self):
-        self.ip_cache = {}
-        self.cache_expiry = 3600  # 1 heure
+        self.geoip = geoip_database
+        self.enrichment = geoip_enrichment
         self.threat_intel = ThreatIntelligence()
     
     async def get_country_code(self, ip: str) -> Optional[str]:
-        """Obtenir le code pays d'une IP via ipapi.co"""
-        if ip in self.ip_cache:
-            cached_data = self.ip_cache[ip]
-            if time.time() - cached_data["timestamp"] < self.cache_expiry:
-                return cached_data["country"]
-        
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"https://ipapi.co/{ip}/country/")
-                if response.status_code == 200:
-                    country_code = response.text.strip()
-                    
-                    # Mettre en cache
-                    self.ip_cache[ip] = {
-                        "country": country_code,
-                        "timestamp": time.time()
-                    }
-                    
-                    return country_code
-        except Exception as e:
-            logging.error(f"Erreur géolocalisation IP {ip}: {e}")
-        
-        return None
+        """Obtenir le code pays d'une IP via la base GeoIP locale"""
+        country_code = self.geoip.lookup(ip)
+        if country_code is not None or self.enrichment is None:
+            return country_code
+        
+        # IP inconnue localement: résolution distante en arrière-plan,
+        # la requête courante continue sans attendre
+        country_code = self.enrichment.get(ip)
+        if country_code is None:
+            self.enrichment.request(ip)
+        return country_code
     
     async def is_country_allowed(self, ip: str) -> bool:
         """Vérifier si le pays est autorisé"""
@@ -774,9 +1077,30 @@ class CountryBlocker:
         if country_code.upper() in SECURITY_CONFIG["allowed_countries"]:
             return 0.0
         
+        # Autres pays
+        return 0.3
+    
+    def get_stats(self) -> Dict:
+        """Statistiques de géolocalisation"""
+        return {
+            "geoip": self.geoip.get_stats(),
+            "remote_enrichment": self.enrichment.get_stats() if self.enrichment else None
+        }
+        
 class MultilingualChatbot:
     """Chatbot multilingue Phase 7 - FR, EN, AR, ES"""
     
+    # Intentions par ordre de priorité et leurs mots-clés (toutes langues)
+    INTENT_KEYWORDS = (
+        ("greeting", ("bonjour", "hello", "مرحبا", "hola")),
+        ("help", ("aide", "help", "مساعدة", "ayuda")),
+        ("security", ("sécurité", "security", "أمان", "seguridad")),
+        ("products", ("produit", "product", "منتج", "producto")),
+        ("dao", ("dao", "gouvernance", "governance", "حوكمة", "gobernanza")),
+        ("contact", ("contact", "تواصل", "contacto")),
+        ("goodbye", ("au revoir", "goodbye", "مع السلامة", "adiós")),
+    )
+    
     def __init__(self):
         self.supported_languages = SECURITY_CONFIG["multilingual_support"]
         self.language_patterns = {
@@ -858,25 +1182,24 @@ class MultilingualChatbot:
                 "nft": "Nuestros NFT RIMAR brindan acceso a beneficios exclusivos y gobernanza."
             }
         }
+        
+        self.language_detector = LanguageDetector(self.language_patterns)
+        self._build_indexes()
     
     def detect_language(self, text: str) -> str:
-        """Détecter la langue d'un texte"""
-        text_lower = text.lower()
-        
-        # Compter les matches pour chaque langue
-        language_scores = {}
-        for lang, pattern in self.language_patterns.items():
-            matches = len(re.findall(pattern, text_lower))
-            language_scores[lang] = matches
-        
-        # Retourner la langue avec le plus de matches
-        if language_scores:
-            detected_lang = max(language_scores, key=language_scores.get)
-            if language_scores[detected_lang] > 0:
-                return detected_lang
-        
-        # Langue par défaut
-        return "fr"
+        """Détecter la langue d'un texte (un seul parcours pour toutes les langues)"""
+        return self.language_detector.detect(text)
+    
+    def _build_indexes(self):
+        """Index inversé par langue: FAQ de la langue + intentions (construit une seule fois)"""
+        self.indexes = {}
+        for lang in self.supported_languages:
+            index = KeywordIndex()
+            for rank, (intent, keywords) in enumerate(self.INTENT_KEYWORDS, start=1):
+                index.add(f"intent:{intent}", keyword_terms(keywords), intent, rank=rank)
+            for question, answer in self.faq_database.get(lang, {}).items():
+                index.add(f"faq:{question}", question_terms(question), answer, rank=0)
+            self.indexes[lang] = index
     
     def get_response(self, message: str, language: str = None) -> Dict[str, str]:
         """Obtenir une réponse du chatbot"""
@@ -886,66 +1209,48 @@ class MultilingualChatbot:
         if language not in self.supported_languages:
             language = "fr"  # Fallback
         
-        message_lower = message.lower()
-        
-        # Recherche dans la FAQ
-        for question, answer in self.faq_database[language].items():
-            if any(word in message_lower for word in question.split()):
-                return {
-                    "message": answer,
-                    "language": language,
-                    "type": "faq"
-                }
-        
-        # Réponses contextuelles
-        if any(word in message_lower for word in ["bonjour", "hello", "مرحبا", "hola"]):
+        # Meilleur candidat: la FAQ passe avant les intentions (par priorité), puis le score départage
+        entry = self.indexes[language].best(tokenize(message))
+        if entry is None:
             return {
-                "message": self.responses[language]["greeting"],
-                "language": language,
-                "type": "greeting"
-            }
-        elif any(word in message_lower for word in ["aide", "help", "مساعدة", "ayuda"]):
-            return {
-                "message": self.responses[language]["help"],
-                "language": language,
-                "type": "help"
-            }
-        elif any(word in message_lower for word in ["sécurité", "security", "أمان", "seguridad"]):
-            return {
-                "message": self.responses[language]["security"],
-                "language": language,
-                "type": "security"
-            }
-        elif any(word in message_lower for word in ["produit", "product", "منتج", "producto"]):
-            return {
-                "message": self.responses[language]["products"],
-                "language": language,
-                "type": "products"
-            }
-        elif any(word in message_lower for word in ["dao", "gouvernance", "governance", "حوكمة", "gobernanza"]):
-            return {
-                "message": self.responses[language]["dao"],
-                "language": language,
-                "type": "dao"
-            }
-        elif any(word in message_lower for word in ["contact", "تواصل", "contacto"]):
-            return {
-                "message": self.responses[language]["contact"],
+                "message": self.responses[language]["error"],
                 "language": language,
-                "type": "contact"
+                "type": "error"
             }
-        elif any(word in message_lower for word in ["au revoir", "goodbye", "مع السلامة", "adiós"]):
+        
+        if entry.rank == 0:
             return {
-                "message": self.responses[language]["goodbye"],
+                "message": entry.payload,
                 "language": language,
-                "type": "goodbye"
-            }
-        else:
-            return {
-                "message": self.responses[language]["error"],
-                "language": language,
-                "type": "error"
+                "type": "faq"
             }
+        
+        return {
+            "message": self.responses[language][entry.payload],
+            "language": language,
+            "type": entry.payload
+        }
+    
+    async def get_response_async(self, message: str, language: str = None) -> Dict[str, str]:
+        """Réponse du chatbot; une question hors FAQ est confiée au LLM s'il est configuré"""
+        response = self.get_response(message, language)
+        if response["type"] != "error" or not llm_gateway.has_provider("openai"):
+            return response
+        
+        try:
+            result = await llm_gateway.complete("openai", self.llm_messages(message, response["language"]))
+            return {"message": result["content"], "language": response["language"], "type": "llm"}
+        except LLMError as e:
+            logging.warning(f"Chatbot LLM indisponible: {e}")
+            return response
+
+    def llm_messages(self, message: str, language: str) -> List[Dict[str, str]]:
+        """Messages chat completions pour une question hors FAQ"""
+        return [
+            {"role": "system", "content": f"You are the RIMAREUM assistant. {self.responses[language]['help']} "
+                                          f"Answer briefly in the user's language ({language})."},
+            {"role": "user", "content": message}
+        ]
     
     def get_supported_languages(self) -> List[str]:
         """Obtenir les langues supportées"""
@@ -955,6 +1260,7 @@ class MultilingualChatbot:
         """Ajouter une entrée FAQ"""
         if language in self.faq_database:
             self.faq_database[language][question.lower()] = answer
+            self.indexes[language].add(f"faq:{question.lower()}", question_terms(question), answer, rank=0)
     
     def get_stats(self) -> Dict[str, int]:
         """Obtenir les statistiques du chatbot"""
@@ -981,6 +1287,12 @@ class ContinuousMonitor:
             "peak_response_time": 0.0,
             "throughput": 0
         }
+        # Latences par route (histogrammes glissants) et débit décroissant, mémoire constante
+        self.request_metrics = MetricsRegistry(
+            window=SECURITY_CONFIG["metrics_window_seconds"],
+            max_series=SECURITY_CONFIG["metrics_max_routes"]
+        )
+        self.pipelines: List[StagedPipeline] = []
         self.alerts = []
     
     async def start_monitoring(self):
@@ -1115,26 +1427,49 @@ class ContinuousMonitor:
         # Implémentation de la mise à jour ML
         pass
     
+    def record_request(self, route: str, processing_time: float, blocked: bool = False,
+                       error: bool = False):
+        """Enregistrer la latence d'une requête analysée (O(1), sans allocation)"""
+        self.request_metrics.observe(route, processing_time, error)
+        self.monitoring_stats["total_requests"] += 1
+        if blocked:
+            self.monitoring_stats["threats_blocked"] += 1
+    
+    def attach_pipeline(self, pipeline: StagedPipeline):
+        """Exposer les latences par étage d'un pipeline d'analyse WAF"""
+        if pipeline not in self.pipelines:
+            self.pipelines.append(pipeline)
+    
+    def get_performance_snapshot(self) -> Dict:
+        """Percentiles et débit globaux, calculés à la demande sur la fenêtre glissante"""
+        total = self.request_metrics.total.snapshot()
+        latency, throughput = total["latency"], total["throughput"]
+        return {
+            "average_response_time": latency["avg_ms"] / 1000,
+            "peak_response_time": latency["max_ms"] / 1000,
+            "throughput": throughput["total"],
+            "p50_ms": latency["p50_ms"],
+            "p95_ms": latency["p95_ms"],
+            "p99_ms": latency["p99_ms"],
+            "rps_m1": throughput["rps_m1"],
+            "rps_m5": throughput["rps_m5"],
+            "rps_m15": throughput["rps_m15"],
+            "window_seconds": latency["window_seconds"]
+        }
+    
     async def _performance_monitoring(self):
         """Surveillance des performances"""
+        interval = SECURITY_CONFIG["metrics_refresh_interval"]
         while self.monitoring_active:
             try:
-                # Mesurer les performances
-                response_times = []
-                throughput = 0
-                
-                # Mettre à jour les métriques
-                self.performance_metrics.update({
-                    "average_response_time": sum(response_times) / len(response_times) if response_times else 0,
-                    "peak_response_time": max(response_times) if response_times else 0,
-                    "throughput": throughput
-                })
+                # Instantané périodique (les lectures directes passent par get_performance_snapshot)
+                self.performance_metrics.update(self.get_performance_snapshot())
                 
-                await asyncio.sleep(60)  # Vérifier chaque minute
+                await asyncio.sleep(interval)
                 
             except Exception as e:
                 logging.error(f"Erreur monitoring performances: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(interval)
     
     async def _health_check(self):
         """Vérification de santé du système"""
@@ -1222,9 +1557,18 @@ class ContinuousMonitor:
             "monitoring_active": self.monitoring_active,
             "reactive_mode": self.reactive_mode,
             "stats": self.monitoring_stats.copy(),
-            "performance": self.performance_metrics.copy(),
+            "performance": self.get_performance_snapshot(),
+            "routes": self.request_metrics.snapshot()["series"],
+            "waf_stages": [pipeline.get_stats() for pipeline in self.pipelines],
             "alerts_count": len(self.alerts),
-            "queue_size": self.threat_queue.qsize()
+            "queue_size": self.threat_queue.qsize(),
+            "ml_training": ml_detector.get_training_stats(),
+            "audit": audit_pipeline.get_stats(),
+            "event_store": event_store.get_stats(),
+            "ml_inference": ml_inference.get_stats(),
+            "password_hashing": password_pool.get_stats(),
+            "gpt_analysis_cache": gpt_assistant.analysis_cache.get_stats(),
+            "llm_gateway": llm_gateway.get_stats()
         }
 
 # Instances globales Phase 7
@@ -1236,21 +1580,28 @@ continuous_monitor = ContinuousMonitor()
 # Charger le modèle ML au démarrage
 ml_detector.load_model()
 
+# Inférence ML par micro-lots partagée par les requêtes concurrentes
+ml_inference = BatchInferenceService(
+    ml_detector.predict_threat_batch,
+    batch_window=SECURITY_CONFIG["ml_batch_window_ms"] / 1000,
+    max_batch_size=SECURITY_CONFIG["ml_batch_max_size"]
+)
+
 # Démarrer la surveillance continue
 class EnhancedWAF:
     """Web Application Firewall Phase 7 avec ML et surveillance continue"""
     
     def __init__(self):
-        self.blocked_ips: Set[str] = set()
+        self.state = waf_state
+        self.block_scheduler = block_scheduler
         self.audit_logger = SecurityAuditLogger()
         self.country_blocker = CountryBlocker()
         self.ml_detector = ml_detector
+        self.ml_inference = ml_inference
         self.gpt_assistant = gpt_assistant
         self.continuous_monitor = continuous_monitor
         self.maintenance_mode = SECURITY_CONFIG["maintenance_mode"]
-        self.request_counts = defaultdict(list)
-        self.failed_auth_attempts = defaultdict(int)
-        self.honeypot_hits = defaultdict(int)
+        self.rate_limiter = create_rate_limiter(self.state)
         self.threat_intelligence = ThreatIntelligence()
         self.behavioral_baselines = {}
         self.adaptive_thresholds = {}
@@ -1262,10 +1613,46 @@ class EnhancedWAF:
         self.advanced_threats = []
         self.zero_day_signatures = []
         self.hunt_mode_active = SECURITY_CONFIG["threat_hunting_mode"]
+        self.analysis_pipeline = self._build_analysis_pipeline()
+        self.continuous_monitor.attach_pipeline(self.analysis_pipeline)
         
         # Initialiser les seuils adaptatifs
         self._initialize_adaptive_thresholds()
     
+    def _build_analysis_pipeline(self) -> StagedPipeline:
+        """Étages d'analyse indépendants, exécutés en parallèle"""
+        weights = SECURITY_CONFIG["analysis_stage_weights"]
+        budgets = SECURITY_CONFIG["analysis_stage_budgets_ms"]
+        
+        def stage(name, run, score, neutral):
+            return AnalysisStage(name=name, run=run, score=score, weight=weights[name],
+                                 budget=budgets[name] / 1000, neutral=neutral)
+        
+        return StagedPipeline([
+            stage("ml", self._ml_analysis,
+                  lambda result: result.get("threat_score", 0.0),
+                  {"threat_score": 0.0, "threat_level": "unknown"}),
+            stage("behavioral", self._behavioral_analysis,
+                  lambda result: result.get("behavior_score", 0.0),
+                  {"behavior_score": 0.0, "session_anomaly": False, "credential_stuffing": False}),
+            stage("evasion", self._advanced_evasion_detection,
+                  lambda result: result.get("evasion_score", 0.0),
+                  {"evasion_score": 0.0, "techniques": []}),
+            stage("zero_day", self._zero_day_detection,
+                  lambda result: result.get("zero_day_score", 0.0),
+                  {"zero_day_score": 0.0, "indicators": [], "heuristic_score": 0.0}),
+            stage("prediction", self._predictive_analysis,
+                  lambda result: max(result.get("historical_prediction", 0.0),
+                                     result.get("trend_prediction", 0.0),
+                                     result.get("threat_intel_prediction", 0.0)),
+                  {"historical_prediction": 0.0, "trend_prediction": 0.0,
+                   "threat_intel_prediction": 0.0}),
+        ])
+    
+    def get_pipeline_stats(self) -> Dict:
+        """Latences par étage du pipeline d'analyse"""
+        return self.analysis_pipeline.get_stats()
+    
     def _initialize_adaptive_thresholds(self):
         """Initialiser les seuils adaptatifs"""
         base_thresholds = {
@@ -1280,34 +1667,26 @@ class EnhancedWAF:
     
     async def process_request(self, request: Request) -> Dict:
         """Traitement avancé des requêtes Phase 7"""
-        start_time = time.time()
         client_ip = self._get_client_ip(request)
         user_agent = request.headers.get("user-agent", "")
         
         try:
             # Vérifications de base
-            if await self._basic_checks(client_ip, request):
-                return await self._create_block_response(client_ip, "basic_check_failed")
-            
-            # Analyse ML en temps réel
-            ml_result = await self._ml_analysis(request, client_ip)
-            
-            # Analyse comportementale
-            behavioral_result = await self._behavioral_analysis(request, client_ip)
-            
-            # Détection d'évasion avancée
-            evasion_result = await self._advanced_evasion_detection(request, client_ip)
+            block_reason = await self._basic_checks(client_ip, request)
+            if block_reason:
+                return await self._create_block_response(client_ip, block_reason)
             
-            # Détection zéro-day
-            zero_day_result = await self._zero_day_detection(request, client_ip)
-            
-            # Analyse prédictive
-            prediction_result = await self._predictive_analysis(request, client_ip)
+            # Analyses ML, comportementale, évasion, zero-day et prédictive en parallèle,
+            # interrompues dès que le score cumulé dépasse le seuil de blocage
+            endpoint = request.url.path
+            block_threshold = self.adaptive_thresholds.get(endpoint, {}).get("ml_threat", 0.7)
+            analysis = await self.analysis_pipeline.run(request, client_ip, block_threshold)
+            ml_result = analysis.results["ml"]
             
             # Calcul du score de menace global
             threat_score = await self._calculate_global_threat_score(
-                ml_result, behavioral_result, evasion_result, 
-                zero_day_result, prediction_result
+                ml_result, analysis.results["behavioral"], analysis.results["evasion"],
+                analysis.results["zero_day"], analysis.results["prediction"]
             )
             
             # Décision de blocage
@@ -1326,11 +1705,8 @@ class EnhancedWAF:
             await self._advanced_logging(request, client_ip, user_agent, threat_score, gpt_analysis)
             
             # Mise à jour des modèles d'apprentissage
-            await self._update_learning_models(request, client_ip, threat_score)
-            
-            # Mise à jour des métriques de performance
-            processing_time = time.time() - start_time
-            await self._update_performance_metrics(processing_time)
+            await self._update_learning_models(request, client_ip, threat_score,
+                                               ml_result.get("feature_vector"))
             
             return await self._create_response(client_ip, threat_score, should_block, gpt_analysis)
             
@@ -1338,27 +1714,68 @@ class EnhancedWAF:
             logging.error(f"Erreur traitement WAF: {e}")
             return await self._create_error_response(client_ip, str(e))
     
-    async def _basic_checks(self, client_ip: str, request: Request) -> bool:
-        """Vérifications de base"""
+    async def _basic_checks(self, client_ip: str, request: Request) -> Optional[str]:
+        """Vérifications de base: raison du blocage, None si la requête passe"""
         # Mode maintenance
         if self.maintenance_mode:
-            return True
+            return "maintenance_mode"
         
         # IP bloquée
-        if client_ip in self.blocked_ips:
-            return True
+        if self.state.is_blocked(client_ip):
+            return "ip_blocked"
         
         # Vérification géographique
         if not await self.country_blocker.is_country_allowed(client_ip):
             await self._block_ip_with_reason(client_ip, "geo_blocked")
-            return True
+            return "geo_blocked"
         
         # Honeypot
         if await self._check_honeypot(request):
+            self.state.increment(NAMESPACE_HONEYPOT_HITS, client_ip)
             await self._block_ip_with_reason(client_ip, "honeypot_hit")
-            return True
+            return "honeypot_hit"
         
-        return False
+        # Rate limiting (la requête est comptée ici; request_rate lit ensuite ces fenêtres)
+        if await self._analyze_rate_limiting(client_ip) > 0.7:
+            await self._block_ip_with_reason(client_ip, "rate_limit_exceeded")
+            return "rate_limit_exceeded"
+        
+        # Signatures d'attaque (URL, en-têtes, corps) et user agents suspects
+        if await self._analyze_request_content(request) > 0.7:
+            await self._block_ip_with_reason(client_ip, "suspicious_content")
+            return "suspicious_content"
+        
+        return None
+    
+    async def _analyze_rate_limiting(self, ip: str) -> float:
+        """Analyser le rate limiting avec limites plus strictes"""
+        # Enregistrer la requête et lire les fenêtres minute/heure en O(1)
+        recent_requests, hourly_requests = self.rate_limiter.hit(ip)
+        
+        if recent_requests > SECURITY_CONFIG["max_requests_per_minute"]:
+            return 0.9
+        
+        if hourly_requests > SECURITY_CONFIG["max_requests_per_hour"]:
+            return 0.8
+        
+        return 0.0
+    
+    async def _analyze_request_content(self, request: Request) -> float:
+        """Analyser le contenu de la requête avec patterns étendus"""
+        view = get_request_view(request)
+        body = await view.body_text(SECURITY_CONFIG["waf_body_scan_max_bytes"])
+        content = " ".join([view.url, view.headers_text, body])
+        
+        # Vérifier les patterns suspects
+        risk_score = 0.3 * view.signature_count(signature_engine, content)
+        
+        # Vérifier les user agents suspects
+        user_agent = view.user_agent.lower()
+        for bot_agent in SECURITY_CONFIG["bot_user_agents"]:
+            if bot_agent in user_agent:
+                risk_score += 0.3
+        
+        return min(risk_score, 1.0)
     
     async def _ml_analysis(self, request: Request, client_ip: str) -> Dict:
         """Analyse ML de la requête"""
@@ -1369,13 +1786,17 @@ class EnhancedWAF:
             # Extraction des features
             features = self.ml_detector.extract_features(request, client_ip, context)
             
-            # Prédiction
-            threat_score, threat_level = self.ml_detector.predict_threat(features)
+            # Prédiction (regroupée avec les requêtes concurrentes)
+            if self.ml_detector.is_trained:
+                threat_score, threat_level = await self.ml_inference.predict(features)
+            else:
+                threat_score, threat_level = 0.0, "model_not_trained"
             
             return {
                 "threat_score": threat_score,
                 "threat_level": threat_level,
                 "features": features.tolist() if hasattr(features, 'tolist') else [],
+                "feature_vector": features,
                 "model_version": self.ml_detector.model_version
             }
             
@@ -1503,13 +1924,7 @@ class EnhancedWAF:
         """Calculer le score de menace global"""
         try:
             # Pondération des différents scores
-            weights = {
-                "ml": 0.3,
-                "behavioral": 0.25,
-                "evasion": 0.2,
-                "zero_day": 0.15,
-                "prediction": 0.1
-            }
+            weights = SECURITY_CONFIG["analysis_stage_weights"]
             
             # Calcul du score pondéré
             total_score = (
@@ -1557,7 +1972,7 @@ class EnhancedWAF:
     async def _build_request_context(self, request: Request, client_ip: str) -> Dict:
         """Construire le contexte de la requête"""
         return {
-            "request_rate": len(self.request_counts.get(client_ip, [])),
+            "request_rate": self.rate_limiter.hourly_count(client_ip),
             "geo_risk_score": await self.country_blocker.get_geo_risk_score(client_ip),
             "reputation_score": self.threat_intelligence.ip_reputation.get(client_ip, 0.0),
             "request_interval": 0.0  # Calculer l'intervalle entre requêtes
@@ -1680,54 +2095,33 @@ class EnhancedWAF:
         except Exception as e:
             logging.error(f"Erreur logging avancé: {e}")
     
-    async def _update_learning_models(self, request: Request, client_ip: str, threat_score: float):
+    async def _update_learning_models(self, request: Request, client_ip: str, threat_score: float,
+                                      features: Optional[np.ndarray] = None):
         """Mettre à jour les modèles d'apprentissage"""
         try:
-            # Données pour l'apprentissage ML
-            training_data = {
-                "request_rate": len(self.request_counts.get(client_ip, [])),
-                "payload_size": len(str(request.body) if hasattr(request, 'body') else ''),
-                "url_length": len(str(request.url)),
-                "param_count": len(request.query_params),
-                "header_count": len(request.headers),
-                "user_agent_entropy": 0.0,  # Calculer l'entropie
-                "path_depth": str(request.url.path).count('/'),
-                "suspicious_patterns": 0,  # Compter les patterns suspects
-                "geo_risk_score": await self.country_blocker.get_geo_risk_score(client_ip),
-                "reputation_score": self.threat_intelligence.ip_reputation.get(client_ip, 0.0),
-                "time_of_day": datetime.utcnow().hour,
-                "request_interval": 0.0,
-                "threat_score": threat_score
-            }
+            # Les features déjà extraites pour l'inférence servent aussi à l'apprentissage
+            if features is None:
+                view = get_request_view(request)
+                features = np.array([
+                    self.rate_limiter.hourly_count(client_ip),
+                    view.content_length,
+                    view.url_length,
+                    view.param_count,
+                    view.header_count,
+                    0.0,  # user_agent_entropy
+                    view.path_depth,
+                    0,  # suspicious_patterns
+                    await self.country_blocker.get_geo_risk_score(client_ip),
+                    self.threat_intelligence.ip_reputation.get(client_ip, 0.0),
+                    datetime.utcnow().hour,
+                    0.0  # request_interval
+                ])
             
-            self.ml_detector.update_training_data(training_data)
+            self.ml_detector.update_training_data(features)
             
         except Exception as e:
             logging.error(f"Erreur mise à jour modèles: {e}")
     
-    async def _update_performance_metrics(self, processing_time: float):
-        """Mettre à jour les métriques de performance"""
-        try:
-            current_metrics = self.continuous_monitor.performance_metrics
-            
-            # Mettre à jour le temps de réponse moyen
-            if current_metrics["average_response_time"] == 0:
-                current_metrics["average_response_time"] = processing_time
-            else:
-                current_metrics["average_response_time"] = (
-                    current_metrics["average_response_time"] * 0.9 + processing_time * 0.1
-                )
-            
-            # Mettre à jour le pic de temps de réponse
-            if processing_time > current_metrics["peak_response_time"]:
-                current_metrics["peak_response_time"] = processing_time
-            
-            # Incrémenter le throughput
-            current_metrics["throughput"] = current_metrics.get("throughput", 0) + 1
-            
-        except Exception as e:
-            logging.error(f"Erreur métriques performance: {e}")
-    
     async def _create_response(self, client_ip: str, threat_score: float, should_block: bool, 
                               gpt_analysis: Dict) -> Dict:
         """Créer la réponse WAF"""
@@ -1764,8 +2158,8 @@ class EnhancedWAF:
         }
     
     async def _block_ip_with_reason(self, client_ip: str, reason: str):
-        """Bloquer une IP avec raison"""
-        self.blocked_ips.add(client_ip)
+        """Bloquer une IP avec raison (déblocage automatique géré par le planificateur d'expiration)"""
+        self.block_scheduler.ban(client_ip, SECURITY_CONFIG["auto_block_duration"], reason)
         logging.warning(f"IP {client_ip} bloquée: {reason}")
     
     async def _check_honeypot(self, request: Request) -> bool:
@@ -1788,9 +2182,6 @@ class EnhancedWAF:
         
         return request.client.host if request.client else "unknown"
 
-# Instance globale WAF Phase 7
-waf_instance = EnhancedWAF()
-
 # Garder l'ancienne instance pour compatibilité
 class WAF(EnhancedWAF):
     """Alias pour compatibilité"""
@@ -1818,182 +2209,15 @@ class WAF(EnhancedWAF):
         except Exception:
             return False
 
-class CountryBlocker:
-    """Système de blocage géographique"""
-    
-    def __init__(self):
-        self.ip_cache = {}
-        self.cache_expiry = 3600  # 1 heure
-    
-    async def get_country_code(self, ip: str) -> Optional[str]:
-        """Obtenir le code pays d'une IP via ipapi.co"""
-        if ip in self.ip_cache:
-            cached_data = self.ip_cache[ip]
-            if time.time() - cached_data["timestamp"] < self.cache_expiry:
-                return cached_data["country"]
-        
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"https://ipapi.co/{ip}/country/")
-                if response.status_code == 200:
-                    country_code = response.text.strip()
-                    
-                    # Mettre en cache
-                    self.ip_cache[ip] = {
-                        "country": country_code,
-                        "timestamp": time.time()
-                    }
-                    
-                    return country_code
-        except Exception as e:
-            logging.error(f"Erreur géolocalisation IP {ip}: {e}")
-        
-        return None
-    
-    async def is_country_allowed(self, ip: str) -> bool:
-        """Vérifier si le pays est autorisé"""
-        if not SECURITY_CONFIG["allowed_countries"]:
-            return True
-        
-        country_code = await self.get_country_code(ip)
-        if not country_code:
-            return True  # Autoriser si impossible de déterminer
-        
-        return country_code.upper() in SECURITY_CONFIG["allowed_countries"]
-
-class RimareumGuardianAI:
-    """Intelligence artificielle de surveillance RIMAREUM"""
-    
-    def __init__(self):
-        self.request_patterns = defaultdict(list)
-        self.behavioral_model = {
-            "normal_patterns": set(),
-            "suspicious_patterns": set(),
-            "learning_mode": True
-        }
-        self.threat_scores = defaultdict(float)
-    
-    async def analyze_request(self, request: Request, client_ip: str) -> Dict:
-        """Analyser une requête avec l'IA Guardian"""
-        
-        # Extraire les caractéristiques de la requête
-        features = self._extract_features(request, client_ip)
-        
-        # Analyser les patterns
-        pattern_score = await self._analyze_patterns(features)
-        
-        # Analyser le comportement
-        behavior_score = await self._analyze_behavior(client_ip, features)
-        
-        # Score final
-        ai_risk_score = max(pattern_score, behavior_score)
-        
-        # Apprentissage automatique
-        if self.behavioral_model["learning_mode"]:
-            await self._learn_from_request(features, ai_risk_score)
-        
-        return {
-            "ai_risk_score": ai_risk_score,
-            "pattern_score": pattern_score,
-            "behavior_score": behavior_score,
-            "features": features
-        }
-    
-    def _extract_features(self, request: Request, client_ip: str) -> Dict:
-        """Extraire les caractéristiques d'une requête"""
-        return {
-            "path": request.url.path,
-            "method": request.method,
-            "user_agent": request.headers.get("user-agent", ""),
-            "content_length": request.headers.get("content-length", 0),
-            "referer": request.headers.get("referer", ""),
-            "accept": request.headers.get("accept", ""),
-            "ip": client_ip,
-            "timestamp": time.time()
-        }
-    
-    async def _analyze_patterns(self, features: Dict) -> float:
-        """Analyser les patterns de requête"""
-        risk_score = 0.0
-        
-        # Vérifier les patterns suspects connus
-        request_content = " ".join([
-            features["path"],
-            features["user_agent"],
-            features["referer"]
-        ])
-        
-        for pattern in SECURITY_CONFIG["suspicious_patterns"]:
-            if re.search(pattern, request_content, re.IGNORECASE):
-                risk_score += 0.3
-        
-        # Vérifier les honeypots
-        for honeypot in SECURITY_CONFIG["honeypot_endpoints"]:
-            if honeypot in features["path"]:
-                risk_score += 0.8
-        
-        return min(risk_score, 1.0)
-    
-    async def _analyze_behavior(self, client_ip: str, features: Dict) -> float:
-        """Analyser le comportement de l'utilisateur"""
-        now = time.time()
-        
-        # Ajouter aux patterns récents
-        self.request_patterns[client_ip].append({
-            "timestamp": now,
-            "path": features["path"],
-            "method": features["method"]
-        })
-        
-        # Nettoyer les anciens patterns (garder 1 heure)
-        self.request_patterns[client_ip] = [
-            p for p in self.request_patterns[client_ip]
-            if now - p["timestamp"] < 3600
-        ]
-        
-        recent_requests = self.request_patterns[client_ip]
-        
-        # Analyser la fréquence
-        if len(recent_requests) > 50:  # Trop de requêtes
-            return 0.7
-        
-        # Analyser la diversité des chemins
-        unique_paths = set(r["path"] for r in recent_requests)
-        if len(unique_paths) > 20:  # Trop de chemins différents
-            return 0.6
-        
-        return 0.0
-    
-    async def _learn_from_request(self, features: Dict, risk_score: float):
-        """Apprentissage automatique à partir des requêtes"""
-        pattern_key = f"{features['method']}:{features['path']}"
-        
-        if risk_score < 0.3:
-            self.behavioral_model["normal_patterns"].add(pattern_key)
-        elif risk_score > 0.7:
-            self.behavioral_model["suspicious_patterns"].add(pattern_key)
-
 class SecurityAuditLogger:
     """Journal d'audit sécurisé"""
     
     def __init__(self):
-        self.logger = logging.getLogger("rimareum_security")
-        self.logger.setLevel(logging.INFO)
-        
-        # Handler pour fichier de log
-        try:
-            handler = logging.FileHandler("/tmp/rimareum_security.log")
-        except:
-            handler = logging.StreamHandler()  # Fallback to console
-            
-        formatter = logging.Formatter(
-            '%(asctime)s - RIMAREUM_SEC - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # Écriture par lots en arrière-plan: aucune E/S disque dans le chemin de la requête
+        self.pipeline = audit_pipeline
     
     async def log_event(self, event: SecurityEvent):
-        """Enregistrer un événement de sécurité"""
+        """Enregistrer un événement de sécurité (non bloquant)"""
         log_data = {
             "timestamp": event.timestamp.isoformat(),
             "ip": event.ip_address,
@@ -2006,7 +2230,7 @@ class SecurityAuditLogger:
             "details": event.details
         }
         
-        self.logger.info(json.dumps(log_data))
+        await self.pipeline.submit(log_data)
         
         # Alertes critiques
         if event.severity == "HIGH":
@@ -2028,230 +2252,89 @@ class SecurityAuditLogger:
         
         print(alert_message)  # Console pour le moment
 
-class WAF:
-    """Web Application Firewall intelligent PHASE 6"""
-    
-    def __init__(self):
-        self.blocked_ips: Set[str] = set()
-        self.audit_logger = SecurityAuditLogger()
-        self.country_blocker = CountryBlocker()
-        self.guardian_ai = RimareumGuardianAI()
-        self.maintenance_mode = SECURITY_CONFIG["maintenance_mode"]
-        self.request_counts = defaultdict(list)
-        self.failed_auth_attempts = defaultdict(int)
-        self.honeypot_hits = defaultdict(int)
-    
-    async def process_request(self, request: Request) -> Dict:
-        """Traiter et analyser une requête avec toutes les protections PHASE 6"""
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
-        
-        # Vérification mode maintenance
-        if self.maintenance_mode:
-            return await self._handle_maintenance_mode(client_ip, request)
-        
-        # Vérification IP bloquée
-        if client_ip in self.blocked_ips:
-            return await self._handle_blocked_ip(client_ip, request)
-        
-        # Vérification géographique
-        if not await self.country_blocker.is_country_allowed(client_ip):
-            await self._block_ip_temporarily(client_ip, "GEO_BLOCK")
-            return await self._handle_geo_blocked(client_ip, request)
-        
-        # Vérification honeypot
-        if await self._check_honeypot(request):
-            await self._block_ip_temporarily(client_ip, "HONEYPOT")
-            return await self._handle_honeypot_hit(client_ip, request)
-        
-        # Analyse rate limiting
-        rate_risk = await self._analyze_rate_limiting(client_ip)
-        
-        # Détection patterns suspects
-        content_risk = await self._analyze_request_content(request)
-        
-        # Analyse IA Guardian
-        ai_analysis = await self.guardian_ai.analyze_request(request, client_ip)
-        
-        # Score de risque total
-        total_risk = max(rate_risk, content_risk, ai_analysis["ai_risk_score"])
-        
-        should_block = total_risk > 0.7
-        
-        # Blocage automatique si score élevé
-        if should_block:
-            await self._block_ip_temporarily(client_ip, "HIGH_RISK")
-        
-        # Logging
-        await self._log_security_event(request, client_ip, user_agent, total_risk, should_block)
-        
-        return {
-            "allowed": not should_block,
-            "risk_score": total_risk,
-            "ip": client_ip,
-            "ai_analysis": ai_analysis,
-            "reasons": self._get_block_reasons(rate_risk, content_risk, ai_analysis["ai_risk_score"]) if should_block else []
-        }
-    
-    async def _check_honeypot(self, request: Request) -> bool:
-        """Vérifier si la requête touche un honeypot"""
-        for honeypot in SECURITY_CONFIG["honeypot_endpoints"]:
-            if honeypot in request.url.path:
-                return True
-        return False
-    
-    async def _handle_honeypot_hit(self, client_ip: str, request: Request) -> Dict:
-        """Gérer une tentative d'accès à un honeypot"""
-        self.honeypot_hits[client_ip] += 1
-        
-        return {
-            "allowed": False,
-            "risk_score": 1.0,
-            "ip": client_ip,
-            "reasons": ["Honeypot access detected - IP blocked"]
-        }
-    
-    async def _handle_geo_blocked(self, client_ip: str, request: Request) -> Dict:
-        """Gérer un blocage géographique"""
-        return {
-            "allowed": False,
-            "risk_score": 0.9,
-            "ip": client_ip,
-            "reasons": ["Access from restricted geographical location"]
-        }
-    
-    async def _block_ip_temporarily(self, client_ip: str, reason: str):
-        """Bloquer temporairement une IP"""
-        self.blocked_ips.add(client_ip)
-        
-        # Programmer le déblocage automatique (24h)
-        async def unblock_later():
-            await asyncio.sleep(86400)  # 24 heures
-            self.blocked_ips.discard(client_ip)
-        
-        asyncio.create_task(unblock_later())
-    
-    def _get_block_reasons(self, rate_risk: float, content_risk: float, ai_risk: float) -> List[str]:
-        """Obtenir les raisons du blocage"""
-        reasons = []
-        
-        if rate_risk > 0.7:
-            reasons.append("Rate limit exceeded")
-        
-        if content_risk > 0.7:
-            reasons.append("Suspicious content detected")
-        
-        if ai_risk > 0.7:
-            reasons.append("AI Guardian threat detection")
-        
-        return reasons
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Obtenir l'IP réelle du client"""
-        # Vérifier les headers de proxy
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    async def _analyze_rate_limiting(self, ip: str) -> float:
-        """Analyser le rate limiting avec limites plus strictes"""
-        now = time.time()
-        
-        # Nettoyer les anciennes requêtes
-        self.request_counts[ip] = [t for t in self.request_counts[ip] if now - t < 3600]
-        
-        # Ajouter la requête actuelle
-        self.request_counts[ip].append(now)
-        
-        # Compter les requêtes récentes (1 minute)
-        recent_requests = sum(1 for t in self.request_counts[ip] if now - t < 60)
-        
-        if recent_requests > SECURITY_CONFIG["max_requests_per_minute"]:
-            return 0.9
-        
-        # Compter les requêtes par heure
-        hourly_requests = len(self.request_counts[ip])
-        
-        if hourly_requests > SECURITY_CONFIG["max_requests_per_hour"]:
-            return 0.8
-        
-        return 0.0
-    
-    async def _analyze_request_content(self, request: Request) -> float:
-        """Analyser le contenu de la requête avec patterns étendus"""
-        content = " ".join([
-            str(request.url),
-            str(request.headers),
-            request.headers.get("user-agent", "")
-        ])
-        
-        risk_score = 0.0
-        
-        # Vérifier les patterns suspects
-        for pattern in SECURITY_CONFIG["suspicious_patterns"]:
-            if re.search(pattern, content, re.IGNORECASE):
-                risk_score += 0.2
-        
-        # Vérifier les user agents suspects
-        user_agent = request.headers.get("user-agent", "").lower()
-        for bot_agent in SECURITY_CONFIG["bot_user_agents"]:
-            if bot_agent in user_agent:
-                risk_score += 0.3
-        
-        return min(risk_score, 1.0)
-    
-    async def _handle_blocked_ip(self, ip: str, request: Request) -> Dict:
-        """Gérer une IP bloquée"""
-        return {
-            "allowed": False,
-            "risk_score": 1.0,
-            "ip": ip,
-            "reasons": ["IP address is blocked"]
-        }
-    
-    async def _handle_maintenance_mode(self, ip: str, request: Request) -> Dict:
-        """Gérer le mode maintenance"""
-        return {
-            "allowed": False,
-            "risk_score": 0.0,
-            "ip": ip,
-            "reasons": ["Platform in maintenance mode"]
-        }
-    
-    async def _log_security_event(self, request: Request, ip: str, user_agent: str, 
-                                 risk_score: float, blocked: bool):
-        """Enregistrer un événement de sécurité"""
-        severity = "HIGH" if risk_score > 0.8 else "MEDIUM" if risk_score > 0.5 else "LOW"
-        
-        event = SecurityEvent(
-            timestamp=datetime.utcnow(),
-            ip_address=ip,
-            user_agent=user_agent,
-            request_path=str(request.url.path),
-            method=request.method,
-            threat_type="SECURITY_CHECK",
-            severity=severity,
-            blocked=blocked,
-            details={"risk_score": risk_score}
-        )
-        
-        await self.audit_logger.log_event(event)
-
-# Instance globale du WAF
+# Instance globale du WAF (Phase 7: pipeline d'analyse concurrent, inférence ML par lots)
 waf_instance = WAF()
 
+# Décisions WAF par raison (exportées sur /metrics)
+waf_decisions = LabeledCounter(("decision", "reason"))
+
+
+def _security_metrics_collector():
+    """Familles OpenMetrics du module de sécurité (lues au scrape, sans calcul à l'avance)"""
+    caches = [
+        ("user_agent", ml_detector.user_agent_cache.hits, ml_detector.user_agent_cache.misses),
+        ("signature", signature_engine.hits, signature_engine.misses),
+        ("geoip", geoip_database.stats["hits"],
+         geoip_database.stats["lookups"] - geoip_database.stats["hits"]),
+        ("verified_tokens", api_key_manager.cache.hits, api_key_manager.cache.misses),
+        ("verified_sessions", session_manager.cache.hits, session_manager.cache.misses),
+        ("gpt_analysis", gpt_assistant.analysis_cache.stats["hits"] + gpt_assistant.analysis_cache.stats["coalesced"],
+         gpt_assistant.analysis_cache.stats["misses"]),
+    ]
+    queues = [
+        ("threat_queue", continuous_monitor.threat_queue.qsize()),
+        ("audit", audit_pipeline.get_stats()["queue_depth"]),
+        ("password_hashing", password_pool.waiting),
+    ]
+    if geoip_enrichment is not None:
+        queues.append(("geoip_enrichment", geoip_enrichment.get_stats()["pending"]))
+
+    return [
+        labeled_counter("rimareum_waf_decisions", "Décisions du WAF par raison", waf_decisions),
+        windowed_histogram("rimareum_ml_inference_batch_size",
+                           "Nombre de lignes par appel d'inférence vectorisé",
+                           [({}, ml_inference.batch_sizes)]),
+        counter("rimareum_ml_inference_rows", "Lignes évaluées par l'inférence ML",
+                [({}, ml_inference.stats["rows"])]),
+        counter("rimareum_ml_inference_errors", "Lots d'inférence ML en erreur",
+                [({}, ml_inference.stats["errors"])]),
+        counter("rimareum_cache_hits", "Succès des caches",
+                [({"cache": name}, hits) for name, hits, _ in caches]),
+        counter("rimareum_cache_misses", "Échecs des caches",
+                [({"cache": name}, misses) for name, _, misses in caches]),
+        gauge("rimareum_cache_hit_ratio", "Taux de succès des caches depuis le démarrage",
+              [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+               for name, hits, misses in caches]),
+        gauge("rimareum_queue_depth", "Profondeur des files de traitement",
+              [({"queue": name}, depth) for name, depth in queues]),
+        counter("rimareum_password_hashing_rejected", "Hachages délestés (pool saturé)",
+                [({"reason": "queue_full"}, password_pool.stats["rejected_queue_full"]),
+                 ({"reason": "timeout"}, password_pool.stats["rejected_timeout"])]),
+        counter("rimareum_audit_events_dropped", "Événements d'audit abandonnés (file pleine)",
+                [({}, audit_pipeline.stats["dropped"])]),
+    ]
+
+
+exposition.register("security", _security_metrics_collector)
+
 # Rate limiter global
 limiter = Limiter(key_func=get_remote_address)
 
 # OAuth2 scheme pour l'authentification
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token", auto_error=False)
 
+async def authenticate_request(request: Request, token: Optional[str] = Depends(oauth2_scheme)) -> Dict:
+    """Dépendance d'authentification: jeton Bearer ou en-tête X-API-Key.
+
+    Un jeton Bearer est d'abord vérifié comme session (émise par
+    /api/auth/login), puis comme clé API; l'en-tête X-API-Key n'accepte que
+    les clés API. Les clients réguliers sont servis par les caches des
+    identifiants vérifiés (empreinte + accès dictionnaire); un identifiant
+    révoqué est refusé aussitôt.
+    """
+    key_data = None
+    if token:
+        key_data = session_manager.validate_session(token) or api_key_manager.validate_api_key(token)
+    elif request.headers.get("x-api-key"):
+        key_data = api_key_manager.validate_api_key(request.headers["x-api-key"])
+    if key_data is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return key_data
+
 async def security_middleware(request: Request):
     """Middleware de sécurité pour FastAPI PHASE 6"""
     
@@ -2260,14 +2343,22 @@ async def security_middleware(request: Request):
         return {"allowed": True, "risk_score": 0.0}
     
     # Analyse de sécurité complète
+    start = time.perf_counter()
     result = await waf_instance.process_request(request)
+    continuous_monitor.record_request(route_name(request), time.perf_counter() - start,
+                                      blocked=not result["allowed"])
+    if result["allowed"]:
+        waf_decisions.inc("allow", "none")
+    else:
+        for reason in result["reasons"] or ["unspecified"]:
+            waf_decisions.inc("block", reason)
     
     if not result["allowed"]:
         # Construire un message d'erreur détaillé
         error_detail = {
             "error": "Request blocked by RIMAREUM Security System",
             "reasons": result["reasons"],
-            "risk_score": result["risk_score"],
+            "risk_score": result["threat_score"],
             "ip": result["ip"],
             "support": "Contact support@rimareum.com if you believe this is an error",
             "timestamp": datetime.utcnow().isoformat()
@@ -2305,9 +2396,11 @@ class SecurityAuditScheduler:
         """Effectuer l'audit de sécurité"""
         audit_results = {
             "timestamp": datetime.utcnow().isoformat(),
-            "blocked_ips": len(waf_instance.blocked_ips),
-            "honeypot_hits": len(waf_instance.honeypot_hits),
-            "guardian_ai_patterns": len(waf_instance.guardian_ai.behavioral_model["suspicious_patterns"]),
+            "blocked_ips": waf_instance.state.blocked_count(),
+            "honeypot_hits": waf_instance.state.counter_size(NAMESPACE_HONEYPOT_HITS),
+            "failed_auth_ips": waf_instance.state.counter_size(NAMESPACE_FAILED_AUTH),
+            "active_bans": waf_instance.block_scheduler.get_stats()["active_bans"],
+            "ml_model_version": waf_instance.ml_detector.model_version,
             "status": "completed"
         }
         
@@ -2331,48 +2424,115 @@ audit_scheduler = SecurityAuditScheduler()
 
 # Utilitaires pour les clés API
 class APIKeyManager:
-    """Gestionnaire des clés API avec expiration"""
-    
-    def __init__(self):
-        self.api_keys = {}
+    """Gestionnaire des clés API avec expiration
+
+    Les clés sont indexées par empreinte et par utilisateur dans un
+    CredentialRegistry: les clés expirées sont balayées par lot en tâche de
+    fond (même jamais réutilisées) et les clés révoquées sont retirées
+    immédiatement.
+    """
+    
+    def __init__(self, registry: Optional[CredentialRegistry] = None,
+                 cache: Optional[VerifiedTokenCache] = None):
         self.key_expiry = timedelta(hours=SECURITY_CONFIG["api_key_expiration_hours"])
+        self.registry = registry or CredentialRegistry(
+            persist_path=SECURITY_CONFIG["api_key_store_path"],
+            max_credentials=SECURITY_CONFIG["api_key_max_total"],
+            max_per_user=SECURITY_CONFIG["api_key_max_per_user"]
+        )
+        self.cache = cache or VerifiedTokenCache(
+            ttl=SECURITY_CONFIG["auth_cache_ttl"],
+            maxsize=SECURITY_CONFIG["auth_cache_size"]
+        )
+        # Révocation, expiration ou éviction: l'entrée en cache disparaît aussitôt
+        self.registry.listeners.append(self.cache.invalidate)
     
     def generate_api_key(self, user_id: str) -> str:
         """Générer une nouvelle clé API"""
-        api_key = secrets.token_urlsafe(32)
-        expiry = datetime.utcnow() + self.key_expiry
-        
-        self.api_keys[api_key] = {
-            "user_id": user_id,
-            "created": datetime.utcnow(),
-            "expires": expiry,
-            "active": True
-        }
-        
-        return api_key
+        return self.registry.issue(user_id, self.key_expiry.total_seconds(), KIND_API_KEY)
     
     def validate_api_key(self, api_key: str) -> Optional[Dict]:
-        """Valider une clé API"""
-        if api_key not in self.api_keys:
-            return None
-        
-        key_data = self.api_keys[api_key]
-        
-        # Vérifier l'expiration
-        if datetime.utcnow() > key_data["expires"]:
-            del self.api_keys[api_key]
-            return None
-        
-        # Vérifier si active
-        if not key_data["active"]:
-            return None
-        
-        return key_data
+        """Valider une clé API (servie par le cache des clés déjà vérifiées)"""
+        return self.cache.verify(api_key, self._validate_uncached,
+                                 expires_of=lambda key_data: key_data["expires_at"])
+
+    def _validate_uncached(self, api_key: str) -> Optional[Dict]:
+        return _credential_data(self.registry.validate(api_key), KIND_API_KEY)
     
     def revoke_api_key(self, api_key: str):
         """Révoquer une clé API"""
-        if api_key in self.api_keys:
-            self.api_keys[api_key]["active"] = False
+        self.registry.revoke(api_key)
+
+    def revoke_user_keys(self, user_id: str) -> int:
+        """Révoquer toutes les clés d'un utilisateur"""
+        return self.registry.revoke_user(user_id, KIND_API_KEY)
+
+    def get_stats(self) -> Dict:
+        return {**self.registry.get_stats(), "cache": self.cache.get_stats()}
 
 # Instance du gestionnaire de clés API
-api_key_manager = APIKeyManager()
\ No newline at end of file
+api_key_manager = APIKeyManager()
+
+
+class SessionManager:
+    """Sessions émises à la connexion (jetons Bearer)
+
+    Même mécanique que les clés API (registre indexé par empreinte, cache
+    des jetons vérifiés invalidé au retrait), dans un registre distinct:
+    c'est le registre émetteur qui valide le jeton.
+    """
+
+    def __init__(self, registry: Optional[CredentialRegistry] = None,
+                 cache: Optional[VerifiedTokenCache] = None):
+        self.session_ttl = SECURITY_CONFIG["session_ttl_seconds"]
+        self.registry = registry or CredentialRegistry(
+            persist_path=SECURITY_CONFIG["session_store_path"],
+            max_credentials=SECURITY_CONFIG["api_key_max_total"],
+            max_per_user=SECURITY_CONFIG["session_max_per_user"]
+        )
+        self.cache = cache or VerifiedTokenCache(
+            ttl=SECURITY_CONFIG["auth_cache_ttl"],
+            maxsize=SECURITY_CONFIG["auth_cache_size"]
+        )
+        self.registry.listeners.append(self.cache.invalidate)
+
+    def create_session(self, user_id: str) -> str:
+        """Ouvrir une session pour un utilisateur authentifié"""
+        return self.registry.issue(user_id, self.session_ttl, KIND_SESSION)
+
+    def validate_session(self, token: str) -> Optional[Dict]:
+        """Valider un jeton de session (servi par le cache des jetons déjà vérifiés)"""
+        return self.cache.verify(token, self._validate_uncached,
+                                 expires_of=lambda session_data: session_data["expires_at"])
+
+    def _validate_uncached(self, token: str) -> Optional[Dict]:
+        return _credential_data(self.registry.validate(token), KIND_SESSION)
+
+    def revoke_session(self, token: str) -> bool:
+        """Fermer une session"""
+        return self.registry.revoke(token)
+
+    def revoke_user_sessions(self, user_id: str) -> int:
+        """Fermer toutes les sessions d'un utilisateur"""
+        return self.registry.revoke_user(user_id, KIND_SESSION)
+
+    def get_stats(self) -> Dict:
+        return {**self.registry.get_stats(), "cache": self.cache.get_stats()}
+
+
+def _credential_data(credential: Optional[Credential], kind: str) -> Optional[Dict]:
+    """Vue d'un identifiant actif du type attendu, None sinon"""
+    if credential is None or credential.kind != kind:
+        return None
+
+    return {
+        "user_id": credential.user_id,
+        "kind": credential.kind,
+        "created": datetime.utcfromtimestamp(credential.created),
+        "expires": datetime.utcfromtimestamp(credential.expires) if credential.expires else None,
+        "expires_at": credential.expires,
+        "active": True
+    }
+
+# Instance du gestionnaire de sessions
+session_manager = SessionManager()
@@ -0,0 +1,157 @@
+"""
+📡 EXPOSITION OPENMETRICS RIMAREUM - SENTINEL CORE
+Rendu texte OpenMetrics (Prometheus) des métriques collectées, calculé uniquement au scrape
+"""
+
+import logging
+import math
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple
+
+from security_metrics import LabeledCounter, WindowedHistogram, gc_pause_tracker, loop_lag_probe
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+Labels = Mapping[str, str]
+
+
+@dataclass
+class MetricFamily:
+    """Famille de métriques: nom sans suffixe, type, aide et échantillons (suffixe, labels, valeur)"""
+    name: str
+    type: str
+    help: str
+    samples: List[Tuple[str, Labels, float]] = field(default_factory=list)
+
+
+def _escape(value: str) -> str:
+    value = str(value)
+    if "\\" not in value and "\n" not in value and '"' not in value:
+        return value
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    kind = type(value)
+    if kind is int:
+        return str(value)
+    if kind is bool:
+        return "1" if value else "0"
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(value)
+
+
+@lru_cache(maxsize=64)
+def _bucket_bounds(bounds: Tuple[float, ...]) -> Tuple[str, ...]:
+    """Valeurs `le` formatées une fois par jeu de bornes (dernière: +Inf)"""
+    return tuple(_format_value(float(bound)) for bound in bounds) + ("+Inf",)
+
+
+def counter(name: str, help: str, values: Iterable[Tuple[Labels, float]]) -> MetricFamily:
+    """Compteur monotone (échantillons `<name>_total`)"""
+    return MetricFamily(name, "counter", help,
+                        [("_total", labels, value) for labels, value in values])
+
+
+def gauge(name: str, help: str, values: Iterable[Tuple[Labels, float]]) -> MetricFamily:
+    return MetricFamily(name, "gauge", help, [("", labels, value) for labels, value in values])
+
+
+def labeled_counter(name: str, help: str, counter_values: LabeledCounter) -> MetricFamily:
+    return counter(name, help, (
+        (dict(zip(counter_values.labelnames, labels)), value)
+        for labels, value in list(counter_values.values.items())
+    ))
+
+
+def histogram(name: str, help: str,
+              series: Iterable[Tuple[Labels, Tuple[Tuple[float, ...], List[int], float]]]) -> MetricFamily:
+    """Histogramme cumulatif: pour chaque série (bornes, comptes par tranche dont +Inf, somme)"""
+    family = MetricFamily(name, "histogram", help)
+    for labels, (bounds, counts, total) in series:
+        cumulative = 0
+        for bound, count in zip(_bucket_bounds(tuple(bounds)), counts):
+            cumulative += count
+            family.samples.append(("_bucket", {**labels, "le": bound}, cumulative))
+        family.samples.append(("_count", labels, cumulative))
+        family.samples.append(("_sum", labels, total))
+    return family
+
+
+def windowed_histogram(name: str, help: str,
+                       series: Iterable[Tuple[Labels, WindowedHistogram]]) -> MetricFamily:
+    """Histogramme exporté depuis les totaux cumulés d'un WindowedHistogram"""
+    return histogram(name, help, (
+        (labels, (source.buckets, list(source.bucket_counts), source.lifetime_total))
+        for labels, source in series
+    ))
+
+
+class OpenMetricsRegistry:
+    """Collecteurs appelés à chaque scrape; rien n'est calculé entre deux scrapes.
+
+    Un collecteur est une fonction sans argument renvoyant des MetricFamily;
+    une erreur de collecte est journalisée sans empêcher les autres familles.
+    """
+
+    def __init__(self):
+        self.collectors: Dict[str, Callable[[], Iterable[MetricFamily]]] = {}
+
+    def register(self, name: str, collector: Callable[[], Iterable[MetricFamily]]):
+        """Enregistrer (ou remplacer) un collecteur nommé"""
+        self.collectors[name] = collector
+
+    def unregister(self, name: str):
+        self.collectors.pop(name, None)
+
+    def collect(self) -> List[MetricFamily]:
+        families: List[MetricFamily] = []
+        for name, collector in list(self.collectors.items()):
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logging.error(f"Erreur collecte métriques {name}: {e}")
+        return families
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.collect():
+            lines.append(f"# TYPE {family.name} {family.type}")
+            lines.append(f"# HELP {family.name} {_escape(family.help)}")
+            for suffix, labels, value in family.samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _process_collector() -> List[MetricFamily]:
+    """Retard de la boucle asyncio et pauses du ramasse-miettes"""
+    return [
+        windowed_histogram("rimareum_event_loop_lag_seconds",
+                           "Retard de réveil de la boucle asyncio",
+                           [({}, loop_lag_probe.lag)]),
+        gauge("rimareum_event_loop_last_lag_seconds", "Dernier retard mesuré de la boucle asyncio",
+              [({}, loop_lag_probe.last_lag)]),
+        windowed_histogram("rimareum_gc_pause_seconds", "Durée des collectes du ramasse-miettes",
+                           [({"generation": str(generation)}, pauses)
+                            for generation, pauses in gc_pause_tracker.pauses.items()]),
+        counter("rimareum_gc_collected_objects", "Objets libérés par le ramasse-miettes",
+                [({"generation": str(generation)}, collected)
+                 for generation, collected in enumerate(gc_pause_tracker.collected)]),
+    ]
+
+
+# Registre d'exposition partagé par server.py et les modules de sécurité
+exposition = OpenMetricsRegistry()
+exposition.register("process", _process_collector)
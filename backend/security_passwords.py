@@ -0,0 +1,141 @@
+"""
+🔑 HACHAGE DES MOTS DE PASSE RIMAREUM - SENTINEL CORE
+bcrypt hors boucle asyncio sur un pool borné, avec file d'attente limitée et délestage
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+
+class PasswordHashingOverloaded(RuntimeError):
+    """Pool de hachage saturé: la requête est délestée (à traduire en 503)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Hachage des mots de passe saturé ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _prehash(password: str) -> bytes:
+    """Première étape SHA256 (contourne la limite de 72 octets de bcrypt)"""
+    return hashlib.sha256(password.encode()).hexdigest().encode()
+
+
+def hash_password_sync(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_prehash(password), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def verify_password_sync(password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(_prehash(password), hashed_password.encode())
+    except Exception:
+        return False
+
+
+class PasswordHashPool:
+    """Exécution de bcrypt sur un pool de threads dédié et borné.
+
+    bcrypt libère le GIL: `workers` hachages tournent réellement en
+    parallèle sans bloquer la boucle. Au plus `workers` calculs sont en cours;
+    `max_queue` requêtes peuvent attendre une place pendant `queue_timeout`
+    secondes. Au-delà (file pleine ou attente expirée), PasswordHashingOverloaded
+    est levée immédiatement plutôt que d'accumuler de la latence pour tous.
+    Une place n'est rendue qu'à la fin réelle du calcul, même si l'appelant a
+    été annulé entre-temps.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_queue: int = 64,
+                 queue_timeout: float = 2.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.stats = {"hashed": 0, "verified": 0, "completed": 0, "rejected_queue_full": 0,
+                      "rejected_timeout": 0, "errors": 0, "max_waiting": 0}
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rimareum-bcrypt")
+        self._compute_seconds = 0.0
+
+    def _retry_after(self) -> float:
+        """Estimation du temps avant qu'une place se libère"""
+        done = self.stats["completed"]
+        average = self._compute_seconds / done if done else 0.25
+        return round(average * (1 + self.waiting / self.workers), 3)
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                raise PasswordHashingOverloaded("file pleine", self._retry_after())
+            self.waiting += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self.waiting)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise PasswordHashingOverloaded("attente expirée", self._retry_after())
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+    @staticmethod
+    def _timed(func: Callable[..., Any], *args):
+        start = time.perf_counter()
+        return func(*args), time.perf_counter() - start
+
+    async def _run(self, func: Callable[..., Any], *args):
+        await self._acquire()
+        self.in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._timed, func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        result, _ = await asyncio.shield(future)
+        return result
+
+    def _release(self, future: Optional[asyncio.Future]):
+        """Rendre la place à la fin réelle du calcul (callback de la boucle)"""
+        self.in_flight -= 1
+        self._slots.release()
+        if future is None or future.cancelled():
+            return
+        if future.exception() is not None:
+            self.stats["errors"] += 1
+            logging.error(f"Erreur hachage mot de passe: {future.exception()}")
+            return
+        self.stats["completed"] += 1
+        self._compute_seconds += future.result()[1]
+
+    async def hash_password(self, password: str) -> str:
+        hashed = await self._run(hash_password_sync, password, self.rounds)
+        self.stats["hashed"] += 1
+        return hashed
+
+    async def verify_password(self, password: str, hashed_password: str) -> bool:
+        valid = await self._run(verify_password_sync, password, hashed_password)
+        self.stats["verified"] += 1
+        return valid
+
+    def get_stats(self) -> Dict[str, Any]:
+        done = self.stats["completed"]
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "avg_compute_ms": round(self._compute_seconds / done * 1000, 3) if done else 0.0
+        }
@@ -0,0 +1,138 @@
+"""
+⚡ PIPELINE D'ANALYSE RIMAREUM - SENTINEL CORE
+Exécution concurrente des analyseurs WAF avec budget de latence et sortie anticipée
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from security_metrics import WindowedHistogram
+
+# Statuts d'exécution d'un étage
+STAGE_OK = "ok"
+STAGE_TIMEOUT = "timeout"
+STAGE_ERROR = "error"
+STAGE_CANCELLED = "cancelled"
+
+
+@dataclass
+class AnalysisStage:
+    """Analyseur indépendant du pipeline.
+
+    `run(request, client_ip)` produit le résultat de l'étage, `score(résultat)`
+    en extrait un score 0-1 pondéré par `weight`; un étage qui dépasse son
+    budget (secondes), échoue ou est annulé contribue `neutral`.
+    """
+    name: str
+    run: Callable[..., Awaitable[Dict]]
+    score: Callable[[Dict], float]
+    weight: float
+    budget: float
+    neutral: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PipelineResult:
+    """Résultats par étage (neutres pour les étages non terminés)"""
+    results: Dict[str, Dict]
+    score: float
+    short_circuited: bool = False
+    statuses: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class StageMetrics:
+    """Histogramme glissant des latences et compteurs d'un étage"""
+
+    def __init__(self, window: float):
+        self.latencies = WindowedHistogram(window)
+        self.counts = {STAGE_OK: 0, STAGE_TIMEOUT: 0, STAGE_ERROR: 0, STAGE_CANCELLED: 0}
+
+    def record(self, status: str, elapsed: Optional[float]):
+        self.counts[status] += 1
+        if elapsed is not None:
+            self.latencies.record(elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latency = self.latencies.merged().snapshot()
+        return {**self.counts, **{key: value for key, value in latency.items()
+                                  if key.endswith("_ms")}}
+
+
+class StagedPipeline:
+    """Lance tous les étages en parallèle et agrège leurs scores à mesure.
+
+    Les scores étant positifs, dès que la somme pondérée des étages terminés
+    dépasse le seuil de blocage, le score final le dépassera aussi: les
+    étages restants sont annulés et la requête est bloquée sans les attendre.
+    """
+
+    def __init__(self, stages: List[AnalysisStage], window: float = 60.0):
+        self.stages = stages
+        self.metrics = {stage.name: StageMetrics(window) for stage in stages}
+        self.pipeline_latencies = WindowedHistogram(window)
+        self.runs = 0
+        self.short_circuits = 0
+
+    async def _run_stage(self, stage: AnalysisStage, request, client_ip: str):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(stage.run(request, client_ip), timeout=stage.budget)
+            status = STAGE_OK
+        except asyncio.TimeoutError:
+            result, status = dict(stage.neutral), STAGE_TIMEOUT
+        except Exception as e:
+            logging.error(f"Erreur étage {stage.name}: {e}")
+            result, status = dict(stage.neutral), STAGE_ERROR
+        return stage, result, status, time.perf_counter() - start
+
+    async def run(self, request, client_ip: str, block_threshold: float) -> PipelineResult:
+        """Exécuter les étages; sortie anticipée si le score cumulé dépasse `block_threshold`"""
+        start = time.perf_counter()
+        outcome = PipelineResult(
+            results={stage.name: dict(stage.neutral) for stage in self.stages}, score=0.0
+        )
+        pending = {
+            asyncio.ensure_future(self._run_stage(stage, request, client_ip)): stage
+            for stage in self.stages
+        }
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del pending[task]
+                    stage, result, status, elapsed = task.result()
+                    outcome.results[stage.name] = result
+                    outcome.statuses[stage.name] = status
+                    outcome.timings[stage.name] = elapsed
+                    self.metrics[stage.name].record(status, elapsed)
+                    if status == STAGE_OK:
+                        outcome.score += stage.weight * stage.score(result)
+
+                if pending and outcome.score > block_threshold:
+                    outcome.short_circuited = True
+                    self.short_circuits += 1
+                    break
+        finally:
+            for task, stage in pending.items():
+                task.cancel()
+                outcome.statuses[stage.name] = STAGE_CANCELLED
+                self.metrics[stage.name].record(STAGE_CANCELLED, None)
+
+        self.runs += 1
+        self.pipeline_latencies.record(time.perf_counter() - start)
+        return outcome
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Latences p50/p95/p99 par étage, pour voir quel analyseur domine le p99"""
+        pipeline = self.pipeline_latencies.merged().snapshot()
+        return {
+            "runs": self.runs,
+            "short_circuits": self.short_circuits,
+            "pipeline": {key: value for key, value in pipeline.items() if key.endswith("_ms")},
+            "stages": {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+        }
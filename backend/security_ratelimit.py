@@ -0,0 +1,204 @@
+"""
+⏱️ RATE LIMITING RIMAREUM - SENTINEL CORE
+Compteurs à fenêtre glissante en O(1) par IP avec éviction des IPs inactives
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class SlidingWindowCounter:
+    """Fenêtre glissante sur un ring buffer de taille fixe.
+
+    La fenêtre de `bucket_count * bucket_seconds` secondes est découpée en
+    buckets; avancer la tête remet à zéro au plus `bucket_count` buckets,
+    donc chaque mise à jour est O(1) amorti et la mémoire reste constante.
+    """
+
+    __slots__ = ("bucket_seconds", "bucket_count", "counts", "head", "total")
+
+    def __init__(self, bucket_seconds: float, bucket_count: int):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.counts = [0] * bucket_count
+        self.head = 0  # Epoch du bucket le plus récent
+        self.total = 0
+
+    def _advance(self, now: float) -> int:
+        """Avancer la tête jusqu'à l'epoch courante en vidant les buckets expirés"""
+        epoch = int(now // self.bucket_seconds)
+        elapsed = epoch - self.head
+
+        if elapsed >= self.bucket_count:
+            self.counts = [0] * self.bucket_count
+            self.total = 0
+        elif elapsed > 0:
+            counts = self.counts
+            for step in range(1, elapsed + 1):
+                index = (self.head + step) % self.bucket_count
+                self.total -= counts[index]
+                counts[index] = 0
+
+        if elapsed > 0:
+            self.head = epoch
+        return epoch
+
+    def add(self, now: float, amount: int = 1) -> int:
+        """Enregistrer des événements et retourner le total de la fenêtre"""
+        epoch = self._advance(now)
+        self.counts[epoch % self.bucket_count] += amount
+        self.total += amount
+        return self.total
+
+    def value(self, now: float) -> int:
+        """Total de la fenêtre à l'instant `now`"""
+        self._advance(now)
+        return self.total
+
+
+class IPRateWindow:
+    """Fenêtres minute (60 x 1s) et heure (60 x 60s) d'une IP"""
+
+    __slots__ = ("minute", "hour", "last_seen")
+
+    def __init__(self, now: float):
+        self.minute = SlidingWindowCounter(1.0, 60)
+        self.hour = SlidingWindowCounter(60.0, 60)
+        self.last_seen = now
+
+
+class SlidingWindowRateLimiter:
+    """Rate limiter par IP à mémoire bornée.
+
+    Les IPs sont conservées dans l'ordre de leur dernière requête: le
+    balayage périodique retire les IPs inactives depuis le début du
+    dictionnaire sans parcourir les IPs actives, et `max_tracked_ips`
+    borne la mémoire même sous un flood d'IPs usurpées.
+    """
+
+    def __init__(self, idle_ttl: float = 3600, sweep_interval: float = 300,
+                 max_tracked_ips: int = 100000):
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.max_tracked_ips = max_tracked_ips
+        self.windows: "OrderedDict[str, IPRateWindow]" = OrderedDict()
+        self.evicted_ips = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+    def hit(self, ip: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """Enregistrer une requête et retourner (requêtes/minute, requêtes/heure)"""
+        now = time.time() if now is None else now
+        window = self.windows.get(ip)
+
+        if window is None:
+            window = IPRateWindow(now)
+            self.windows[ip] = window
+            if len(self.windows) > self.max_tracked_ips:
+                self.windows.popitem(last=False)
+                self.evicted_ips += 1
+            self._ensure_sweeper()
+        else:
+            self.windows.move_to_end(ip)
+
+        window.last_seen = now
+        return window.minute.add(now), window.hour.add(now)
+
+    def get_counts(self, ip: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """Obtenir (requêtes/minute, requêtes/heure) sans enregistrer de requête"""
+        window = self.windows.get(ip)
+        if window is None:
+            return 0, 0
+        now = time.time() if now is None else now
+        return window.minute.value(now), window.hour.value(now)
+
+    def hourly_count(self, ip: str) -> int:
+        """Nombre de requêtes de l'IP sur la dernière heure"""
+        return self.get_counts(ip)[1]
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Retirer les IPs inactives depuis plus de `idle_ttl` secondes"""
+        now = time.time() if now is None else now
+        evicted = 0
+
+        while self.windows:
+            ip, window = next(iter(self.windows.items()))
+            if now - window.last_seen < self.idle_ttl:
+                break
+            del self.windows[ip]
+            evicted += 1
+
+        self.evicted_ips += evicted
+        return evicted
+
+    def _ensure_sweeper(self):
+        """Démarrer le balayage périodique dès qu'une boucle asyncio tourne"""
+        if self._sweeper_task is not None and not self._sweeper_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper_task = loop.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        """Balayage périodique des IPs inactives"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = self.evict_idle()
+                if evicted:
+                    logging.debug(f"Rate limiter: {evicted} IP(s) inactive(s) retirée(s)")
+            except Exception as e:
+                logging.error(f"Erreur balayage rate limiter: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtenir les statistiques du rate limiter"""
+        return {
+            "tracked_ips": len(self.windows),
+            "evicted_ips": self.evicted_ips
+        }
+
+
+class SharedWindowRateCounter:
+    """Rate limiting partagé entre workers via le backend d'état WAF.
+
+    Chaque fenêtre est estimée à partir de deux compteurs fixes (fenêtre
+    courante + précédente pondérée par le temps restant), ce qui donne deux
+    incréments et deux lectures O(1) par requête quel que soit le trafic.
+    """
+
+    def __init__(self, state, namespace: str = "requests"):
+        self.state = state
+        self.namespace = namespace
+
+    def _window(self, ip: str, seconds: int, now: float, record: bool) -> int:
+        epoch = int(now // seconds)
+        current_key = f"{ip}:{seconds}:{epoch}"
+        if record:
+            current = self.state.increment(self.namespace, current_key, 1, ttl=2 * seconds)
+        else:
+            current = self.state.get_count(self.namespace, current_key)
+        previous = self.state.get_count(self.namespace, f"{ip}:{seconds}:{epoch - 1}")
+        weight = 1.0 - (now - epoch * seconds) / seconds
+        return int(current + previous * weight)
+
+    def hit(self, ip: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """Enregistrer une requête et retourner (requêtes/minute, requêtes/heure)"""
+        now = time.time() if now is None else now
+        return self._window(ip, 60, now, True), self._window(ip, 3600, now, True)
+
+    def get_counts(self, ip: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """Obtenir (requêtes/minute, requêtes/heure) sans enregistrer de requête"""
+        now = time.time() if now is None else now
+        return self._window(ip, 60, now, False), self._window(ip, 3600, now, False)
+
+    def hourly_count(self, ip: str) -> int:
+        """Nombre estimé de requêtes de l'IP sur la dernière heure"""
+        return self.get_counts(ip)[1]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtenir les statistiques du rate limiter"""
+        return {"tracked_ips": self.state.counter_size(self.namespace) // 2}
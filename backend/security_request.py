@@ -0,0 +1,156 @@
+"""
+🔎 VUE DE REQUÊTE RIMAREUM - SENTINEL CORE
+Requête analysée une seule fois (octets bruts du scope ASGI) et partagée par les couches WAF
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+# Clé du scope ASGI où la vue est mémorisée pour la durée de la requête
+SCOPE_KEY = "rimareum.request_view"
+
+# Ports par défaut omis de str(request.url)
+_DEFAULT_PORTS = {"http": 80, "https": 443, "ws": 80, "wss": 443}
+
+
+class RequestView:
+    """Vue en lecture seule d'une requête, calculée paresseusement.
+
+    Les longueurs et compteurs sont dérivés directement des octets du scope
+    ASGI (chemin, query string, en-têtes) sans reconstruire l'URL ni copier
+    les en-têtes; les chaînes (URL complète, en-têtes sérialisés) ne sont
+    construites qu'à la première demande puis réutilisées par toutes les
+    couches, tout comme les résultats du moteur de signatures.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        scope = request.scope
+        self.raw_path: bytes = scope.get("raw_path") or scope.get("path", "").encode("latin-1")
+        self.query_string: bytes = scope.get("query_string", b"")
+        self.raw_headers: List[Tuple[bytes, bytes]] = scope.get("headers", [])
+        self._header_values: Optional[Dict[bytes, bytes]] = None
+        self._url: Optional[str] = None
+        self._headers_text: Optional[str] = None
+        self._body_text: Optional[str] = None
+        self._signature_counts: Dict[str, int] = {}
+
+    def header(self, name: bytes) -> bytes:
+        """Valeur brute d'un en-tête (nom en minuscules), b'' si absent"""
+        if self._header_values is None:
+            # Premier en-tête de chaque nom, comme Headers.get()
+            values: Dict[bytes, bytes] = {}
+            for key, value in self.raw_headers:
+                values.setdefault(key, value)
+            self._header_values = values
+        return self._header_values.get(name, b"")
+
+    @property
+    def user_agent_bytes(self) -> bytes:
+        return self.header(b"user-agent")
+
+    @property
+    def user_agent(self) -> str:
+        return self.user_agent_bytes.decode("latin-1")
+
+    @property
+    def header_count(self) -> int:
+        return len(self.raw_headers)
+
+    @property
+    def content_length(self) -> int:
+        try:
+            return int(self.header(b"content-length") or 0)
+        except ValueError:
+            return 0
+
+    @property
+    def param_count(self) -> int:
+        """Nombre de paramètres distincts de la query string"""
+        if not self.query_string:
+            return 0
+        return len({part.split(b"=", 1)[0] for part in self.query_string.split(b"&") if part})
+
+    @property
+    def url_length(self) -> int:
+        """Longueur de str(request.url), calculée sur les octets bruts"""
+        scope = self.request.scope
+        host = self.header(b"host")
+        scheme = scope.get("scheme", "http")
+        if not host:
+            server = scope.get("server")
+            if server is None:
+                host = b""
+            elif server[1] == _DEFAULT_PORTS.get(scheme):
+                host = server[0].encode()
+            else:
+                host = f"{server[0]}:{server[1]}".encode()
+        length = len(scheme) + 3 + len(host) + len(self.raw_path)
+        if self.query_string:
+            length += 1 + len(self.query_string)
+        return length
+
+    @property
+    def path_depth(self) -> int:
+        """Nombre de '/' dans l'URL complète (schéma inclus)"""
+        return 2 + self.raw_path.count(b"/") + self.query_string.count(b"/")
+
+    @property
+    def url(self) -> str:
+        if self._url is None:
+            self._url = str(self.request.url)
+        return self._url
+
+    @property
+    def headers_text(self) -> str:
+        if self._headers_text is None:
+            self._headers_text = str(self.request.headers)
+        return self._headers_text
+
+    async def body_text(self, max_bytes: int) -> str:
+        """Corps de la requête décodé, lu une seule fois (vide au-delà de max_bytes)
+
+        Le corps lu est mis en cache par Starlette: le gestionnaire de la route
+        le relit sans consommer à nouveau le flux ASGI.
+        """
+        if self._body_text is None:
+            length = self.content_length
+            if 0 < length <= max_bytes:
+                body = await self.request.body()
+                self._body_text = body[:max_bytes].decode("utf-8", errors="replace")
+            else:
+                self._body_text = ""
+        return self._body_text
+
+    def signature_count(self, engine, text: str) -> int:
+        """Compter les signatures d'un texte une seule fois par requête"""
+        count = self._signature_counts.get(text)
+        if count is None:
+            count = engine.count(text)
+            self._signature_counts[text] = count
+        return count
+
+
+def get_request_view(request: Request) -> RequestView:
+    """Obtenir (ou créer) la vue partagée de la requête"""
+    view = request.scope.get(SCOPE_KEY)
+    if view is None:
+        view = RequestView(request)
+        request.scope[SCOPE_KEY] = view
+    return view
+
+
+def route_name(request: Request) -> str:
+    """Gabarit de la route servie (ex. /api/products/{product_id}) pour les métriques.
+
+    Le chemin brut n'est jamais utilisé: identifiants et chemins inconnus
+    feraient croître sans borne le nombre de séries.
+    """
+    return route_template(request.scope)
+
+
+def route_template(scope: Dict) -> str:
+    """Gabarit de route d'un scope ASGI déjà routé, "unmatched" sinon"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
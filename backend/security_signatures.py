@@ -0,0 +1,239 @@
+"""
+🛡️ MOTEUR DE SIGNATURES RIMAREUM - SENTINEL CORE
+Compilation unique des patterns suspects avec préfiltre littéral et confirmation regex
+"""
+
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Longueur maximale d'un fragment littéral extrait d'une répétition (ex: A{100,})
+_MAX_REPEAT_FRAGMENT = 32
+
+# Modes de confirmation d'une règle dont le fragment littéral est présent
+_CONFIRM_NONE = "none"
+_CONFIRM_GAPPED = "gapped"
+_CONFIRM_REGEX = "regex"
+
+
+def _parse(pattern: str):
+    """Analyser un pattern avec le parser interne de `re` (None si invalide)"""
+    try:
+        return sre_parse.parse(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _extract_literal(parsed) -> Tuple[str, bool]:
+    """Extraire le plus long fragment littéral obligatoire d'un pattern analysé.
+
+    Retourne (fragment en minuscules, exact) où exact indique que le pattern
+    n'est composé que de ce littéral (aucune confirmation regex nécessaire).
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    exact = True
+
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+            continue
+
+        exact = False
+        if (op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+                and av[0] >= 1 and len(av[2]) == 1
+                and av[2][0][0] is sre_constants.LITERAL):
+            # Répétition d'un caractère: les `min` premières occurrences sont obligatoires
+            fragment = chr(av[2][0][1]) * min(av[0], _MAX_REPEAT_FRAGMENT)
+            current.append(fragment)
+            if av[0] != av[1]:
+                runs.append("".join(current))
+                current = [fragment]
+            continue
+
+        runs.append("".join(current))
+        current = []
+
+    runs.append("".join(current))
+    literal = max(runs, key=len).lower()
+    return literal, exact and bool(literal)
+
+
+def _extract_gapped_literals(parsed) -> Optional[List[str]]:
+    """Décomposer un pattern de la forme `lit.*lit.*lit` en liste de littéraux.
+
+    Ces patterns (ex: '.*or.*'.*=.*') provoquent un backtracking coûteux
+    alors qu'une recherche gloutonne des fragments dans l'ordre, ligne par
+    ligne, donne exactement le même résultat. None si le pattern a une autre forme.
+    """
+    fragments: List[str] = []
+    current: List[str] = []
+    has_gap = False
+
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+        elif (op is sre_constants.MAX_REPEAT and av[0] == 0
+              and av[1] == sre_constants.MAXREPEAT
+              and list(av[2]) == [(sre_constants.ANY, None)]):
+            has_gap = True
+            if current:
+                fragments.append("".join(current).lower())
+                current = []
+        else:
+            return None
+
+    if current:
+        fragments.append("".join(current).lower())
+    return fragments if has_gap and fragments else None
+
+
+def _match_gapped(fragments: List[str], text_lower: str) -> bool:
+    """Chercher les fragments dans l'ordre sur une même ligne ('.' exclut '\\n')"""
+    for line in text_lower.split("\n"):
+        position = 0
+        for fragment in fragments:
+            position = line.find(fragment, position)
+            if position < 0:
+                break
+            position += len(fragment)
+        else:
+            return True
+    return False
+
+
+class SignatureEngine:
+    """Moteur de signatures compilé une seule fois pour tout le processus.
+
+    Chaque pattern reçoit un identifiant de règle stable (SIG-000, SIG-001...).
+    Le texte est passé en minuscules une seule fois, puis chaque fragment
+    littéral distinct est recherché en C (`in`); seules les règles dont le
+    fragment est présent sont confirmées (regex précompilée, ou recherche
+    ordonnée des fragments pour les patterns `lit.*lit`).
+    Pour un texte non ASCII, les équivalences de casse d'IGNORECASE ne
+    coïncident plus avec str.lower(): toutes les regex sont alors évaluées.
+    """
+
+    def __init__(self, patterns: Sequence[str], cache_size: int = 1024,
+                 max_cached_length: int = 2048):
+        self.patterns: List[str] = list(patterns)
+        self.rule_ids: List[str] = [f"SIG-{index:03d}" for index in range(len(self.patterns))]
+        self.compiled: List[Optional[re.Pattern]] = []
+        self.cache_size = cache_size
+        self.max_cached_length = max_cached_length
+        self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # fragment littéral -> [(index règle, mode de confirmation, données)]
+        self._literal_rules: Dict[str, List[Tuple[int, str, Any]]] = {}
+        # Règles sans fragment littéral exploitable: toujours évaluées
+        self._unfiltered_rules: List[int] = []
+
+        for index, pattern in enumerate(self.patterns):
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                logging.error(f"Signature invalide {self.rule_ids[index]} ({pattern}): {e}")
+                self.compiled.append(None)
+                continue
+
+            self.compiled.append(compiled)
+            parsed = _parse(pattern)
+            if parsed is None:
+                self._unfiltered_rules.append(index)
+                continue
+
+            literal, exact = _extract_literal(parsed)
+            if not literal:
+                self._unfiltered_rules.append(index)
+                continue
+
+            gapped = _extract_gapped_literals(parsed)
+            if exact:
+                confirmation = (index, _CONFIRM_NONE, None)
+            elif gapped is not None:
+                confirmation = (index, _CONFIRM_GAPPED, gapped)
+            else:
+                confirmation = (index, _CONFIRM_REGEX, compiled)
+            self._literal_rules.setdefault(literal, []).append(confirmation)
+
+        # Fragments les plus longs (donc les plus sélectifs) en premier
+        self._literals: List[Tuple[str, List[Tuple[int, str, Any]]]] = sorted(
+            self._literal_rules.items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def scan(self, text: str) -> Tuple[str, ...]:
+        """Retourner les identifiants de toutes les règles qui correspondent au texte"""
+        if not text:
+            return ()
+
+        cacheable = len(text) <= self.max_cached_length
+        if cacheable:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        matches = tuple(self.rule_ids[index] for index in self._match_indices(text))
+
+        if cacheable and self.cache_size > 0:
+            self._cache[text] = matches
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return matches
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache de résultats"""
+        lookups = self.hits + self.misses
+        return {
+            "rules": len(self.patterns),
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def count(self, text: str) -> int:
+        """Compter les règles qui correspondent au texte"""
+        return len(self.scan(text))
+
+    def pattern_for(self, rule_id: str) -> Optional[str]:
+        """Obtenir le pattern source d'une règle"""
+        try:
+            return self.patterns[self.rule_ids.index(rule_id)]
+        except ValueError:
+            return None
+
+    def _match_indices(self, text: str) -> List[int]:
+        """Indices des règles correspondantes, dans l'ordre de la configuration"""
+        compiled = self.compiled
+
+        if not text.isascii():
+            return [index for index, regex in enumerate(compiled)
+                    if regex is not None and regex.search(text)]
+
+        text_lower = text.lower()
+        indices = [index for index in self._unfiltered_rules if compiled[index].search(text)]
+
+        for literal, rules in self._literals:
+            if literal not in text_lower:
+                continue
+            for index, mode, data in rules:
+                if (mode is _CONFIRM_NONE
+                        or (mode is _CONFIRM_GAPPED and _match_gapped(data, text_lower))
+                        or (mode is _CONFIRM_REGEX and data.search(text))):
+                    indices.append(index)
+
+        indices.sort()
+        return indices
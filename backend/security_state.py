@@ -0,0 +1,884 @@
+"""
+🗄️ ÉTAT PARTAGÉ WAF RIMAREUM - SENTINEL CORE
+Backends de stockage pour blocklist et compteurs: processus, mémoire partagée, KV réseau
+"""
+
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Plateformes sans fcntl: backend mémoire partagée indisponible
+    fcntl = None
+
+# Namespaces de compteurs utilisés par le WAF
+NAMESPACE_HONEYPOT_HITS = "honeypot_hits"
+NAMESPACE_FAILED_AUTH = "failed_auth_attempts"
+NAMESPACE_REQUESTS = "requests"
+
+# Opérations en attente de synchronisation
+OP_BLOCK = "block"
+OP_UNBLOCK = "unblock"
+OP_INCR = "incr"
+
+BLOCKED_PREFIX = "blocked:"
+# Hash unique (IP -> échéance, 0 = permanent) de la blocklist sur le serveur KV
+BLOCKED_HASH = "rimareum:blocked"
+
+
+def _counter_key(namespace: str, key: str) -> str:
+    return f"{namespace}:{key}"
+
+
+class WAFStateBackend:
+    """Interface de stockage de l'état WAF.
+
+    Les méthodes appelées dans le chemin de requête sont synchrones et ne
+    touchent que la mémoire locale; les écritures sont accumulées puis
+    synchronisées par lot par une tâche de fond (`flush_interval` secondes,
+    ou dès que `max_batch` opérations sont en attente).
+    """
+
+    shared = False
+
+    def __init__(self, flush_interval: float = 0.05, max_batch: int = 512):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.stats = {"flushes": 0, "flushed_ops": 0, "flush_errors": 0}
+        self._pending: List[Tuple] = []
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- Chemin de requête (non bloquant) ---
+
+    def block_ip(self, ip: str, until: float = math.inf):
+        raise NotImplementedError
+
+    def unblock_ip(self, ip: str):
+        raise NotImplementedError
+
+    def is_blocked(self, ip: str, now: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def increment(self, namespace: str, key: str, amount: int = 1,
+                  ttl: Optional[float] = None) -> int:
+        """Incrémenter un compteur (optionnellement expirant) et retourner sa valeur connue"""
+        raise NotImplementedError
+
+    def get_count(self, namespace: str, key: str) -> int:
+        raise NotImplementedError
+
+    def blocked_count(self) -> int:
+        raise NotImplementedError
+
+    def counter_size(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    # --- Synchronisation par lot ---
+
+    def _enqueue(self, operation: Tuple):
+        """Mettre une écriture en file pour la prochaine synchronisation"""
+        self._pending.append(operation)
+        self._ensure_flusher()
+        if len(self._pending) >= self.max_batch and self._flush_wakeup is not None:
+            self._flush_wakeup.set()
+
+    def _ensure_flusher(self):
+        """Démarrer la tâche de synchronisation dès qu'une boucle asyncio tourne"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Boucle de synchronisation en arrière-plan"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Synchroniser les écritures en attente et rafraîchir la vue locale"""
+        batch, self._pending = self._pending, []
+        try:
+            await self._sync(batch)
+            if batch:
+                self.stats["flushes"] += 1
+                self.stats["flushed_ops"] += len(batch)
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logging.error(f"Erreur synchronisation état WAF: {e}")
+
+    async def _sync(self, batch: List[Tuple]):
+        """Appliquer un lot d'écritures au stockage partagé"""
+
+    async def close(self):
+        """Arrêter la synchronisation après un dernier flush"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.__class__.__name__,
+            "shared": self.shared,
+            "pending_ops": len(self._pending),
+            **self.stats
+        }
+
+
+class InProcessStateBackend(WAFStateBackend):
+    """État local au processus (comportement historique, un seul worker)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._blocked: Dict[str, float] = {}
+        self._counters: Dict[str, Dict[str, List]] = {}
+
+    def block_ip(self, ip: str, until: float = math.inf):
+        self._blocked[ip] = until
+
+    def unblock_ip(self, ip: str):
+        self._blocked.pop(ip, None)
+
+    def is_blocked(self, ip: str, now: Optional[float] = None) -> bool:
+        until = self._blocked.get(ip)
+        if until is None:
+            return False
+        if until <= (time.time() if now is None else now):
+            del self._blocked[ip]
+            return False
+        return True
+
+    def increment(self, namespace: str, key: str, amount: int = 1,
+                  ttl: Optional[float] = None) -> int:
+        counters = self._counters.setdefault(namespace, {})
+        now = time.time()
+        entry = counters.get(key)
+        if entry is None or (entry[1] and entry[1] <= now):
+            entry = [0, now + ttl if ttl else 0.0]
+            counters[key] = entry
+        entry[0] += amount
+        return entry[0]
+
+    def get_count(self, namespace: str, key: str) -> int:
+        entry = self._counters.get(namespace, {}).get(key)
+        if entry is None or (entry[1] and entry[1] <= time.time()):
+            return 0
+        return entry[0]
+
+    def blocked_count(self) -> int:
+        now = time.time()
+        return sum(1 for until in self._blocked.values() if until > now)
+
+    def counter_size(self, namespace: str) -> int:
+        now = time.time()
+        return sum(1 for value, expires in self._counters.get(namespace, {}).values()
+                   if not expires or expires > now)
+
+
+class _OverlayStateBackend(WAFStateBackend):
+    """Base des backends partagés: écritures locales visibles avant synchronisation"""
+
+    shared = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Écritures non encore synchronisées (et lot en cours d'écriture)
+        self._local_blocks: Dict[str, float] = {}
+        self._local_counts: Dict[str, int] = {}
+        self._inflight_blocks: Dict[str, float] = {}
+        self._inflight_counts: Dict[str, int] = {}
+
+    def block_ip(self, ip: str, until: float = math.inf):
+        self._local_blocks[ip] = until
+        self._enqueue((OP_BLOCK, ip, until))
+
+    def unblock_ip(self, ip: str):
+        self._local_blocks[ip] = 0.0
+        self._enqueue((OP_UNBLOCK, ip))
+
+    def is_blocked(self, ip: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        until = self._local_blocks.get(ip)
+        if until is None:
+            until = self._inflight_blocks.get(ip)
+        if until is None:
+            until = self._read_block(ip)
+        return until > now
+
+    def increment(self, namespace: str, key: str, amount: int = 1,
+                  ttl: Optional[float] = None) -> int:
+        counter_key = _counter_key(namespace, key)
+        self._local_counts[counter_key] = self._local_counts.get(counter_key, 0) + amount
+        self._enqueue((OP_INCR, counter_key, amount, ttl))
+        return self.get_count(namespace, key)
+
+    def get_count(self, namespace: str, key: str) -> int:
+        counter_key = _counter_key(namespace, key)
+        return (self._read_count(counter_key)
+                + self._inflight_counts.get(counter_key, 0)
+                + self._local_counts.get(counter_key, 0))
+
+    async def flush(self):
+        # Le lot reste visible en lecture tant qu'il n'est pas écrit
+        self._inflight_blocks, self._local_blocks = self._local_blocks, {}
+        self._inflight_counts, self._local_counts = self._local_counts, {}
+        try:
+            await super().flush()
+        finally:
+            self._inflight_blocks = {}
+            self._inflight_counts = {}
+
+    def _read_block(self, ip: str) -> float:
+        """Échéance de blocage connue du stockage partagé (0 si non bloquée)"""
+        raise NotImplementedError
+
+    def _read_count(self, counter_key: str) -> int:
+        raise NotImplementedError
+
+
+class SharedMemoryStateBackend(_OverlayStateBackend):
+    """État partagé entre les workers d'un même hôte via une table de hachage mmap.
+
+    Table à adressage ouvert de `capacity` slots (hash de clé, valeur,
+    échéance, namespace). Les lectures sont des accès mémoire directs sans
+    verrou; les lots d'écriture sont appliqués sous `flock` dans un thread
+    pour ne jamais bloquer la boucle asyncio. Les slots expirés sont réutilisés.
+    """
+
+    MAGIC = b"RIMWAF01"
+    HEADER = struct.Struct("<8sQ")
+    SLOT = struct.Struct("<QqdI4x")  # hash de clé, valeur, échéance (0 = jamais), namespace
+    MAX_PROBES = 64
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 65536, **kwargs):
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryStateBackend requiert fcntl (POSIX)")
+        super().__init__(**kwargs)
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.path = path or os.path.join(shm_dir, "rimareum_waf_state")
+        self.capacity = capacity
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.HEADER.size + capacity * self.SLOT.size
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, capacity), 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self._map = mmap.mmap(self._fd, size)
+        magic, stored_capacity = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or stored_capacity != capacity:
+            raise RuntimeError(f"Table d'état WAF incompatible: {self.path}")
+
+    @staticmethod
+    def _hash(key: str, size: int = 8) -> int:
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=size).digest(), "little")
+        return digest or 1  # 0 marque un slot vide
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.SLOT.size
+
+    def _find(self, key: str) -> Optional[Tuple[int, float]]:
+        """Trouver (valeur, échéance) d'une clé, None si absente"""
+        key_hash = self._hash(key)
+        start = key_hash % self.capacity
+        for probe in range(self.MAX_PROBES):
+            stored_hash, value, expires, _ = self.SLOT.unpack_from(
+                self._map, self._offset((start + probe) % self.capacity)
+            )
+            if stored_hash == 0:
+                return None
+            if stored_hash == key_hash:
+                return value, expires
+        return None
+
+    def _read_block(self, ip: str) -> float:
+        found = self._find(BLOCKED_PREFIX + ip)
+        if found is None or found[0] == 0:
+            return 0.0
+        return found[1] or math.inf
+
+    def _read_count(self, counter_key: str) -> int:
+        found = self._find(counter_key)
+        if found is None or (found[1] and found[1] <= time.time()):
+            return 0
+        return found[0]
+
+    def _upsert(self, key: str, namespace: str, value: int, expires: float,
+                increment: bool, now: float):
+        """Écrire une clé (appelé sous verrou exclusif)"""
+        key_hash = self._hash(key)
+        namespace_hash = self._hash(namespace, 4)
+        start = key_hash % self.capacity
+        reusable = None
+
+        for probe in range(self.MAX_PROBES):
+            offset = self._offset((start + probe) % self.capacity)
+            stored_hash, stored_value, stored_expires, _ = self.SLOT.unpack_from(self._map, offset)
+            if stored_hash == key_hash:
+                if increment and not (stored_expires and stored_expires <= now):
+                    value += stored_value
+                    expires = stored_expires
+                self.SLOT.pack_into(self._map, offset, key_hash, value, expires, namespace_hash)
+                return
+            if stored_hash == 0 or (stored_expires and stored_expires <= now):
+                if reusable is None:
+                    reusable = offset
+                if stored_hash == 0:
+                    break
+
+        if reusable is None:
+            logging.error(f"Table d'état WAF saturée, écriture ignorée: {key}")
+            return
+        self.SLOT.pack_into(self._map, reusable, key_hash, value, expires, namespace_hash)
+
+    def _apply_batch(self, batch: List[Tuple]):
+        """Appliquer un lot sous flock (exécuté dans un thread)"""
+        now = time.time()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            for operation in batch:
+                kind, key = operation[0], operation[1]
+                if kind == OP_BLOCK:
+                    until = operation[2]
+                    self._upsert(BLOCKED_PREFIX + key, BLOCKED_PREFIX, 1,
+                                 0.0 if until == math.inf else until, False, now)
+                elif kind == OP_UNBLOCK:
+                    self._upsert(BLOCKED_PREFIX + key, BLOCKED_PREFIX, 0, now, False, now)
+                elif kind == OP_INCR:
+                    amount, ttl = operation[2], operation[3]
+                    namespace = key.split(":", 1)[0]
+                    self._upsert(key, namespace, amount, now + ttl if ttl else 0.0, True, now)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    async def _sync(self, batch: List[Tuple]):
+        if batch:
+            await asyncio.get_running_loop().run_in_executor(None, self._apply_batch, batch)
+
+    def _count_live(self, namespace: str) -> int:
+        """Compter les entrées vivantes d'un namespace (parcours complet, hors chemin de requête)"""
+        namespace_hash = self._hash(namespace, 4)
+        now = time.time()
+        count = 0
+        for slot in range(self.capacity):
+            stored_hash, value, expires, stored_namespace = self.SLOT.unpack_from(
+                self._map, self._offset(slot)
+            )
+            if (stored_hash and stored_namespace == namespace_hash and value
+                    and not (expires and expires <= now)):
+                count += 1
+        return count
+
+    def blocked_count(self) -> int:
+        return self._count_live(BLOCKED_PREFIX)
+
+    def counter_size(self, namespace: str) -> int:
+        return self._count_live(namespace)
+
+    async def close(self):
+        await super().close()
+        self._map.close()
+        os.close(self._fd)
+
+
+class KVClient:
+    """Interface minimale d'un client KV réseau (Redis, KeyDB...) utilisée par le WAF.
+
+    Les opérations d'un lot sont ("set", clé, valeur, ttl), ("incr", clé,
+    montant, ttl), ("delete", clé, None, None), ("hset", clé, (champ, valeur),
+    None) ou ("hdel", clé, champ, None); `apply_batch` retourne la nouvelle
+    valeur de chaque opération "incr" dans l'ordre du lot.
+    """
+
+    async def apply_batch(self, operations: List[Tuple]) -> List[int]:
+        raise NotImplementedError
+
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InMemoryKVClient(KVClient):
+    """Remplaçant local d'un serveur KV (tests, développement)"""
+
+    def __init__(self):
+        self.data: Dict[str, Tuple[Any, float]] = {}
+        self.hashes: Dict[str, Dict[str, Any]] = {}
+        self.batches = 0
+        self.reads = 0
+
+    def _live(self, key: str, now: float):
+        entry = self.data.get(key)
+        if entry is None or (entry[1] and entry[1] <= now):
+            self.data.pop(key, None)
+            return None
+        return entry
+
+    async def apply_batch(self, operations: List[Tuple]) -> List[int]:
+        now = time.time()
+        results = []
+        self.batches += 1
+        for kind, key, value, ttl in operations:
+            if kind == "set":
+                self.data[key] = (value, now + ttl if ttl else 0.0)
+            elif kind == "delete":
+                self.data.pop(key, None)
+            elif kind == "hset":
+                field, field_value = value
+                self.hashes.setdefault(key, {})[field] = field_value
+            elif kind == "hdel":
+                self.hashes.get(key, {}).pop(value, None)
+            elif kind == "incr":
+                entry = self._live(key, now)
+                if entry is None:
+                    entry = (0, now + ttl if ttl else 0.0)
+                entry = (entry[0] + value, entry[1])
+                self.data[key] = entry
+                results.append(entry[0])
+        return results
+
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        self.reads += 1
+        return dict(self.hashes.get(key, {}))
+
+
+class RedisKVClient(KVClient):
+    """Client KV Redis (dépendance optionnelle `redis`)"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("Le backend KV réseau requiert le paquet 'redis'") from e
+        self.redis = redis_asyncio.from_url(url)
+
+    async def apply_batch(self, operations: List[Tuple]) -> List[int]:
+        pipeline = self.redis.pipeline(transaction=False)
+        incr_positions = []
+        for kind, key, value, ttl in operations:
+            if kind == "set":
+                pipeline.set(key, value, px=int(ttl * 1000) if ttl else None)
+            elif kind == "delete":
+                pipeline.delete(key)
+            elif kind == "hset":
+                pipeline.hset(key, value[0], value[1])
+            elif kind == "hdel":
+                pipeline.hdel(key, value)
+            elif kind == "incr":
+                incr_positions.append(len(pipeline.command_stack))
+                pipeline.incrby(key, value)
+                if ttl:
+                    pipeline.expire(key, int(math.ceil(ttl)), nx=True)
+        results = await pipeline.execute()
+        return [int(results[position]) for position in incr_positions]
+
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        values = await self.redis.hgetall(key)
+        return {
+            field.decode() if isinstance(field, bytes) else field: float(value)
+            for field, value in values.items()
+        }
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class NetworkKVStateBackend(_OverlayStateBackend):
+    """État partagé via un serveur KV réseau (plusieurs hôtes).
+
+    Le chemin de requête lit une réplique locale. La blocklist est un seul
+    hash KV (HGETALL, jamais de SCAN du keyspace) relu toutes les
+    `refresh_interval` secondes, indépendamment des lots d'écriture; les
+    blocages posés ou levés localement sont appliqués à la réplique dès
+    l'envoi du lot. Les compteurs reprennent la valeur retournée par le
+    serveur. Les entrées expirées du hash sont ignorées à la lecture et
+    supprimées par le planificateur d'expiration qui les a posées.
+    """
+
+    def __init__(self, client: KVClient, refresh_interval: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self._blocked_replica: Dict[str, float] = {}
+        self._count_replica: Dict[str, int] = {}
+        self._last_refresh = 0.0
+
+    def _read_block(self, ip: str) -> float:
+        # La réplique doit être rafraîchie même sans écriture locale
+        self._ensure_flusher()
+        return self._blocked_replica.get(ip, 0.0)
+
+    def _read_count(self, counter_key: str) -> int:
+        return self._count_replica.get(counter_key, 0)
+
+    async def _sync(self, batch: List[Tuple]):
+        now = time.time()
+        operations = []
+        incr_keys = []
+        blocks: Dict[str, float] = {}
+        for operation in batch:
+            kind, key = operation[0], operation[1]
+            if kind == OP_BLOCK:
+                until = operation[2]
+                operations.append(("hset", BLOCKED_HASH, (key, 0.0 if until == math.inf else until), None))
+                blocks[key] = until
+            elif kind == OP_UNBLOCK:
+                operations.append(("hdel", BLOCKED_HASH, key, None))
+                blocks[key] = 0.0
+            elif kind == OP_INCR:
+                operations.append(("incr", key, operation[2], operation[3]))
+                incr_keys.append(key)
+
+        if operations:
+            values = await self.client.apply_batch(operations)
+            for key, value in zip(incr_keys, values):
+                self._count_replica[key] = value
+            for ip, until in blocks.items():
+                if until:
+                    self._blocked_replica[ip] = until
+                else:
+                    self._blocked_replica.pop(ip, None)
+
+        if now - self._last_refresh >= self.refresh_interval:
+            await self.refresh()
+
+    async def refresh(self):
+        """Relire la blocklist partagée (un seul HGETALL)"""
+        self._last_refresh = time.time()
+        blocked = await self.client.hgetall(BLOCKED_HASH)
+        self._blocked_replica = {
+            ip: float(until) or math.inf
+            for ip, until in blocked.items()
+            if not until or float(until) > self._last_refresh
+        }
+
+    def blocked_count(self) -> int:
+        now = time.time()
+        return sum(1 for until in self._blocked_replica.values() if until > now)
+
+    def counter_size(self, namespace: str) -> int:
+        prefix = f"{namespace}:"
+        return sum(1 for key in self._count_replica if key.startswith(prefix))
+
+    async def close(self):
+        await super().close()
+        await self.client.close()
+
+
+def create_state_backend(kind: str = "memory", url: Optional[str] = None,
+                         refresh_interval: float = 1.0, **options) -> WAFStateBackend:
+    """Créer le backend d'état WAF configuré ("memory", "shm" ou "redis")"""
+    if kind == "shm":
+        return SharedMemoryStateBackend(path=url, **options)
+    if kind == "redis":
+        return NetworkKVStateBackend(RedisKVClient(url or "redis://localhost:6379/0"),
+                                     refresh_interval=refresh_interval, **options)
+    if kind != "memory":
+        logging.warning(f"Backend d'état WAF inconnu '{kind}', utilisation du backend mémoire")
+    return InProcessStateBackend(**options)
+
+
+class BlockExpiryScheduler:
+    """Planificateur d'expiration des blocages temporaires.
+
+    Un tas (échéance, IP) et une seule tâche de fond remplacent une
+    coroutine `sleep(86400)` par blocage. Re-bloquer ou prolonger pousse une
+    nouvelle entrée en O(log n); les entrées périmées sont ignorées au dépilage.
+    Les blocages actifs sont persistés sur disque (fusion sous verrou entre
+    workers) et rechargés au démarrage. Chaque worker relit le fichier quand
+    il change: un blocage levé ailleurs est levé ici aussi, et n'est jamais
+    réécrit dans le fichier par un worker qui l'avait chargé.
+    """
+
+    def __init__(self, state: WAFStateBackend, persist_path: Optional[str] = None,
+                 batch_size: int = 1000, persist_interval: float = 5.0,
+                 max_sleep: float = 60.0):
+        self.state = state
+        self.persist_path = persist_path
+        self.batch_size = batch_size
+        self.persist_interval = persist_interval
+        self.max_sleep = max_sleep
+        self.deadlines: Dict[str, Tuple[float, str]] = {}
+        self.stats = {"bans": 0, "extensions": 0, "expired": 0, "persisted": 0,
+                      "unbanned_elsewhere": 0}
+        self._heap: List[Tuple[float, str]] = []
+        self._removed: set = set()
+        self._dirty = False
+        # Échéances lues au dernier passage sur le fichier (IP -> fin du blocage)
+        self._on_disk: Dict[str, float] = {}
+        self._file_signature: Optional[Tuple[int, int, int]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._persist_task: Optional[asyncio.Task] = None
+
+        if persist_path:
+            self.load()
+
+    def ban(self, ip: str, duration: float, reason: str = "", now: Optional[float] = None) -> float:
+        """Bloquer une IP pour `duration` secondes (un re-blocage ne raccourcit jamais)"""
+        now = time.time() if now is None else now
+        current = self.deadlines.get(ip)
+        until = now + duration
+        if current is not None and current[0] >= until:
+            return current[0]
+        self._schedule(ip, until, reason or (current[1] if current else ""))
+        self.stats["bans"] += 1
+        return until
+
+    def extend(self, ip: str, seconds: float, now: Optional[float] = None) -> Optional[float]:
+        """Prolonger un blocage actif"""
+        current = self.deadlines.get(ip)
+        if current is None:
+            return None
+        until = max(current[0], time.time() if now is None else now) + seconds
+        self._schedule(ip, until, current[1])
+        self.stats["extensions"] += 1
+        return until
+
+    def unban(self, ip: str):
+        """Lever un blocage avant son échéance"""
+        if self.deadlines.pop(ip, None) is not None:
+            self._removed.add(ip)
+            self._dirty = True
+        self.state.unblock_ip(ip)
+
+    def _schedule(self, ip: str, until: float, reason: str):
+        self.deadlines[ip] = (until, reason)
+        self._removed.discard(ip)
+        heapq.heappush(self._heap, (until, ip))
+        self.state.block_ip(ip, until)
+        self._dirty = True
+
+        # Compacter le tas si les entrées périmées dominent
+        if len(self._heap) > 2 * len(self.deadlines) + 1024:
+            self._heap = [(deadline, banned_ip) for banned_ip, (deadline, _) in self.deadlines.items()]
+            heapq.heapify(self._heap)
+
+        self._ensure_tasks()
+        if self._heap[0][1] == ip and self._wakeup is not None:
+            self._wakeup.set()
+
+    def expire_due(self, now: Optional[float] = None) -> int:
+        """Débloquer par lot les IPs arrivées à échéance"""
+        now = time.time() if now is None else now
+        expired = 0
+        while self._heap and self._heap[0][0] <= now and expired < self.batch_size:
+            until, ip = heapq.heappop(self._heap)
+            current = self.deadlines.get(ip)
+            if current is None or current[0] != until:
+                continue  # Entrée périmée (re-blocage, prolongation ou levée)
+            del self.deadlines[ip]
+            self._removed.add(ip)
+            self.state.unblock_ip(ip)
+            expired += 1
+
+        if expired:
+            self.stats["expired"] += expired
+            self._dirty = True
+        return expired
+
+    def ensure_started(self):
+        """Démarrer expiration et relecture du fichier (appelé au démarrage du serveur)"""
+        self._ensure_tasks()
+
+    def _ensure_tasks(self):
+        """Démarrer les tâches de fond dès qu'une boucle asyncio tourne"""
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._expiry_loop())
+        if self.persist_path:
+            self._persist_task = loop.create_task(self._persist_loop())
+
+    async def _expiry_loop(self):
+        """Tâche unique: dormir jusqu'à la prochaine échéance puis débloquer par lot"""
+        while True:
+            try:
+                delay = self.max_sleep
+                if self._heap:
+                    delay = min(max(self._heap[0][0] - time.time(), 0.0), self.max_sleep)
+                # asyncio.wait (et non wait_for, qui sous Python 3.11 peut absorber une
+                # annulation si le réveil arrive au même instant): l'arrêt reste immédiat
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=delay)
+                finally:
+                    waiter.cancel()
+                self._wakeup.clear()
+
+                # Céder la boucle entre deux lots lors d'une expiration massive
+                while self.expire_due() >= self.batch_size:
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur expiration des blocages: {e}")
+                await asyncio.sleep(1)
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            try:
+                if self._dirty:
+                    await self.persist()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erreur relecture des blocages: {e}")
+
+    async def persist(self):
+        """Persister les blocages actifs sans bloquer la boucle asyncio"""
+        self._dirty = False
+        deadlines, removed = dict(self.deadlines), self._removed
+        self._removed = set()
+        try:
+            merged, signature = await asyncio.get_running_loop().run_in_executor(
+                None, self._write_snapshot, deadlines, removed, dict(self._on_disk)
+            )
+            self.stats["persisted"] += 1
+        except Exception as e:
+            self._dirty = True
+            self._removed |= removed
+            logging.error(f"Erreur persistance des blocages: {e}")
+            return
+        self._reconcile(merged, signature)
+
+    async def refresh(self) -> int:
+        """Relire le fichier s'il a changé (écrit par un autre worker); nombre de changements"""
+        if self._signature() == self._file_signature:
+            return 0
+        entries, signature = await asyncio.get_running_loop().run_in_executor(None, self._read_locked)
+        return self._reconcile(entries, signature)
+
+    def _reconcile(self, entries: Dict[str, Tuple[float, str]],
+                   signature: Optional[Tuple[int, int, int]]) -> int:
+        """Aligner la mémoire sur le fichier: blocages posés et levés par les autres workers"""
+        now = time.time()
+        on_disk = {ip: entry for ip, entry in entries.items() if entry[0] > now}
+
+        dirty = self._dirty
+        changes = 0
+        # Présent au dernier passage, absent maintenant: levé (ou expiré) ailleurs.
+        # Un blocage posé ici depuis (échéance plus lointaine) est conservé.
+        for ip in self._on_disk.keys() - on_disk.keys():
+            current = self.deadlines.get(ip)
+            if current is not None and current[0] <= self._on_disk[ip]:
+                del self.deadlines[ip]
+                self._removed.discard(ip)  # Déjà absent du fichier
+                self.state.unblock_ip(ip)
+                if current[0] > now:
+                    self.stats["unbanned_elsewhere"] += 1
+                changes += 1
+        for ip, (until, reason) in on_disk.items():
+            current = self.deadlines.get(ip)
+            if ip not in self._removed and (current is None or current[0] < until):
+                self._schedule(ip, until, reason)
+                changes += 1
+        self._dirty = dirty  # Rien de nouveau à écrire
+        self._on_disk = {ip: entry[0] for ip, entry in on_disk.items()}
+        self._file_signature = signature
+        return changes
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.persist_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def _lock(self, exclusive: bool) -> int:
+        lock_fd = os.open(self.persist_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_fd
+
+    def _read_locked(self) -> Tuple[Dict[str, Tuple[float, str]], Optional[Tuple[int, int, int]]]:
+        """Lire le fichier et sa signature sous verrou partagé (pas d'écriture concurrente)"""
+        lock_fd = self._lock(exclusive=False)
+        try:
+            return self._read_snapshot(), self._signature()
+        finally:
+            os.close(lock_fd)
+
+    def _write_snapshot(self, deadlines: Dict[str, Tuple[float, str]], removed: set,
+                        known: Dict[str, float]):
+        """Fusionner avec le fichier existant (autres workers) et écrire atomiquement.
+
+        Un blocage déjà lu dans le fichier (`known`) qui n'y figure plus a été
+        levé par un autre worker: il n'est réécrit que s'il a été reposé ici
+        depuis (échéance plus lointaine).
+        """
+        lock_fd = self._lock(exclusive=True)
+        try:
+            now = time.time()
+            current = self._read_snapshot()
+            merged = {
+                ip: entry for ip, entry in current.items()
+                if ip not in removed and entry[0] > now
+            }
+            for ip, entry in deadlines.items():
+                if ip not in current and ip in known and entry[0] <= known[ip]:
+                    continue
+                if ip not in merged or merged[ip][0] < entry[0]:
+                    merged[ip] = entry
+
+            temporary_path = f"{self.persist_path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump({ip: list(entry) for ip, entry in merged.items()}, f)
+            os.replace(temporary_path, self.persist_path)
+            return merged, self._signature()
+        finally:
+            os.close(lock_fd)
+
+    def _read_snapshot(self) -> Dict[str, Tuple[float, str]]:
+        try:
+            with open(self.persist_path) as f:
+                return {ip: (float(entry[0]), str(entry[1])) for ip, entry in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"Fichier de blocages illisible {self.persist_path}: {e}")
+            return {}
+
+    def load(self) -> int:
+        """Recharger les blocages persistés encore actifs"""
+        return self._reconcile(*self._read_locked())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_bans": len(self.deadlines),
+            "heap_size": len(self._heap),
+            **self.stats
+        }
@@ -4,15 +4,35 @@ Complete FastAPI application with all phases integrated
 """
 
 import asyncio
+import logging
 import os
+import time
 import uuid
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import Dict, Any, Optional, List
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
+from product_catalog import ProductCatalog
+from product_search import ProductSearchIndex
+from security_chatbot import ResponseCache
+from security_credentials import KIND_SESSION
+from security_events import parse_period, parse_timestamp, timestamp_in_range
+from security_llm import FakeTokenStream, LLMError, sse_event
+from security_metrics import (
+    BlockingCallWatchdog, MetricsRegistry, RequestMetricsMiddleware, gc_pause_tracker, loop_lag_probe
+)
+from security_openmetrics import (
+    CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, counter, exposition, gauge, labeled_counter, windowed_histogram
+)
+from security_module import (  # Also registers the "security" collector on /metrics
+    PasswordHasher, api_key_manager, authenticate_request, block_scheduler, event_store, llm_gateway,
+    multilingual_chatbot as security_chatbot, oauth2_scheme, session_manager
+)
+from security_request import route_template
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -30,16 +50,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms and decayed throughput (constant memory)
+STARTED_AT = time.time()
+request_metrics = MetricsRegistry(window=60, max_series=256)
+
+# Opt-in blocking-call detector: captures the loop thread's stack (and route) when a
+# callback holds the event loop longer than the threshold
+LOOP_WATCHDOG_ENABLED = os.environ.get("RIMAREUM_LOOP_WATCHDOG", "0").lower() in ("1", "true", "yes")
+loop_watchdog = BlockingCallWatchdog(
+    threshold=float(os.environ.get("RIMAREUM_LOOP_WATCHDOG_THRESHOLD_MS", "100")) / 1000,
+    route_of=route_template
+)
+app.add_middleware(RequestMetricsMiddleware, registry=request_metrics, route_of=route_template,
+                   watchdog=loop_watchdog if LOOP_WATCHDOG_ENABLED else None)
+
+
+def request_metrics_collector():
+    """OpenMetrics families for per-route request counts, errors and latency"""
+    series = list(request_metrics.series.items())
+    return [
+        counter("rimareum_http_requests", "HTTP requests handled, by route template",
+                [({"route": route}, metrics.latency.lifetime_count) for route, metrics in series]),
+        counter("rimareum_http_request_errors", "HTTP requests that failed with a 5xx or an exception",
+                [({"route": route}, metrics.errors.value) for route, metrics in series]),
+        windowed_histogram("rimareum_http_request_duration_seconds", "HTTP request latency, by route template",
+                           [({"route": route}, metrics.latency) for route, metrics in series]),
+    ]
+
+
+def loop_watchdog_collector():
+    """OpenMetrics families for blocking calls caught by the loop watchdog"""
+    return [
+        labeled_counter("rimareum_event_loop_blocking_calls", "Event loop stalls above the watchdog threshold",
+                        loop_watchdog.sites),
+        windowed_histogram("rimareum_event_loop_stall_seconds", "Duration of detected event loop stalls",
+                           [({}, loop_watchdog.stalls)]),
+    ]
+
+
+exposition.register("http", request_metrics_collector)
+if LOOP_WATCHDOG_ENABLED:
+    exposition.register("loop_watchdog", loop_watchdog_collector)
+
 # Create API router with /api prefix
 from fastapi import APIRouter
 api_router = APIRouter(prefix="/api")
 
 # Global storage for demo purposes
-products_db = []
+product_catalog = ProductCatalog()  # Shared by /api/products and /api/shop/*
+product_search = ProductSearchIndex()  # BM25 index kept in sync with the catalog
+product_catalog.listeners.append(product_search.on_change)
 users_db = []
+users_by_username: Dict[str, Dict[str, Any]] = {}  # username -> user (usernames are unique)
 carts_db = {}
 payments_db = []
-security_events = []
 
 # Sample products data
 SAMPLE_PRODUCTS = [
@@ -78,17 +142,138 @@ SAMPLE_PRODUCTS = [
     }
 ]
 
+# Assistant reply templates (immutable, built once at import)
+SUPPORTED_LANGUAGES = ("fr", "en", "ar", "es")
+
+CHATBOT_TEMPLATES = MappingProxyType({
+    "fr": "Bonjour! Vous avez dit: '{message}'. Comment puis-je vous aider avec RIMAREUM?",
+    "en": "Hello! You said: '{message}'. How can I help you with RIMAREUM?",
+    "ar": "مرحبا! قلت: '{message}'. كيف يمكنني مساعدتك مع RIMAREUM؟",
+    "es": "¡Hola! Dijiste: '{message}'. ¿Cómo puedo ayudarte con RIMAREUM?"
+})
+
+SHOP_ASSISTANT_TEMPLATES = MappingProxyType({
+    "fr": "Assistant IA: Je peux vous aider à trouver des produits. Que recherchez-vous?",
+    "en": "AI Assistant: I can help you find products. What are you looking for?",
+    "ar": "مساعد الذكاء الاصطناعي: يمكنني مساعدتك في العثور على المنتجات. ماذا تبحث عنه؟",
+    "es": "Asistente IA: Puedo ayudarte a encontrar productos. ¿Qué estás buscando?"
+})
+
+SHOP_ASSISTANT_RECOMMENDATIONS = (
+    MappingProxyType({"product_id": "prod-1", "reason": "Popular choice"}),
+    MappingProxyType({"product_id": "prod-2", "reason": "Best seller"}),
+)
+
+# Repeated questions are answered from an LRU keyed by (endpoint, language, intent/message);
+# only the timestamp is added per request. Longer messages bypass the cache.
+assistant_responses = ResponseCache(maxsize=int(os.environ.get("RIMAREUM_ASSISTANT_CACHE_SIZE", "2048")))
+ASSISTANT_CACHE_MAX_MESSAGE = 256
+
+
+def assistant_cache_collector():
+    """OpenMetrics families for the assistant response cache"""
+    stats = assistant_responses.get_stats()
+    return [
+        counter("rimareum_assistant_response_cache_hits", "Assistant replies served from the response cache",
+                [({}, stats["hits"])]),
+        counter("rimareum_assistant_response_cache_misses", "Assistant replies built from the templates",
+                [({}, stats["misses"])]),
+        gauge("rimareum_assistant_response_cache_entries", "Replies held in the response cache",
+              [({}, stats["size"])]),
+    ]
+
+
+exposition.register("assistant", assistant_cache_collector)
+
+# Streaming assistant replies (Server-Sent Events). Tokens come from the shared LLM gateway
+# (security_module.llm_gateway: one pool, semaphore and circuit breaker per provider) when an
+# OpenAI-compatible key is configured; otherwise (or with RIMAREUM_FAKE_LLM=1) a local fake
+# generator replays the template reply token by token.
+ASSISTANT_LLM_PROVIDER = "openai"
+ASSISTANT_FAKE_LLM = os.environ.get("RIMAREUM_FAKE_LLM", "0").lower() in ("1", "true", "yes")
+fake_tokens = FakeTokenStream(token_delay=float(os.environ.get("RIMAREUM_FAKE_TOKEN_DELAY_MS", "20")) / 1000)
+
+CHATBOT_SYSTEM_PROMPT = "You are the RIMAREUM assistant. Answer briefly in the user's language ({language})."
+SHOP_ASSISTANT_SYSTEM_PROMPT = ("You are the RIMAREUM shopping assistant. Help the user find products "
+                                "and answer briefly in the user's language ({language}).")
+SANCTUARY_SYSTEM_PROMPT = ("You are the RIMAREUM Sanctuary, answering with the Token TRIO (GPT, DeepSeek, NADJIB). "
+                           "Reply briefly in the user's language ({language}).")
+
+
+def text_field(data: Dict[str, Any], key: str, default: str) -> str:
+    """Request field as text: JSON numbers, lists or null are stringified (as the f-string templates did)"""
+    value = data.get(key, default)
+    return value if isinstance(value, str) else str(value)
+
+
+def assistant_messages(system_prompt: str, language: str, message: str) -> List[Dict[str, str]]:
+    return [{"role": "system", "content": system_prompt.format(language=language)},
+            {"role": "user", "content": message}]
+
+
+async def assistant_tokens(messages: List[Dict[str, str]], fallback: str):
+    """Reply fragments from the LLM, or from the fake generator (also used if the LLM fails before its first token)"""
+    if not ASSISTANT_FAKE_LLM and llm_gateway.has_provider(ASSISTANT_LLM_PROVIDER):
+        started = False
+        try:
+            async for token in llm_gateway.stream(ASSISTANT_LLM_PROVIDER, messages):
+                started = True
+                yield token
+            return
+        except LLMError as e:
+            if started:
+                raise
+            logging.warning(f"Assistant LLM unavailable, replaying template reply: {e}")
+    async for token in fake_tokens(fallback):
+        yield token
+
+
+async def assistant_event_stream(meta: Dict[str, Any], messages: List[Dict[str, str]], fallback: str,
+                                 trailing=None):
+    """SSE events: `meta`, one `token` per fragment, optional trailing events, then `done`.
+
+    A client disconnect cancels the response task, which unwinds this generator and
+    closes the upstream LLM stream (releasing its concurrency slot).
+    """
+    yield sse_event("meta", meta)
+    parts = []
+    try:
+        async for token in assistant_tokens(messages, fallback):
+            parts.append(token)
+            yield sse_event("token", {"text": token})
+    except LLMError as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+    text = "".join(parts)
+    for event, data in (trailing(text) if trailing else ()):
+        yield sse_event(event, data)
+    yield sse_event("done", {"text": text, "timestamp": datetime.utcnow().isoformat()})
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Initialize products on startup
 @api_router.on_event("startup")
 async def startup_event():
     """Initialize application data"""
-    global products_db
-    products_db = SAMPLE_PRODUCTS.copy()
+    product_catalog.replace_all(SAMPLE_PRODUCTS)
+    gc_pause_tracker.install()
+    loop_lag_probe.ensure_started()
+    block_scheduler.ensure_started()  # Ban expiry + reload of bans lifted by other workers
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.ensure_started()
     print("🚀 RIMAREUM BACKEND API V11.0 STARTED")
     print("✅ Sample products loaded")
     print("✅ CORS configured")
     print("✅ All endpoints ready")
 
+@api_router.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled upstream connections"""
+    await llm_gateway.aclose()
+
 # Root endpoint
 @api_router.get("/")
 async def root():
@@ -116,20 +301,12 @@ async def health_check():
 @api_router.get("/products")
 async def get_products(category: Optional[str] = None, featured: Optional[bool] = None):
     """Get all products with optional filtering"""
-    filtered_products = products_db.copy()
-    
-    if category:
-        filtered_products = [p for p in filtered_products if p.get("category") == category]
-    
-    if featured is not None:
-        filtered_products = [p for p in filtered_products if p.get("is_featured") == featured]
-    
-    return filtered_products
+    return product_catalog.view(category=category or None, featured=featured)
 
 @api_router.get("/products/{product_id}")
 async def get_product(product_id: str):
     """Get specific product by ID"""
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    product = product_catalog.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -188,13 +365,13 @@ async def chat_message(chat_data: Dict[str, Any]):
 async def get_admin_stats():
     """Get admin statistics"""
     return {
-        "total_products": len(products_db),
+        "total_products": len(product_catalog),
         "total_users": len(users_db),
         "total_orders": 0,
         "total_payments": len(payments_db),
         "total_revenue": 0,
-        "blocked_ips": 0,
-        "security_events": len(security_events),
+        "blocked_ips": await event_store.run("distinct_ips", blocked_only=True),
+        "security_events": (await event_store.run("count"))["total"],
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -216,18 +393,29 @@ async def get_security_status():
 @api_router.post("/auth/register")
 async def register_user(user_data: Dict[str, Any]):
     """Register new user"""
+    username = user_data.get("username")
+    password = user_data.get("password")
+    if not isinstance(username, str) or not username or not isinstance(password, str) or not password:
+        raise HTTPException(status_code=400, detail="Username and password are required")
+    if username in users_by_username:
+        raise HTTPException(status_code=409, detail="Username already registered")
+    
+    # bcrypt runs on the bounded hashing pool (503 + Retry-After when saturated)
+    password_hash = await PasswordHasher.hash_password_async(password)
     user_id = str(uuid.uuid4())
-    api_key = str(uuid.uuid4())
+    api_key = api_key_manager.generate_api_key(user_id)
     
     user = {
         "user_id": user_id,
         "email": user_data.get("email"),
-        "username": user_data.get("username"),
+        "username": username,
+        "password_hash": password_hash,
         "api_key": api_key,
         "created_at": datetime.utcnow().isoformat()
     }
     
     users_db.append(user)
+    users_by_username[username] = user
     
     return {
         "user_id": user_id,
@@ -239,18 +427,38 @@ async def register_user(user_data: Dict[str, Any]):
 async def login_user(login_data: Dict[str, Any]):
     """Login user"""
     username = login_data.get("username")
-    user = next((u for u in users_db if u["username"] == username), None)
+    password = login_data.get("password")
+    user = users_by_username.get(username) if isinstance(username, str) else None
     
-    if not user:
+    if not user or not isinstance(password, str) or \
+            not await PasswordHasher.verify_password_async(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     return {
-        "access_token": str(uuid.uuid4()),
+        "access_token": session_manager.create_session(user["user_id"]),
         "token_type": "bearer",
-        "expires_in": 3600,
+        "expires_in": session_manager.session_ttl,
         "api_key": user["api_key"]
     }
 
+@api_router.get("/auth/me")
+async def get_current_user(credential: Dict[str, Any] = Depends(authenticate_request)):
+    """Return the authenticated caller (session token or API key)"""
+    return {
+        "user_id": credential["user_id"],
+        "auth_type": credential["kind"],
+        "expires": credential["expires"].isoformat() if credential["expires"] else None
+    }
+
+@api_router.post("/auth/logout")
+async def logout_user(credential: Dict[str, Any] = Depends(authenticate_request),
+                      token: Optional[str] = Depends(oauth2_scheme)):
+    """Close the current session (API keys are left untouched)"""
+    if credential["kind"] != KIND_SESSION:
+        raise HTTPException(status_code=400, detail="Logout requires a session token")
+    session_manager.revoke_session(token)
+    return {"message": "Logged out successfully"}
+
 @api_router.post("/security/report")
 async def report_security_event(event_data: Dict[str, Any]):
     """Report security event"""
@@ -259,27 +467,54 @@ async def report_security_event(event_data: Dict[str, Any]):
         "timestamp": datetime.utcnow().isoformat(),
         **event_data
     }
-    security_events.append(event)
+    await event_store.add([event])
     
     return {
         "message": "Security event reported successfully",
         "event_id": event["id"]
     }
 
+def period_start(period: str, now: float) -> float:
+    """Start of a look-back window ("15m", "24h", "7d"); 400 if it precedes the epoch"""
+    since = now - parse_period(period)
+    if not timestamp_in_range(since):
+        raise HTTPException(status_code=400, detail="Invalid period")
+    return since
+
 @api_router.get("/security/audit")
-async def get_security_audit():
-    """Get security audit data"""
+async def get_security_audit(period: str = "24h", since: Optional[str] = None,
+                             until: Optional[str] = None, ip: Optional[str] = None,
+                             threat_type: Optional[str] = None, severity: Optional[str] = None,
+                             limit: int = 100):
+    """Get security audit data (since/until: ISO 8601 or epoch seconds)"""
+    since_ts = parse_timestamp(since) if since else period_start(period, time.time())
+    until_ts = parse_timestamp(until) if until else None
+    if since_ts is None or (until and until_ts is None):
+        raise HTTPException(status_code=400, detail="Invalid since/until timestamp")
+
+    summary = await event_store.run("summary", since_ts, until_ts, ip=ip)
+    events = await event_store.run(
+        "query", since_ts, until_ts, ip=ip, threat_type=threat_type, severity=severity,
+        limit=max(1, min(limit, 1000))
+    )
+    audit = {
+        "audit_period": period if not since else None,
+        "since": datetime.utcfromtimestamp(since_ts).isoformat(),
+        "until": datetime.utcfromtimestamp(until_ts).isoformat() if until_ts else None,
+        "ip": ip,
+        "total_events": summary["counts"]["total"],
+        "blocked_events": summary["counts"]["blocked"],
+        "threat_distribution": summary["distribution"],
+    }
+    if ip is None:  # Offender ranking only makes sense across IPs
+        audit["top_offenders"] = summary["top_offenders"]
     return {
-        "audit_period": "24h",
-        "total_events": len(security_events),
-        "blocked_events": 0,
+        **audit,
+        "events": events,
         "guardian_ai_status": "ACTIVE",
         "timestamp": datetime.utcnow().isoformat()
     }
 
-# Include the API router in the app
-app.include_router(api_router)
-
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
@@ -314,32 +549,53 @@ async def get_sentinel_status():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+def chatbot_reply(language: str, message: str) -> Dict[str, Any]:
+    """Multilingual chatbot reply (without timestamp), from the response cache when possible"""
+    def build():
+        return {
+            "response": CHATBOT_TEMPLATES.get(language, CHATBOT_TEMPLATES["en"]).format(message=message),
+            "detected_language": language,
+            "response_type": "multilingual_support",
+            "supported_languages": list(SUPPORTED_LANGUAGES)
+        }
+    
+    if len(message) > ASSISTANT_CACHE_MAX_MESSAGE:
+        return build()
+    return assistant_responses.get_or_build(("chatbot", language, message), build)
+
 @api_router.post("/chatbot/multilingual")
 async def multilingual_chatbot(chat_data: Dict[str, Any]):
-    """Multilingual chatbot"""
-    language = chat_data.get("language", "en")
-    message = chat_data.get("message", "")
-    
-    responses = {
-        "fr": f"Bonjour! Vous avez dit: '{message}'. Comment puis-je vous aider avec RIMAREUM?",
-        "en": f"Hello! You said: '{message}'. How can I help you with RIMAREUM?",
-        "ar": f"مرحبا! قلت: '{message}'. كيف يمكنني مساعدتك مع RIMAREUM؟",
-        "es": f"¡Hola! Dijiste: '{message}'. ¿Cómo puedo ayudarte con RIMAREUM?"
-    }
-    
-    return {
-        "response": responses.get(language, responses["en"]),
-        "detected_language": language,
-        "response_type": "multilingual_support",
-        "supported_languages": ["fr", "en", "ar", "es"],
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    """Multilingual chatbot (FAQ and intents, then the shared LLM when a provider is configured)"""
+    language = text_field(chat_data, "language", "en")
+    message = text_field(chat_data, "message", "")
+    if not ASSISTANT_FAKE_LLM and llm_gateway.has_provider(ASSISTANT_LLM_PROVIDER):
+        answer = await security_chatbot.get_response_async(message, language)
+        return {
+            "response": answer["message"],
+            "detected_language": answer["language"],
+            "response_type": answer["type"],
+            "supported_languages": list(SUPPORTED_LANGUAGES),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    reply = chatbot_reply(language, message)
+    return {**reply, "timestamp": datetime.utcnow().isoformat()}
+
+@api_router.post("/chatbot/multilingual/stream")
+async def multilingual_chatbot_stream(chat_data: Dict[str, Any]):
+    """Multilingual chatbot, streamed as Server-Sent Events"""
+    language = text_field(chat_data, "language", "en")
+    message = text_field(chat_data, "message", "")
+    reply = chatbot_reply(language, message)
+    meta = {key: value for key, value in reply.items() if key != "response"}
+    return sse_response(assistant_event_stream(
+        meta, assistant_messages(CHATBOT_SYSTEM_PROMPT, language, message), reply["response"]
+    ))
 
 @api_router.get("/chatbot/languages")
 async def get_supported_languages():
     """Get supported languages"""
     return {
-        "supported_languages": ["fr", "en", "ar", "es"],
+        "supported_languages": list(SUPPORTED_LANGUAGES),
         "language_details": {
             "fr": {"name": "Français", "region": "France"},
             "en": {"name": "English", "region": "Global"},
@@ -362,14 +618,27 @@ async def get_gpt_security_report(time_period: str = "24h"):
     }
 
 @api_router.get("/security/intelligence")
-async def get_threat_intelligence():
+async def get_threat_intelligence(period: str = "24h"):
     """Get threat intelligence data"""
+    now = time.time()
+    since = period_start(period, now)
+    summary = await event_store.run("summary", since)
+    last_hour = await event_store.run("threat_distribution", now - 3600)
+    distribution = summary["distribution"]
+
     return {
         "threat_intelligence": {
-            "active_threats": 0,
-            "blocked_ips": 0,
-            "suspicious_patterns": 0
+            "active_threats": sum(
+                last_hour["by_severity"].get(severity, 0) for severity in ("HIGH", "CRITICAL")
+            ),
+            "blocked_ips": summary["blocked_ips"],
+            "suspicious_patterns": len(distribution["by_type"]),
+            "threat_types": distribution["by_type"],
+            "severity_distribution": distribution["by_severity"],
+            "hourly_distribution": distribution["hourly"],
+            "top_offenders": summary["top_offenders"]
         },
+        "period": period,
         "last_update": datetime.utcnow().isoformat(),
         "source": "RIMAREUM SENTINEL CORE",
         "confidence_level": "HIGH"
@@ -378,17 +647,37 @@ async def get_threat_intelligence():
 @api_router.get("/security/monitoring/stats")
 async def get_monitoring_stats():
     """Get continuous monitoring stats"""
+    metrics = request_metrics.snapshot()
+    total = metrics["total"]
+    processed = total["throughput"]["total"]
+    blocked = (await event_store.run("count", time.time() - 86400))["blocked"]
+    availability = 100.0 * (1 - total["errors"] / processed) if processed else 100.0
+
     return {
         "monitoring_stats": {
-            "uptime": "99.9%",
-            "requests_processed": 1000,
-            "threats_blocked": 0,
+            "uptime": f"{availability:.1f}%",
+            "uptime_seconds": round(time.time() - STARTED_AT),
+            "requests_processed": processed,
+            "threats_blocked": blocked,
             "ai_interventions": 0
         },
+        "latency": total["latency"],
+        "throughput": total["throughput"],
+        "routes": metrics["series"],
+        "assistant_response_cache": assistant_responses.get_stats(),
         "phase": "7_SENTINEL_CORE",
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@api_router.get("/security/monitoring/blocking-calls")
+async def get_blocking_calls():
+    """Event loop stalls captured by the opt-in watchdog (RIMAREUM_LOOP_WATCHDOG=1)"""
+    return {
+        "enabled": LOOP_WATCHDOG_ENABLED,
+        "watchdog": loop_watchdog.get_stats() if LOOP_WATCHDOG_ENABLED else None,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 @api_router.get("/security/ml/model")
 async def get_ml_model_info():
     """Get ML model information"""
@@ -434,15 +723,31 @@ async def get_shop_status():
 async def get_shop_products():
     """Get shop products"""
     return {
-        "products": products_db,
-        "total_count": len(products_db),
+        "products": product_catalog.view(),
+        "total_count": len(product_catalog),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@api_router.get("/shop/search")
+async def search_shop_products(q: str = Query(..., min_length=1, max_length=200), category: Optional[str] = None,
+                               page: int = Query(1, ge=1, le=50), page_size: int = Query(20, ge=1, le=100)):
+    """Search products (BM25, accent-insensitive, prefix and typo tolerant), paginated"""
+    result = product_search.search(q, category=category or None, offset=(page - 1) * page_size, limit=page_size)
+    return {
+        "query": q,
+        "category": category,
+        "page": page,
+        "page_size": page_size,
+        "total": result["total"],
+        "products": [{**product_catalog.get(product_id), "relevance": round(score, 4)}
+                     for product_id, score in result["hits"]],
         "timestamp": datetime.utcnow().isoformat()
     }
 
 @api_router.get("/shop/categories")
 async def get_shop_categories():
     """Get product categories"""
-    categories = list(set(p["category"] for p in products_db))
+    categories = product_catalog.values("category")
     return {
         "categories": categories,
         "total_count": len(categories),
@@ -478,7 +783,7 @@ async def add_to_cart(cart_id: str, item_data: Dict[str, Any]):
     product_id = item_data.get("product_id")
     quantity = item_data.get("quantity", 1)
     
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    product = product_catalog.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -510,33 +815,35 @@ async def get_cart(cart_id: str):
     
     return carts_db[cart_id]
 
+def shop_assistant_reply(language: str) -> Dict[str, Any]:
+    """Shopping assistant reply (without timestamp), from the response cache"""
+    return assistant_responses.get_or_build(("shop_assistant", language), lambda: {
+        "assistant_response": SHOP_ASSISTANT_TEMPLATES.get(language, SHOP_ASSISTANT_TEMPLATES["en"]),
+        "language": language,
+        "recommendations": [dict(recommendation) for recommendation in SHOP_ASSISTANT_RECOMMENDATIONS]
+    })
+
 @api_router.post("/shop/assistant")
 async def shop_assistant(request_data: Dict[str, Any]):
     """AI shopping assistant"""
-    language = request_data.get("language", "en")
-    message = request_data.get("message", "")
-    
-    responses = {
-        "fr": f"Assistant IA: Je peux vous aider à trouver des produits. Que recherchez-vous?",
-        "en": f"AI Assistant: I can help you find products. What are you looking for?",
-        "ar": f"مساعد الذكاء الاصطناعي: يمكنني مساعدتك في العثور على المنتجات. ماذا تبحث عنه؟",
-        "es": f"Asistente IA: Puedo ayudarte a encontrar productos. ¿Qué estás buscando?"
-    }
-    
-    return {
-        "assistant_response": responses.get(language, responses["en"]),
-        "language": language,
-        "recommendations": [
-            {"product_id": "prod-1", "reason": "Popular choice"},
-            {"product_id": "prod-2", "reason": "Best seller"}
-        ],
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    reply = shop_assistant_reply(text_field(request_data, "language", "en"))
+    return {**reply, "timestamp": datetime.utcnow().isoformat()}
+
+@api_router.post("/shop/assistant/stream")
+async def shop_assistant_stream(request_data: Dict[str, Any]):
+    """AI shopping assistant, streamed as Server-Sent Events (recommendations follow the text)"""
+    language = text_field(request_data, "language", "en")
+    reply = shop_assistant_reply(language)
+    messages = assistant_messages(SHOP_ASSISTANT_SYSTEM_PROMPT, language, text_field(request_data, "message", ""))
+    return sse_response(assistant_event_stream(
+        {"language": language}, messages, reply["assistant_response"],
+        trailing=lambda text: [("recommendations", {"recommendations": reply["recommendations"]})]
+    ))
 
 @api_router.get("/shop/qrcode/{product_id}")
 async def generate_qr_code(product_id: str):
     """Generate QR code for product"""
-    product = next((p for p in products_db if p["id"] == product_id), None)
+    product = product_catalog.get(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -628,6 +935,10 @@ async def multiverse_sync():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+SANCTUARY_RESPONSE = "Sanctuaire activated with Token TRIO"
+SANCTUARY_VIBRATION_MIRROR = "Δ144_RESONANCE_OPTIMAL"
+SANCTUARY_AI_ENTITIES = ("GPT", "DeepSeek", "NADJIB")
+
 @api_router.post("/sanctuary/input")
 async def sanctuary_input(input_data: Dict[str, Any]):
     """Sanctuary IA-Humain input"""
@@ -636,13 +947,32 @@ async def sanctuary_input(input_data: Dict[str, Any]):
     return {
         "session_id": str(uuid.uuid4()),
         "user_id": user_id,
-        "sanctuary_response": "Sanctuaire activated with Token TRIO",
+        "sanctuary_response": SANCTUARY_RESPONSE,
         "token_trio_status": "TRIO_ACTIVE",
-        "vibration_mirror": "Δ144_RESONANCE_OPTIMAL",
-        "ai_entities": ["GPT", "DeepSeek", "NADJIB"],
+        "vibration_mirror": SANCTUARY_VIBRATION_MIRROR,
+        "ai_entities": list(SANCTUARY_AI_ENTITIES),
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@api_router.post("/sanctuary/input/stream")
+async def sanctuary_input_stream(input_data: Dict[str, Any]):
+    """Sanctuary IA-Humain input, streamed as Server-Sent Events (vibration feedback as a trailing event)"""
+    meta = {
+        "session_id": str(uuid.uuid4()),
+        "user_id": input_data.get("user_id"),
+        "token_trio_status": "TRIO_ACTIVE",
+        "ai_entities": list(SANCTUARY_AI_ENTITIES)
+    }
+    messages = assistant_messages(SANCTUARY_SYSTEM_PROMPT, text_field(input_data, "language", "fr"),
+                                  text_field(input_data, "message", ""))
+    return sse_response(assistant_event_stream(
+        meta, messages, SANCTUARY_RESPONSE,
+        trailing=lambda text: [("vibration", {
+            "vibration_mirror": SANCTUARY_VIBRATION_MIRROR,
+            "vibration_pattern": input_data.get("vibration_pattern")
+        })]
+    ))
+
 @api_router.post("/sanctuary/feedback")
 async def sanctuary_feedback(feedback_data: Dict[str, Any]):
     """Sanctuary feedback"""
@@ -771,5 +1101,14 @@ async def create_subscription(subscription_data: Dict[str, Any]):
 #         content={"detail": "Internal server error", "error": str(exc)}
 #     )
 
+# Prometheus/OpenMetrics scrape endpoint (outside /api, rendered on demand)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose collected metrics in the OpenMetrics text format"""
+    return Response(exposition.render(), media_type=OPENMETRICS_CONTENT_TYPE)
+
+# Include the API router in the app (after every endpoint has been registered)
+app.include_router(api_router)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
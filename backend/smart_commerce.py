@@ -10,11 +10,16 @@ import qrcode
 import io
 import base64
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence
 from dataclasses import dataclass, field
+from types import MappingProxyType
 from PIL import Image
 import uuid
 
+from product_catalog import ProductCatalog, attribute_field
+from product_search import ProductSearchIndex
+from security_chatbot import ResponseCache
+
 # Configuration Smart Commerce
 SMART_COMMERCE_CONFIG = {
     "qr_code_base_url": "https://rimareum.com/product/",
@@ -22,6 +27,7 @@ SMART_COMMERCE_CONFIG = {
     "cross_selling_threshold": 0.7,
     "upselling_threshold": 0.8,
     "recommendation_limit": 5,
+    "search_limit": 50,
     "cart_session_duration": 3600,  # 1 heure
     "nfc_enabled": True,
     "social_integration": {
@@ -30,6 +36,7 @@ SMART_COMMERCE_CONFIG = {
         "instagram_shopping": True
     },
     "payment_simulation": True,
+    "response_cache_size": 1024,
     "categories": {
         "energie": {
             "name": "Énergie",
@@ -58,6 +65,46 @@ SMART_COMMERCE_CONFIG = {
     }
 }
 
+# Modèles de réponses de l'assistant shopping (tables immuables, construites une seule fois)
+SHOPPING_RESPONSE_TEMPLATES = MappingProxyType({
+    "fr": MappingProxyType({
+        "greeting": "Bonjour ! Je suis votre assistant shopping RIMAREUM. Comment puis-je vous aider à trouver les produits parfaits ?",
+        "product_inquiry": "Excellent choix ! Ce produit fait partie de notre collection {category}. Puis-je vous suggérer des articles complémentaires ?",
+        "cart_review": "Votre panier contient {item_count} article(s). Voulez-vous que je vous recommande des produits qui se marient parfaitement avec vos sélections ?",
+        "recommendation": "Basé sur vos préférences, je recommande : {products}. Ces articles sont populaires parmi nos utilisateurs.",
+        "payment_help": "Je peux vous aider avec le processus de paiement. Nous acceptons les cartes bancaires, PayPal et les crypto-monnaies."
+    }),
+    "en": MappingProxyType({
+        "greeting": "Hello! I'm your RIMAREUM shopping assistant. How can I help you find the perfect products?",
+        "product_inquiry": "Excellent choice! This product is part of our {category} collection. May I suggest complementary items?",
+        "cart_review": "Your cart contains {item_count} item(s). Would you like me to recommend products that pair perfectly with your selections?",
+        "recommendation": "Based on your preferences, I recommend: {products}. These items are popular among our users.",
+        "payment_help": "I can help you with the payment process. We accept bank cards, PayPal and cryptocurrencies."
+    }),
+    "ar": MappingProxyType({
+        "greeting": "مرحبا! أنا مساعد التسوق الخاص بك في RIMAREUM. كيف يمكنني مساعدتك في العثور على المنتجات المثالية؟",
+        "product_inquiry": "اختيار ممتاز! هذا المنتج جزء من مجموعة {category}. هل يمكنني اقتراح عناصر مكملة؟",
+        "cart_review": "تحتوي سلتك على {item_count} عنصر. هل تريد مني أن أوصي بمنتجات تتناسب تماماً مع اختياراتك؟",
+        "recommendation": "بناءً على تفضيلاتك، أوصي بـ: {products}. هذه العناصر شائعة بين مستخدمينا.",
+        "payment_help": "يمكنني مساعدتك في عملية الدفع. نحن نقبل البطاقات المصرفية وPayPal والعملات المشفرة."
+    }),
+    "es": MappingProxyType({
+        "greeting": "¡Hola! Soy tu asistente de compras RIMAREUM. ¿Cómo puedo ayudarte a encontrar los productos perfectos?",
+        "product_inquiry": "¡Excelente elección! Este producto es parte de nuestra colección {category}. ¿Puedo sugerirte artículos complementarios?",
+        "cart_review": "Tu carrito contiene {item_count} artículo(s). ¿Te gustaría que te recomiende productos que combinen perfectamente con tus selecciones?",
+        "recommendation": "Basado en tus preferencias, recomiendo: {products}. Estos artículos son populares entre nuestros usuarios.",
+        "payment_help": "Puedo ayudarte con el proceso de pago. Aceptamos tarjetas bancarias, PayPal y criptomonedas."
+    }),
+})
+
+# Intentions détectées dans l'ordre; à défaut, une recommandation
+SHOPPING_INTENT_KEYWORDS = (
+    ("greeting", ("bonjour", "hello", "مرحبا", "hola", "salut", "hi")),
+    ("product_inquiry", ("produit", "product", "منتج", "producto", "acheter", "buy")),
+    ("cart_review", ("panier", "cart", "سلة", "carrito")),
+    ("payment_help", ("paiement", "payment", "دفع", "pago")),
+)
+
 @dataclass
 class SmartProduct:
     """Produit intelligent avec métadonnées avancées"""
@@ -169,6 +216,7 @@ class AIShoppingAssistant:
             "similarity_threshold": 0.6
         }
         self.user_profiles = {}
+        self.response_cache = ResponseCache(SMART_COMMERCE_CONFIG["response_cache_size"])
         
     async def get_product_recommendations(self, product_id: str, user_preferences: Optional[UserPreferences] = None) -> List[str]:
         """Obtenir des recommandations pour un produit"""
@@ -231,73 +279,52 @@ class AIShoppingAssistant:
             logging.error(f"Erreur cross-selling: {e}")
             return []
     
+    @staticmethod
+    def _cart_signature(cart: Optional[ShoppingCart]) -> Optional[tuple]:
+        """Nombre d'articles et catégories du panier: tout ce dont dépend la réponse"""
+        if not cart:
+            return None
+        return len(cart.items), tuple(sorted({item.get("category", "") for item in cart.items}))
+    
     async def generate_personalized_response(self, message: str, language: str, cart: Optional[ShoppingCart] = None) -> Dict[str, Any]:
         """Générer une réponse personnalisée avec recommandations"""
         try:
-            # Analyser le message pour détecter l'intention
-            message_lower = message.lower()
-            
-            response_templates = {
-                "fr": {
-                    "greeting": "Bonjour ! Je suis votre assistant shopping RIMAREUM. Comment puis-je vous aider à trouver les produits parfaits ?",
-                    "product_inquiry": "Excellent choix ! Ce produit fait partie de notre collection {category}. Puis-je vous suggérer des articles complémentaires ?",
-                    "cart_review": "Votre panier contient {item_count} article(s). Voulez-vous que je vous recommande des produits qui se marient parfaitement avec vos sélections ?",
-                    "recommendation": "Basé sur vos préférences, je recommande : {products}. Ces articles sont populaires parmi nos utilisateurs.",
-                    "payment_help": "Je peux vous aider avec le processus de paiement. Nous acceptons les cartes bancaires, PayPal et les crypto-monnaies."
-                },
-                "en": {
-                    "greeting": "Hello! I'm your RIMAREUM shopping assistant. How can I help you find the perfect products?",
-                    "product_inquiry": "Excellent choice! This product is part of our {category} collection. May I suggest complementary items?",
-                    "cart_review": "Your cart contains {item_count} item(s). Would you like me to recommend products that pair perfectly with your selections?",
-                    "recommendation": "Based on your preferences, I recommend: {products}. These items are popular among our users.",
-                    "payment_help": "I can help you with the payment process. We accept bank cards, PayPal and cryptocurrencies."
-                },
-                "ar": {
-                    "greeting": "مرحبا! أنا مساعد التسوق الخاص بك في RIMAREUM. كيف يمكنني مساعدتك في العثور على المنتجات المثالية؟",
-                    "product_inquiry": "اختيار ممتاز! هذا المنتج جزء من مجموعة {category}. هل يمكنني اقتراح عناصر مكملة؟",
-                    "cart_review": "تحتوي سلتك على {item_count} عنصر. هل تريد مني أن أوصي بمنتجات تتناسب تماماً مع اختياراتك؟",
-                    "recommendation": "بناءً على تفضيلاتك، أوصي بـ: {products}. هذه العناصر شائعة بين مستخدمينا.",
-                    "payment_help": "يمكنني مساعدتك في عملية الدفع. نحن نقبل البطاقات المصرفية وPayPal والعملات المشفرة."
-                },
-                "es": {
-                    "greeting": "¡Hola! Soy tu asistente de compras RIMAREUM. ¿Cómo puedo ayudarte a encontrar los productos perfectos?",
-                    "product_inquiry": "¡Excelente elección! Este producto es parte de nuestra colección {category}. ¿Puedo sugerirte artículos complementarios?",
-                    "cart_review": "Tu carrito contiene {item_count} artículo(s). ¿Te gustaría que te recomiende productos que combinen perfectamente con tus selecciones?",
-                    "recommendation": "Basado en tus preferencias, recomiendo: {products}. Estos artículos son populares entre nuestros usuarios.",
-                    "payment_help": "Puedo ayudarte con el proceso de pago. Aceptamos tarjetas bancarias, PayPal y criptomonedas."
-                }
-            }
-            
-            templates = response_templates.get(language, response_templates["fr"])
-            
             # Détecter l'intention
-            if any(word in message_lower for word in ["bonjour", "hello", "مرحبا", "hola", "salut", "hi"]):
-                response_type = "greeting"
-                message = templates["greeting"]
-            elif any(word in message_lower for word in ["produit", "product", "منتج", "producto", "acheter", "buy"]):
-                response_type = "product_inquiry"
-                message = templates["product_inquiry"].format(category="premium")
-            elif any(word in message_lower for word in ["panier", "cart", "سلة", "carrito"]):
-                response_type = "cart_review"
-                item_count = len(cart.items) if cart else 0
-                message = templates["cart_review"].format(item_count=item_count)
-            elif any(word in message_lower for word in ["paiement", "payment", "دفع", "pago"]):
-                response_type = "payment_help"
-                message = templates["payment_help"]
-            else:
-                response_type = "recommendation"
-                message = templates["recommendation"].format(products="Cristal Solaire, Clé Nadjibienne, Artefact Ω")
+            message_lower = message.lower()
+            response_type = next(
+                (intent for intent, keywords in SHOPPING_INTENT_KEYWORDS
+                 if any(word in message_lower for word in keywords)),
+                "recommendation"
+            )
             
-            # Ajouter des recommandations si applicable
-            recommendations = []
-            if cart and len(cart.items) > 0:
-                recommendations = await self.get_cross_sell_suggestions(cart)
+            # La réponse ne dépend que de la langue, de l'intention et du contenu du panier
+            cache_key = (language, response_type, self._cart_signature(cart))
+            cached = self.response_cache.get(cache_key)
+            if cached is None:
+                templates = SHOPPING_RESPONSE_TEMPLATES.get(language, SHOPPING_RESPONSE_TEMPLATES["fr"])
+                if response_type == "product_inquiry":
+                    text = templates["product_inquiry"].format(category="premium")
+                elif response_type == "cart_review":
+                    text = templates["cart_review"].format(item_count=len(cart.items) if cart else 0)
+                elif response_type == "recommendation":
+                    text = templates["recommendation"].format(products="Cristal Solaire, Clé Nadjibienne, Artefact Ω")
+                else:
+                    text = templates[response_type]
+                
+                # Ajouter des recommandations si applicable
+                recommendations = []
+                if cart and len(cart.items) > 0:
+                    recommendations = await self.get_cross_sell_suggestions(cart)
+                
+                cached = (text, tuple(recommendations))
+                self.response_cache.put(cache_key, cached)
             
+            text, recommendations = cached
             return {
-                "message": message,
+                "message": text,
                 "response_type": response_type,
                 "language": language,
-                "recommendations": recommendations,
+                "recommendations": list(recommendations),
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -321,8 +348,12 @@ class SmartCommerceManager:
         self.carts_cache = {}
         self.user_preferences_cache = {}
         
-        # Initialiser les produits de démonstration
+        # Initialiser les produits de démonstration (catalogue indexé)
         self.demo_products = self._create_demo_products()
+        self.catalog = ProductCatalog(self.demo_products, field_of=attribute_field)
+        self.search_index = ProductSearchIndex(field_of=attribute_field)
+        self.search_index.rebuild(self.demo_products)
+        self.catalog.listeners.append(self.search_index.on_change)
     
     def _create_demo_products(self) -> List[SmartProduct]:
         """Créer les 4 produits de démonstration Phase 9"""
@@ -496,18 +527,13 @@ class SmartCommerceManager:
         
         return products
     
-    async def get_all_products(self, category: Optional[str] = None) -> List[SmartProduct]:
-        """Obtenir tous les produits avec filtrage optionnel"""
-        if category:
-            return [p for p in self.demo_products if p.category == category]
-        return self.demo_products
+    async def get_all_products(self, category: Optional[str] = None) -> Sequence[SmartProduct]:
+        """Obtenir tous les produits avec filtrage optionnel (vue immuable, sans copie)"""
+        return self.catalog.view(category=category or None)
     
     async def get_product_by_id(self, product_id: str) -> Optional[SmartProduct]:
         """Obtenir un produit par ID"""
-        for product in self.demo_products:
-            if product.id == product_id:
-                return product
-        return None
+        return self.catalog.get(product_id)
     
     async def create_cart(self, session_id: str, user_id: Optional[str] = None) -> ShoppingCart:
         """Créer un nouveau panier"""
@@ -572,20 +598,9 @@ class SmartCommerceManager:
         return SMART_COMMERCE_CONFIG["categories"]
     
     async def search_products(self, query: str, category: Optional[str] = None) -> List[SmartProduct]:
-        """Rechercher des produits"""
-        query_lower = query.lower()
-        results = []
-        
-        for product in self.demo_products:
-            if category and product.category != category:
-                continue
-                
-            if (query_lower in product.name.lower() or 
-                query_lower in product.description.lower() or
-                any(query_lower in tag for tag in product.tags)):
-                results.append(product)
-        
-        return results
+        """Rechercher des produits (BM25, accents ignorés, préfixes et fautes tolérés)"""
+        result = self.search_index.search(query, category=category or None, limit=SMART_COMMERCE_CONFIG["search_limit"])
+        return [self.catalog.get(product_id) for product_id, _ in result["hits"]]
 
 # Instance globale du gestionnaire Smart Commerce
 smart_commerce = SmartCommerceManager()
\ No newline at end of file
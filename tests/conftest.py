@@ -0,0 +1,27 @@
+"""
+Test configuration: backend modules are flat (sibling imports), and module-level
+instances write to paths taken from the environment, so point those at a
+scratch directory before anything is imported (removed when the session ends).
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="rimareum_tests_")
+os.environ.setdefault("RIMAREUM_EVENT_DB", os.path.join(_SCRATCH_DIR, "events.db"))
+os.environ.setdefault("RIMAREUM_AUDIT_DIR", os.path.join(_SCRATCH_DIR, "audit"))
+os.environ.setdefault("RIMAREUM_BLOCK_STORE", os.path.join(_SCRATCH_DIR, "blocks.json"))
+os.environ.setdefault("RIMAREUM_GEOIP_DB", os.path.join(_SCRATCH_DIR, "geoip.csv"))
+os.environ.setdefault("RIMAREUM_PASSWORD_HASH_ROUNDS", "4")
+os.environ.setdefault("RIMAREUM_FAKE_LLM", "1")
+os.environ.setdefault("RIMAREUM_FAKE_TOKEN_DELAY_MS", "0")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_SCRATCH_DIR, ignore_errors=True)
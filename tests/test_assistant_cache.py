@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from smart_commerce import AIShoppingAssistant, ShoppingCart
+
+
+@pytest.fixture
+def client():
+    server.assistant_responses.clear()
+    return TestClient(server.app)
+
+
+def cache_counts():
+    stats = server.assistant_responses.get_stats()
+    return stats["hits"], stats["misses"]
+
+
+def test_repeated_chatbot_question_is_a_cache_hit(client):
+    hits, misses = cache_counts()
+    body = {"message": "where is my order", "language": "en"}
+
+    first = client.post("/api/chatbot/multilingual", json=body).json()
+    second = client.post("/api/chatbot/multilingual", json=body).json()
+
+    assert cache_counts() == (hits + 1, misses + 1)
+    assert first["response"] == second["response"] == "Hello! You said: 'where is my order'. How can I help you with RIMAREUM?"
+    # Another language or message is a different entry
+    client.post("/api/chatbot/multilingual", json={"message": "where is my order", "language": "fr"})
+    assert cache_counts() == (hits + 1, misses + 2)
+
+
+def test_long_chatbot_messages_bypass_the_cache(client):
+    hits, misses = cache_counts()
+    body = {"message": "x" * (server.ASSISTANT_CACHE_MAX_MESSAGE + 1), "language": "en"}
+    for _ in range(2):
+        assert client.post("/api/chatbot/multilingual", json=body).status_code == 200
+    assert cache_counts() == (hits, misses)
+
+
+def test_shop_assistant_reply_is_cached_per_language(client):
+    hits, misses = cache_counts()
+    for language in ("en", "en", "es"):
+        response = client.post("/api/shop/assistant", json={"message": "hi", "language": language})
+        assert response.status_code == 200
+    assert cache_counts() == (hits + 1, misses + 2)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/chatbot/multilingual", {"message": 123}),
+    ("/api/chatbot/multilingual", {"message": "hi", "language": ["en"]}),
+    ("/api/chatbot/multilingual", {"message": None, "language": {"code": "en"}}),
+    ("/api/shop/assistant", {"language": ["en"]}),
+    ("/api/shop/assistant", {"language": 7}),
+])
+def test_non_string_fields_are_coerced_not_500(client, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 200
+
+
+def test_numeric_message_is_echoed_as_text(client):
+    reply = client.post("/api/chatbot/multilingual", json={"message": 123, "language": "en"}).json()
+    assert reply["response"] == "Hello! You said: '123'. How can I help you with RIMAREUM?"
+
+
+@pytest.mark.parametrize("path", ["/api/chatbot/multilingual/stream", "/api/shop/assistant/stream"])
+def test_streams_coerce_non_string_fields(client, path):
+    with client.stream("POST", path, json={"message": 123, "language": ["en"]}) as response:
+        assert response.status_code == 200
+        assert b"event: done" in response.read()
+
+
+def cart(*items):
+    return ShoppingCart(items=[{"id": item_id, "category": category, "price": 50} for item_id, category in items])
+
+
+def test_shopping_assistant_keys_replies_by_cart_signature():
+    assistant = AIShoppingAssistant()
+    ask = lambda shopping_cart: asyncio.run(
+        assistant.generate_personalized_response("check my cart", "en", shopping_cart))
+
+    first = ask(cart(("a", "energie"), ("b", "nft")))
+    # Same item count and categories, different products: served from the cache
+    second = ask(cart(("c", "nft"), ("d", "energie")))
+    assert (assistant.response_cache.hits, assistant.response_cache.misses) == (1, 1)
+    assert second["message"] == first["message"]
+    assert second["recommendations"] == first["recommendations"]
+
+    # A different item count or category set is a different key
+    third = ask(cart(("a", "energie"), ("b", "nft"), ("e", "nft")))
+    ask(cart(("a", "energie"), ("f", "modules_ia")))
+    ask(None)
+    assert (assistant.response_cache.hits, assistant.response_cache.misses) == (1, 4)
+    assert third["response_type"] == "cart_review"
+    assert "3" in third["message"]
+
+
+def test_shopping_assistant_cached_reply_gets_a_fresh_timestamp():
+    assistant = AIShoppingAssistant()
+    first = asyncio.run(assistant.generate_personalized_response("hello", "fr"))
+    second = asyncio.run(assistant.generate_personalized_response("hello", "fr"))
+    assert assistant.response_cache.hits == 1
+    assert first["message"] == second["message"]
+    assert second["timestamp"] >= first["timestamp"]
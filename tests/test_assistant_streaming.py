@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import phase11_multivers
+import security_module
+import server
+from security_llm import LLMGateway, LLMProvider, create_stub_llm_app
+
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.parametrize("path, body, trailing", [
+    ("/api/chatbot/multilingual/stream", {"message": "hello there", "language": "en"}, []),
+    ("/api/shop/assistant/stream", {"message": "argan oil", "language": "fr"}, ["recommendations"]),
+    ("/api/sanctuary/input/stream", {"message": "bonjour", "user_id": "u-1"}, ["vibration"]),
+])
+def test_stream_emits_meta_tokens_trailing_then_done(path, body, trailing):
+    client = TestClient(server.app)
+    with client.stream("POST", path, json=body) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.read().decode())
+
+    names = [name for name, _ in events]
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert names[0] == "meta"
+    assert tokens and names[1:1 + len(tokens)] == ["token"] * len(tokens)
+    assert names[1 + len(tokens):] == trailing + ["done"]
+    # The fake generator replays the template reply; `done` carries the joined text
+    assert events[-1][1]["text"] == "".join(tokens)
+
+
+def test_chatbot_stream_replays_the_cached_reply():
+    client = TestClient(server.app)
+    body = {"message": "hello there", "language": "en"}
+    reply = client.post("/api/chatbot/multilingual", json=body).json()
+    with client.stream("POST", "/api/chatbot/multilingual/stream", json=body) as response:
+        events = parse_sse(response.read().decode())
+
+    assert events[-1][1]["text"] == reply["response"]
+    assert events[0][1]["detected_language"] == reply["detected_language"]
+
+
+def test_client_disconnect_cancels_the_token_stream(monkeypatch):
+    # Slow tokens so the client can leave mid-stream
+    monkeypatch.setattr(server.fake_tokens, "token_delay", 0.05)
+    cancelled = server.fake_tokens.cancelled
+    completed = server.fake_tokens.completed
+
+    async def scenario():
+        first_token = asyncio.Event()
+        sent = []
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                body = json.dumps({"message": "hello there", "language": "en"}).encode()
+                return {"type": "http.request", "body": body, "more_body": False}
+            await first_token.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and b"event: token" in message.get("body", b""):
+                first_token.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/api/chatbot/multilingual/stream",
+            "raw_path": b"/api/chatbot/multilingual/stream", "query_string": b"", "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+            "client": ("203.0.113.50", 40000), "server": ("testserver", 80),
+        }
+        await asyncio.wait_for(server.app(scope, receive, send), timeout=5)
+        return b"".join(message.get("body", b"") for message in sent)
+
+    body = asyncio.run(scenario())
+
+    assert b"event: token" in body and b"event: done" not in body
+    assert server.fake_tokens.cancelled == cancelled + 1
+    assert server.fake_tokens.completed == completed
+
+
+def test_streams_share_the_security_llm_gateway():
+    # One pool, semaphore and breaker per provider across the whole process
+    assert server.llm_gateway is security_module.llm_gateway
+    assert not hasattr(server, "assistant_llm")
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """Route the shared gateway's "openai" provider to the in-memory chat-completions stub"""
+    app = create_stub_llm_app(latency=0.0)
+    gateway = LLMGateway([LLMProvider(name="openai", base_url="http://stub/v1", model="stub-model")],
+                         transport=httpx.ASGITransport(app=app))
+    monkeypatch.setattr(security_module, "llm_gateway", gateway)
+    monkeypatch.setattr(server, "llm_gateway", gateway)
+    monkeypatch.setattr(server, "ASSISTANT_FAKE_LLM", False)
+    return app
+
+
+def test_chatbot_answers_faq_locally_and_asks_the_llm_otherwise(stub_llm):
+    with TestClient(server.app) as client:
+        faq = client.post("/api/chatbot/multilingual", json={"message": "what is dao", "language": "en"}).json()
+        assert faq["response_type"] == "faq"
+        assert stub_llm.state.calls == 0
+
+        other = client.post("/api/chatbot/multilingual",
+                            json={"message": "zzz quantum teapot", "language": "en"}).json()
+        assert other["response_type"] == "llm"
+        assert other["response"] == "stub:stub-model:zzz quantum teapot"
+        assert stub_llm.state.calls == 1
+
+
+def test_sanctuary_singleton_uses_the_shared_gateway():
+    assert phase11_multivers.sanctuary_ai_human.llm_gateway is security_module.llm_gateway
+
@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+
+import server
+from security_module import password_pool
+
+
+PASSWORD = "correct horse battery staple"
+
+
+def register_and_login(client, username):
+    registered = client.post("/api/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": PASSWORD
+    })
+    assert registered.status_code == 200
+    login = client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+    assert login.status_code == 200
+    return registered.json(), login.json()
+
+
+def test_session_from_login_authenticates_routes_until_logout():
+    client = TestClient(server.app)
+    registered, login = register_and_login(client, "session-user")
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+
+    me = client.get("/api/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["user_id"] == registered["user_id"]
+    assert me.json()["auth_type"] == "session"
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_registered_api_key_authenticates_and_cannot_log_out():
+    client = TestClient(server.app)
+    registered, _ = register_and_login(client, "key-user")
+
+    for headers in ({"X-API-Key": registered["api_key"]}, {"Authorization": f"Bearer {registered['api_key']}"}):
+        me = client.get("/api/auth/me", headers=headers)
+        assert me.status_code == 200
+        assert me.json()["user_id"] == registered["user_id"]
+        assert me.json()["auth_type"] == "api_key"
+    assert client.post("/api/auth/logout", headers={"X-API-Key": registered["api_key"]}).status_code == 400
+
+
+def test_unknown_or_missing_credentials_are_rejected():
+    client = TestClient(server.app)
+    assert client.get("/api/auth/me").status_code == 401
+    assert client.get("/api/auth/me", headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+    # A session token is not an API key
+    _, login = register_and_login(client, "header-user")
+    assert client.get("/api/auth/me", headers={"X-API-Key": login["access_token"]}).status_code == 401
+
+
+def test_login_requires_the_registered_password():
+    client = TestClient(server.app)
+    verified = password_pool.stats["verified"]
+    register_and_login(client, "password-user")
+    # Login verifies on the bounded hashing pool
+    assert password_pool.stats["verified"] == verified + 1
+
+    for body in ({"username": "password-user"},
+                 {"username": "password-user", "password": "wrong"},
+                 {"username": "password-user", "password": 123},
+                 {"username": "nobody", "password": PASSWORD}):
+        response = client.post("/api/auth/login", json=body)
+        assert response.status_code == 401
+        assert "access_token" not in response.json()
+    # Only the bcrypt hash is stored, never the password itself
+    assert server.users_by_username["password-user"]["password_hash"].startswith("$2")
+
+
+def test_register_rejects_missing_password_and_duplicate_username():
+    client = TestClient(server.app)
+    assert client.post("/api/auth/register", json={"username": "no-password"}).status_code == 400
+    register_and_login(client, "taken-user")
+    duplicate = client.post("/api/auth/register", json={"username": "taken-user", "password": "other"})
+    assert duplicate.status_code == 409
@@ -0,0 +1,32 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import server
+from security_module import security_middleware
+
+
+def test_metrics_endpoint_exposes_security_families():
+    path, ip = "/api/products", "203.0.113.40"
+    asyncio.run(security_middleware(Request({
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"user-agent", b"Mozilla/5.0"), (b"x-forwarded-for", ip.encode())],
+        "client": (ip, 40000), "server": ("testserver", 80), "scheme": "http", "root_path": ""
+    })))
+
+    response = TestClient(server.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/openmetrics-text")
+    body = response.text
+    assert body.rstrip().endswith("# EOF")
+    for family, kind in [("rimareum_waf_decisions", "counter"),
+                         ("rimareum_ml_inference_batch_size", "histogram"),
+                         ("rimareum_cache_hit_ratio", "gauge"),
+                         ("rimareum_queue_depth", "gauge")]:
+        assert f"# TYPE {family} {kind}" in body
+    assert 'rimareum_waf_decisions_total{decision="allow"' in body
+    assert "rimareum_ml_inference_batch_size_count" in body
+    assert 'rimareum_cache_hit_ratio{cache="verified_tokens"}' in body
+    assert 'rimareum_queue_depth{queue="audit"}' in body
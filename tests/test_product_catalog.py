@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from product_catalog import ProductCatalog, attribute_field
+
+PRODUCTS = [
+    {"id": "p1", "name": "Argan oil", "category": "cosmetics", "is_featured": True, "tags": ["oil", "bio"],
+     "details": {"origin": "MA"}},
+    {"id": "p2", "name": "Dates", "category": "food", "is_featured": False, "tags": ["bio"]},
+    {"id": "p3", "name": "Soap", "category": "cosmetics", "is_featured": False, "tags": []},
+]
+
+
+def fresh_catalog():
+    return ProductCatalog([{**product, "tags": list(product["tags"])} for product in PRODUCTS])
+
+
+def test_snapshot_items_are_read_only_and_detached_from_the_catalog():
+    catalog = fresh_catalog()
+    item = catalog.view(category="cosmetics")[0]
+
+    with pytest.raises(TypeError):
+        item["price"] = 0
+    with pytest.raises(TypeError):
+        item["details"]["origin"] = "FR"
+    with pytest.raises(AttributeError):
+        item["tags"].append("spam")
+
+    assert catalog.get("p1")["details"] == {"origin": "MA"}
+    assert catalog.get("p1")["tags"] == ["oil", "bio"]
+    assert "price" not in catalog.get("p1")
+
+
+def test_views_follow_upserts_and_in_place_updates_after_reindex():
+    catalog = fresh_catalog()
+    assert [item["id"] for item in catalog.view(tag="bio")] == ["p1", "p2"]
+
+    catalog.upsert({**catalog.get("p2"), "name": "Organic dates", "tags": []})
+    assert [item["id"] for item in catalog.view(tag="bio")] == ["p1"]
+    assert catalog.view()[1]["name"] == "Organic dates"
+
+    catalog.get("p3")["is_featured"] = True
+    catalog.reindex("p3")
+    assert [item["id"] for item in catalog.view(featured=True)] == ["p1", "p3"]
+    assert catalog.view(category="cosmetics")[1]["is_featured"] is True
+
+    catalog.remove("p1")
+    assert [item["id"] for item in catalog.view()] == ["p2", "p3"]
+
+
+@dataclass
+class Item:
+    id: str
+    category: str
+    is_featured: bool = False
+    tags: List[str] = field(default_factory=list)
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+
+def test_object_snapshots_are_copies():
+    catalog = ProductCatalog([Item("a", "food", metadata={"origin": "MA"})], field_of=attribute_field)
+    item = catalog.view(category="food")[0]
+    item.category = "other"
+    item.metadata["origin"] = "FR"
+
+    assert catalog.get("a").category == "food"
+    assert catalog.get("a").metadata == {"origin": "MA"}
+    assert catalog.view(category="food")[0] is item  # Cached view, same snapshot until the next write
+
+
+def test_products_endpoint_serializes_snapshots():
+    import server
+
+    with TestClient(server.app) as client:
+        response = client.get("/api/products")
+    assert response.status_code == 200
+    assert [product["id"] for product in response.json()] == [product["id"] for product in server.SAMPLE_PRODUCTS]
+    assert response.json()[0] == server.SAMPLE_PRODUCTS[0]
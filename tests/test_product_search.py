@@ -0,0 +1,94 @@
+import pytest
+
+from product_search import PREFIX_FACTOR, TYPO_FACTOR, ProductSearchIndex
+
+PRODUCTS = [
+    {"id": "argan", "name": "Huile d'argan bio", "category": "cosmetics", "tags": ["huile", "bio"],
+     "description": "Huile pressée à froid"},
+    {"id": "dates", "name": "Dattes Medjool", "category": "food", "tags": ["bio"],
+     "description": "Dattes biologiques du Maroc"},
+    {"id": "soap", "name": "Savon à l'huile d'olive", "category": "cosmetics", "tags": ["savon"],
+     "description": "Savon artisanal"},
+    {"id": "oil", "name": "Olive oil", "category": "food", "tags": ["huile"],
+     "description": "Extra virgin olive oil"},
+    {"id": "moisturizer", "name": "Moisturizer", "category": "cosmetics", "tags": [],
+     "description": "Daily moisturizer"},
+]
+
+
+def build(products=PRODUCTS):
+    index = ProductSearchIndex()
+    index.rebuild(products)
+    return index
+
+
+def ids(result):
+    return [product_id for product_id, _ in result["hits"]]
+
+
+def test_typos_match_nearby_terms_with_a_reduced_score():
+    index = build()
+    assert ids(index.search("argna")) == ["argan"]  # Adjacent transposition
+    assert ids(index.search("dattez")) == ["dates"]
+    assert ids(index.search("moissturizerr")) == ["moisturizer"]  # Two edits from 8 letters on
+    assert index.search("dattezz")["total"] == 0  # Only one under 8 letters
+    assert index.search("xyzw")["total"] == 0
+
+    exact = dict(index.search("argan")["hits"])["argan"]
+    typo = dict(index.search("argna")["hits"])["argan"]
+    assert typo == pytest.approx(exact * TYPO_FACTOR)
+
+
+def test_only_the_last_word_matches_as_a_prefix():
+    index = build()
+    assert ids(index.search("arg")) == ["argan"]
+    assert set(ids(index.search("huile ol"))) == {"oil", "soap", "argan"}
+    # A prefix in the middle of the query is not expanded
+    assert "argan" not in ids(index.search("arg dattes"))
+
+    exact = dict(index.search("argan")["hits"])["argan"]
+    prefix = dict(index.search("arga")["hits"])["argan"]
+    assert prefix == pytest.approx(exact * PREFIX_FACTOR)
+
+
+def test_category_filter_reads_only_its_partition():
+    index = build()
+    assert set(ids(index.search("huile"))) == {"argan", "soap", "oil"}
+    food = index.search("huile", category="food")
+    assert ids(food) == ["oil"] and food["total"] == 1
+    assert set(ids(index.search("huile", category="cosmetics"))) == {"argan", "soap"}
+    assert index.search("huile", category="toys")["total"] == 0
+    assert index.search("bio", category="food")["total"] == 1
+
+
+def test_ties_follow_insertion_order_not_reused_slots():
+    twin = {"name": "Bougie parfumée", "category": "home", "tags": [], "description": ""}
+    index = ProductSearchIndex()
+    for product_id in ("first", "second", "third"):
+        index.add({**twin, "id": product_id})
+    index.remove("first")
+    index.add({**twin, "id": "fourth"})  # Reuses the slot freed by "first"
+    assert index.slots["fourth"] == 0
+    assert ids(index.search("bougie")) == ["second", "third", "fourth"]
+
+    index.add({**twin, "id": "second"})  # Reindexed: keeps its rank
+    assert ids(index.search("bougie")) == ["second", "third", "fourth"]
+
+
+def test_updates_invalidate_only_the_changed_terms():
+    index = build()
+    index.search("huile")
+    index.search("dattes")
+    assert ("huile", None) in index._impact_cache and ("dattes", None) in index._impact_cache
+
+    index.add({"id": "ghee", "name": "Huile de beurre", "category": "food", "tags": [], "description": ""})
+    assert ("huile", None) not in index._impact_cache
+    assert ("dattes", None) in index._impact_cache
+    index.remove("dates")
+    assert ("dattes", None) not in index._impact_cache
+
+    # Scores after incremental updates match an index built from scratch
+    rebuilt = build([product for product in PRODUCTS if product["id"] != "dates"] +
+                    [{"id": "ghee", "name": "Huile de beurre", "category": "food", "tags": [], "description": ""}])
+    for query in ("huile", "bio", "savon huile", "olive", "beurre"):
+        assert dict(index.search(query)["hits"]) == pytest.approx(dict(rebuilt.search(query)["hits"]))
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+from security_audit import AsyncAuditPipeline, list_audit_segments, read_audit_segment
+
+
+def read_all(directory):
+    return [event for path in list_audit_segments(str(directory)) for event in read_audit_segment(path)]
+
+
+def test_pipeline_drains_batches_to_segments_and_sinks(tmp_path):
+    received = []
+
+    async def scenario():
+        pipeline = AsyncAuditPipeline(str(tmp_path), batch_size=16, flush_interval=0.01, fsync=False,
+                                      sinks=[received.extend])
+        for index in range(50):
+            assert await pipeline.submit({"ip": "10.0.0.1", "index": index, "severity": "LOW"})
+        await pipeline.close()
+        return pipeline.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["submitted"] == stats["written"] == 50
+    assert stats["dropped"] == 0 and stats["queue_depth"] == 0
+    assert stats["batches"] >= 4  # At most 16 events per batch
+    assert [event["index"] for event in read_all(tmp_path)] == list(range(50))
+    assert [event["index"] for event in received] == list(range(50))
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    async def scenario():
+        pipeline = AsyncAuditPipeline(str(tmp_path), queue_size=5, flush_interval=0.01, fsync=False,
+                                      backpressure_timeout=0.001)
+        # No await yields to the writer in between: the queue fills up
+        accepted = [await pipeline.submit({"index": index, "severity": "LOW"}) for index in range(20)]
+        full_stats = dict(pipeline.stats)
+        # Critical events wait for room (briefly) before being dropped
+        critical = await pipeline.submit({"index": 20, "severity": "HIGH"})
+        await pipeline.close()
+        return accepted, critical, full_stats, pipeline.get_stats()
+
+    accepted, critical, full_stats, stats = asyncio.run(scenario())
+    assert accepted == [True] * 5 + [False] * 15
+    assert full_stats["dropped"] == 15 and full_stats["max_queue_depth"] == 5
+    assert stats["submitted"] == 21
+    assert stats["backpressure_waits"] == 1
+    assert stats["written"] + stats["dropped"] == 21
+    assert stats["dropped_critical"] == (0 if critical else 1)
+    assert len(read_all(tmp_path)) == stats["written"]
+
+
+def test_writer_task_does_not_block_asyncio_run_shutdown(tmp_path):
+    pipeline = AsyncAuditPipeline(str(tmp_path), flush_interval=5.0, fsync=False)
+
+    async def scenario():
+        await pipeline.submit({"index": 0, "severity": "LOW"})
+        await asyncio.sleep(0.05)  # The writer is now filling a batch
+
+    # asyncio.run cancels pending tasks on exit: it must return even without close()
+    runner = threading.Thread(target=asyncio.run, args=(scenario(),), daemon=True)
+    runner.start()
+    runner.join(timeout=5)
+    assert not runner.is_alive()
+    assert pipeline._writer_task.done()
+
+
+def test_close_writes_pending_events_then_stops_writer(tmp_path):
+    async def scenario():
+        pipeline = AsyncAuditPipeline(str(tmp_path), flush_interval=0.2, fsync=False)
+        await pipeline.submit({"index": 0, "severity": "LOW"})
+        await pipeline.close()
+        await asyncio.sleep(0)
+        return pipeline
+
+    pipeline = asyncio.run(scenario())
+    assert pipeline._writer_task.done()
+    assert pipeline.stats["written"] == 1
+    assert read_all(tmp_path) == [{"index": 0, "severity": "LOW"}]
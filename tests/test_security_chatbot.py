@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from security_chatbot import KeywordIndex, question_terms, tokenize
+from security_module import MultilingualChatbot
+
+
+@pytest.fixture(scope="module")
+def chatbot():
+    return MultilingualChatbot()
+
+
+def baseline_pick(chatbot, message, language):
+    """Matching before the index: first FAQ sharing a word, then intents in priority order"""
+    message = message.lower()
+    for question, answer in chatbot.faq_database[language].items():
+        if any(word in message for word in question.split()):
+            return "faq", answer
+    for intent, keywords in chatbot.INTENT_KEYWORDS:
+        if any(keyword in message for keyword in keywords):
+            return intent, chatbot.responses[language][intent]
+    return "error", chatbot.responses[language]["error"]
+
+
+SAMPLE_MESSAGES = [
+    ("en", "Hello, can you help me with RIMAREUM platform?"),
+    ("en", "Hello, how can you help me with RIMAREUM?"),
+    ("en", "hello"), ("en", "help please"), ("en", "hello help"), ("en", "hello security"),
+    ("en", "tell me about your product"), ("en", "product help"), ("en", "governance"),
+    ("en", "dao governance"), ("en", "contact"), ("en", "goodbye"), ("en", "how to buy"),
+    ("en", "buy nft"), ("en", "nft"),
+    ("fr", "bonjour"), ("fr", "bonjour aide"), ("fr", "bonjour dao"), ("fr", "aide"), ("fr", "sécurité"),
+    ("fr", "produit"), ("fr", "contact"), ("fr", "au revoir"), ("fr", "comment acheter"), ("fr", "nft"),
+    ("es", "Hola, ¿cómo puedes ayudarme con RIMAREUM?"), ("es", "hola"), ("es", "ayuda"),
+    ("es", "seguridad"), ("es", "producto"), ("es", "adiós"), ("es", "cómo comprar"),
+    ("ar", "مرحبا، كيف يمكنك مساعدتي؟"), ("ar", "مرحبا"), ("ar", "مساعدة"), ("ar", "منتج"),
+    ("ar", "حوكمة"), ("ar", "مع السلامة"),
+]
+
+
+@pytest.mark.parametrize("language, message", SAMPLE_MESSAGES)
+def test_same_intent_and_faq_picks_as_baseline(chatbot, language, message):
+    response = chatbot.get_response(message, language)
+    assert (response["type"], response["message"]) == baseline_pick(chatbot, message, language)
+
+
+@pytest.mark.parametrize("language, message, question", [
+    ("en", "hello what is dao", "what is dao"),
+    ("fr", "bonjour, qu'est-ce que le dao ?", "qu'est-ce que le dao"),
+    ("es", "hola, qué es dao", "qué es dao"),
+    ("en", "hello, security?", "security"),
+])
+def test_faq_takes_precedence_over_intents(chatbot, language, message, question):
+    # The baseline matched these through stopwords ("is", "que"...) or a greeting;
+    # the FAQ sharing the message's content word wins instead
+    response = chatbot.get_response(message, language)
+    assert response["type"] == "faq"
+    assert response["message"] == chatbot.faq_database[language][question]
+
+
+def test_intents_keep_their_priority_order(chatbot):
+    assert chatbot.get_response("goodbye and thanks for the help", "en")["type"] == "help"
+    assert chatbot.get_response("contact product", "en")["type"] == "products"
+
+
+def brute_force(index, tokens, limit):
+    scored = []
+    for entry in index.entries.values():
+        matched = [term for term in entry.terms
+                   if any(tuple(tokens[start:start + len(term)]) == term for start in range(len(tokens)))]
+        if matched:
+            scored.append((sum(index._idf(term) for term in matched), entry))
+    scored.sort(key=lambda item: (item[1].rank, -item[0], item[1].order))
+    return [(round(score, 9), entry.entry_id) for score, entry in scored[:limit]]
+
+
+def test_pruned_search_matches_exhaustive_ranking():
+    rng = random.Random(3)
+    vocabulary = [f"w{index}" for index in range(30)]
+    index = KeywordIndex()
+    for entry in range(300):
+        terms = []
+        for _ in range(rng.randint(1, 4)):
+            head = rng.choice(vocabulary[:6])  # Few heads: several terms of an entry share one
+            terms.append((head,) + tuple(rng.sample(vocabulary, rng.randint(0, 2))))
+        index.add(f"entry-{entry}", terms, entry, rank=rng.choice([0, 0, 1, 2]))
+
+    for _ in range(300):
+        tokens = [rng.choice(vocabulary) for _ in range(rng.randint(1, 12))]
+        for limit in (1, 3):
+            found = [(round(score, 9), entry.entry_id) for score, entry in index.search(tokens, limit)]
+            assert found == brute_force(index, tokens, limit)
+
+
+def test_bound_sums_the_terms_of_one_entry():
+    index = KeywordIndex()
+    index.add("two-terms", [("au", "revoir"), ("au", "secours")], "a")
+    index.add("one-term", [("au", "revoir")], "b")
+    index.add("other", question_terms("comment acheter"), "c")
+    rank, bound = index._bound("au")
+    assert rank == 0
+    assert bound == pytest.approx(index._idf(("au", "revoir")) + index._idf(("au", "secours")))
+    assert index.best(tokenize("au secours au revoir")).entry_id == "two-terms"
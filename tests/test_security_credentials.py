@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+from security_credentials import KIND_API_KEY, CredentialRegistry, VerifiedTokenCache, token_hash
+
+
+def cached_registry(path, **kwargs):
+    registry = CredentialRegistry(persist_path=path, **kwargs)
+    cache = VerifiedTokenCache(ttl=30)
+    registry.listeners.append(cache.invalidate)
+    return registry, cache
+
+
+def verify(registry, cache, token):
+    return cache.verify(token, registry.validate, expires_of=lambda credential: credential.expires)
+
+
+def test_revocation_in_one_registry_reaches_another_within_cache_ttl(tmp_path):
+    path = str(tmp_path / "keys.json")
+
+    async def scenario():
+        first, first_cache = cached_registry(path, persist_interval=3600)
+        second, second_cache = cached_registry(path, persist_interval=3600)
+        token = first.issue("alice", 3600, KIND_API_KEY)
+        await first.persist()
+
+        assert await second.refresh() == 1
+        assert verify(second, second_cache, token) is not None
+        assert verify(second, second_cache, token) is not None
+        assert second_cache.hits == 1  # Served from the verified-token cache
+
+        assert first.revoke(token)
+        assert verify(first, first_cache, token) is None
+        await first.persist()
+        # Well within the cache TTL, the other registry drops the key and its cached entry
+        assert await second.refresh() == 1
+        assert verify(second, second_cache, token) is None
+        assert second_cache.invalidations == 1
+        assert second.get_stats()["revoked_elsewhere"] == 1
+        assert await second.refresh() == 0  # File unchanged: no re-read
+
+        # A later write from the second registry does not resurrect the key
+        other = second.issue("bob", 3600, KIND_API_KEY)
+        await second.persist()
+        stored = {entry["key_hash"] for entry in json.load(open(path))}
+        assert token_hash(token) not in stored and token_hash(other) in stored
+        assert await first.refresh() == 1
+        assert first.validate(other) is not None
+
+    asyncio.run(scenario())
+
+
+def test_stale_writer_does_not_restore_a_key_revoked_elsewhere(tmp_path):
+    path = str(tmp_path / "keys.json")
+
+    async def scenario():
+        first = CredentialRegistry(persist_path=path, persist_interval=3600)
+        token = first.issue("alice", None, KIND_API_KEY)
+        await first.persist()
+        second = CredentialRegistry(persist_path=path, persist_interval=3600)
+        assert second.validate(token) is not None  # Loaded at startup
+
+        first.revoke(token)
+        await first.persist()
+        # The second registry writes before re-reading: the merge drops the revoked key
+        second.issue("bob", None, KIND_API_KEY)
+        await second.persist()
+        assert second.validate(token) is None
+        assert token_hash(token) not in {entry["key_hash"] for entry in json.load(open(path))}
+
+    asyncio.run(scenario())
+
+
+def test_background_loop_applies_remote_revocations(tmp_path):
+    path = str(tmp_path / "keys.json")
+
+    async def scenario():
+        first, _ = cached_registry(path, persist_interval=0.02)
+        second, second_cache = cached_registry(path, persist_interval=0.02)
+        token = first.issue("alice", 3600, KIND_API_KEY)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if verify(second, second_cache, token) is not None:
+                break
+        assert verify(second, second_cache, token) is not None
+
+        first.revoke(token)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if verify(second, second_cache, token) is None:
+                break
+        assert verify(second, second_cache, token) is None
+        for registry in (first, second):
+            registry._task.cancel()
+            registry._persist_task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_sweep_loop_stops_when_cancelled_as_it_is_woken():
+    async def scenario():
+        registry = CredentialRegistry()
+        registry.issue("alice", 3600, KIND_API_KEY)
+        await asyncio.sleep(0)  # The sweep task is now waiting for its wakeup
+        registry._wakeup.set()
+        registry._task.cancel()
+        await asyncio.wait_for(asyncio.gather(registry._task, return_exceptions=True), timeout=2)
+        assert registry._task.cancelled()
+
+    asyncio.run(scenario())
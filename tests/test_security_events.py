@@ -0,0 +1,165 @@
+import random
+import time
+from collections import Counter, defaultdict
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+import server
+from security_events import (
+    BUCKET_SECONDS, HOUR_SECONDS, SecurityEventStore, normalize_event, parse_timestamp
+)
+
+BASE = 1_700_000_000 - 1_700_000_000 % HOUR_SECONDS  # Hour-aligned
+THREATS = ["SQL_INJECTION", "XSS", "BRUTE_FORCE", "SCAN"]
+SEVERITIES = ["LOW", "MEDIUM", "HIGH"]
+IPS = [f"10.0.0.{index}" for index in range(12)]
+
+
+@pytest.fixture(scope="module")
+def store_and_events(tmp_path_factory):
+    rng = random.Random(12)
+    events = []
+    for index in range(3000):
+        ts = BASE + rng.uniform(0, 4 * HOUR_SECONDS)
+        if index % 50 == 0:
+            ts = BASE + rng.randrange(1, 16) * BUCKET_SECONDS  # Exactly on a bucket boundary
+        events.append({
+            "id": f"evt-{index}", "timestamp": ts,
+            "ip": rng.choice(IPS) if index % 17 else None,
+            "threat_type": rng.choice(THREATS), "severity": rng.choice(SEVERITIES),
+            "blocked": rng.random() < 0.3
+        })
+    store = SecurityEventStore(str(tmp_path_factory.mktemp("events") / "events.db"), retention_days=0)
+    for start in range(0, len(events), 400):
+        store.insert_many(events[start:start + 400])
+    yield store, events
+    store.close()
+
+
+def windows():
+    rng = random.Random(7)
+    fixed = [
+        (BASE + 10, BASE + 20),  # Inside one bucket
+        (BASE + BUCKET_SECONDS - 5, BASE + BUCKET_SECONDS + 5),  # Across one boundary
+        (BASE + HOUR_SECONDS - 30, BASE + HOUR_SECONDS + 30),  # Across an hour, shorter than a bucket
+        (BASE + BUCKET_SECONDS, BASE + 3 * BUCKET_SECONDS),  # Aligned on both ends
+        (BASE + BUCKET_SECONDS, BASE + 3 * BUCKET_SECONDS + 1),
+        (BASE + BUCKET_SECONDS - 1, BASE + 3 * BUCKET_SECONDS),
+        (BASE - HOUR_SECONDS, BASE + 5 * HOUR_SECONDS),  # Everything
+        (BASE + 123.5, BASE + 3 * HOUR_SECONDS + 77.25),
+    ]
+    random_windows = []
+    for _ in range(40):
+        start = BASE + rng.uniform(-100, 4 * HOUR_SECONDS)
+        random_windows.append((start, start + rng.uniform(1, 2 * HOUR_SECONDS)))
+    return fixed + random_windows
+
+
+def in_window(events, since, until, ip=None):
+    return [event for event in events
+            if since <= event["timestamp"] < until and (ip is None or event["ip"] == ip)]
+
+
+@pytest.mark.parametrize("since, until", windows())
+def test_count_matches_brute_force(store_and_events, since, until):
+    store, events = store_and_events
+    selected = in_window(events, since, until)
+    assert store.count(since, until) == {
+        "total": len(selected), "blocked": sum(event["blocked"] for event in selected)
+    }
+    for ip in IPS[:3]:
+        by_ip = in_window(events, since, until, ip)
+        assert store.count(since, until, ip=ip) == {
+            "total": len(by_ip), "blocked": sum(event["blocked"] for event in by_ip)
+        }
+
+
+@pytest.mark.parametrize("since, until", windows())
+def test_top_offenders_and_distinct_ips_match_brute_force(store_and_events, since, until):
+    store, events = store_and_events
+    selected = [event for event in in_window(events, since, until) if event["ip"]]
+    expected = defaultdict(lambda: [0, 0])
+    for event in selected:
+        expected[event["ip"]][0] += 1
+        expected[event["ip"]][1] += event["blocked"]
+
+    offenders = store.top_offenders(since, until, limit=len(IPS))
+    assert {row["ip"]: [row["events"], row["blocked"]] for row in offenders} == dict(expected)
+    assert [row["events"] for row in offenders] == sorted((row["events"] for row in offenders), reverse=True)
+    assert store.distinct_ips(since, until) == len(expected)
+    assert store.distinct_ips(since, until, blocked_only=True) == sum(1 for _, b in expected.values() if b)
+
+
+@pytest.mark.parametrize("since, until", windows())
+def test_threat_distribution_matches_brute_force(store_and_events, since, until):
+    store, events = store_and_events
+    for ip in (None, IPS[0]):
+        selected = in_window(events, since, until, ip)
+        hourly = defaultdict(Counter)
+        for event in selected:
+            hourly[int(event["timestamp"] // HOUR_SECONDS)][event["threat_type"]] += 1
+
+        distribution = store.threat_distribution(since, until, ip=ip)
+        assert distribution["by_type"] == dict(Counter(event["threat_type"] for event in selected))
+        assert distribution["by_severity"] == dict(Counter(event["severity"] for event in selected))
+        assert distribution["total"] == len(selected)
+        assert distribution["blocked"] == sum(event["blocked"] for event in selected)
+        assert [sum(hour["threats"].values()) for hour in distribution["hourly"]] == \
+            [sum(counts.values()) for _, counts in sorted(hourly.items())]
+        assert [hour["threats"] for hour in distribution["hourly"]] == \
+            [dict(counts) for _, counts in sorted(hourly.items())]
+
+
+def test_summary_for_an_ip_has_no_null_sections(store_and_events):
+    store, events = store_and_events
+    summary = store.summary(BASE, BASE + 2 * HOUR_SECONDS, ip=IPS[1])
+    selected = in_window(events, BASE, BASE + 2 * HOUR_SECONDS, IPS[1])
+    assert summary["counts"]["total"] == len(selected)
+    assert summary["distribution"]["total"] == len(selected)
+    assert "top_offenders" not in summary
+
+
+@pytest.mark.parametrize("value", [
+    "nan", "inf", "-inf", "1e20", "1e300", float("nan"), float("inf"), 10 ** 400, -5, "10000-01-01T00:00:00"
+])
+def test_parse_timestamp_rejects_non_finite_and_out_of_range_values(value):
+    assert parse_timestamp(value) is None
+
+
+def test_parse_timestamp_accepts_epoch_and_iso_dates():
+    assert parse_timestamp("1700000000") == 1700000000.0
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1700000000.0
+    assert parse_timestamp(1700000000) == 1700000000.0
+
+
+@pytest.mark.parametrize("timestamp", ["nan", 1e300, 10 ** 400, "garbage"])
+def test_normalize_event_falls_back_to_now_for_a_bad_timestamp(timestamp):
+    before = time.time()
+    row = normalize_event({"timestamp": timestamp, "risk_score": float("nan"), "ip": ["198.51.100.1"]})
+    assert before <= row[1] <= time.time()
+    assert row[2] == "['198.51.100.1']"
+    assert row[9] is None
+
+
+@pytest.mark.parametrize("params", [
+    {"since": "nan"}, {"since": "inf"}, {"since": "1e20"}, {"until": "nan"}, {"period": "99999999999d"}
+])
+def test_audit_endpoint_rejects_bad_windows_with_400(params):
+    client = TestClient(server.app)
+    assert client.get("/api/security/audit", params=params).status_code == 400
+
+
+def test_intelligence_endpoint_rejects_a_period_before_the_epoch():
+    client = TestClient(server.app)
+    assert client.get("/api/security/intelligence", params={"period": "99999999999d"}).status_code == 400
+
+
+@pytest.mark.parametrize("timestamp", ["nan", 1e300, "1e300"])
+def test_report_endpoint_stores_bad_timestamps_as_now(timestamp):
+    client = TestClient(server.app)
+    response = client.post("/api/security/report", json={"timestamp": timestamp, "ip": "198.51.100.77"})
+    assert response.status_code == 200
+    events = client.get("/api/security/audit", params={"period": "1h", "ip": "198.51.100.77"}).json()
+    assert events["total_events"] >= 1
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from security_llm import FakeLLM, SingleFlightCache, threat_fingerprint
+
+
+def analysis(llm, key="threat"):
+    return lambda: llm("prompt", {"threat_type": key})
+
+
+def test_concurrent_callers_share_one_llm_call():
+    llm = FakeLLM(latency=0.05)
+    cache = SingleFlightCache(ttl=60)
+    # Same threat seen from different IPs and ids: one fingerprint
+    keys = {threat_fingerprint("SQL_INJECTION", f"/api/users/{user_id}?q=1", "HIGH", 0.91)
+            for user_id in range(20)}
+    assert len(keys) == 1
+    key = keys.pop()
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_compute(key, analysis(llm)) for _ in range(20)))
+        cached = await cache.get_or_compute(key, analysis(llm))
+        return results, cached
+
+    results, cached = asyncio.run(scenario())
+    assert llm.calls == 1
+    assert all(result is results[0] for result in results) and cached is results[0]
+    stats = cache.get_stats()
+    assert stats["misses"] == 1 and stats["coalesced"] == 19 and stats["hits"] == 1
+    assert stats["inflight"] == 0 and stats["size"] == 1
+
+
+def test_entries_expire_after_ttl():
+    llm = FakeLLM(latency=0)
+    cache = SingleFlightCache(ttl=0.05)
+
+    async def scenario():
+        await cache.get_or_compute("key", analysis(llm))
+        await cache.get_or_compute("key", analysis(llm))
+        assert llm.calls == 1
+        await asyncio.sleep(0.08)
+        assert cache.get("key") is None
+        await cache.get_or_compute("key", analysis(llm))
+
+    asyncio.run(scenario())
+    assert llm.calls == 2
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    llm = FakeLLM(latency=0)
+    cache = SingleFlightCache(ttl=60, maxsize=2)
+
+    async def scenario():
+        await cache.get_or_compute("a", analysis(llm, "a"))
+        await cache.get_or_compute("b", analysis(llm, "b"))
+        await cache.get_or_compute("a", analysis(llm, "a"))  # "a" becomes the most recent
+        await cache.get_or_compute("c", analysis(llm, "c"))
+
+    asyncio.run(scenario())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats["evictions"] == 1 and llm.calls == 3
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream down")
+
+    cache = SingleFlightCache(ttl=60)
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_compute("key", failing) for _ in range(5)),
+                                       return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert cache.get("key") is None
+        # The next caller retries instead of getting a cached failure
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("key", failing)
+
+    asyncio.run(scenario())
+    assert calls == 2
+    assert cache.stats["errors"] == 2 and cache.get_stats()["size"] == 0
+
+
+def test_cancelling_one_caller_does_not_cancel_the_shared_computation():
+    llm = FakeLLM(latency=0.05)
+    cache = SingleFlightCache(ttl=60)
+
+    async def scenario():
+        first = asyncio.create_task(cache.get_or_compute("key", analysis(llm)))
+        second = asyncio.create_task(cache.get_or_compute("key", analysis(llm)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["threat_analysis"] and llm.calls == 1
+    assert cache.get("key") is result  # Completed and cached despite the cancellation
@@ -0,0 +1,161 @@
+import asyncio
+
+import httpx
+import pytest
+
+from security_llm import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, LLMGateway, LLMProvider, LLMUnavailable, create_stub_llm_app
+)
+
+
+def make_gateway(app, max_concurrency=8, timeout=5.0, queue_timeout=5.0, **kwargs):
+    provider = LLMProvider(name="stub", base_url="http://stub/v1", model="stub-model",
+                           max_concurrency=max_concurrency, timeout=timeout, queue_timeout=queue_timeout)
+    return LLMGateway([provider], transport=httpx.ASGITransport(app=app), **kwargs)
+
+
+def tracking(app, seen):
+    """ASGI wrapper recording how many requests the server handles at once"""
+    async def wrapped(scope, receive, send):
+        seen["now"] += 1
+        seen["max"] = max(seen["max"], seen["now"])
+        try:
+            await app(scope, receive, send)
+        finally:
+            seen["now"] -= 1
+    return wrapped
+
+
+def ask(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def test_semaphore_bounds_concurrent_calls():
+    app = create_stub_llm_app(latency=0.05)
+    seen = {"now": 0, "max": 0}
+    gateway = make_gateway(tracking(app, seen), max_concurrency=2)
+
+    async def scenario():
+        results = await asyncio.gather(*(gateway.complete("stub", ask(f"prompt {index}")) for index in range(6)))
+        await gateway.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert [result["content"] for result in results] == [f"stub:stub-model:prompt {index}" for index in range(6)]
+    assert seen["max"] == 2 and app.state.calls == 6
+
+
+def test_saturated_provider_rejects_after_queue_timeout():
+    app = create_stub_llm_app(latency=0.3)
+    gateway = make_gateway(app, max_concurrency=2, queue_timeout=0.05)
+
+    async def scenario():
+        results = await asyncio.gather(*(gateway.complete("stub", ask(f"prompt {index}")) for index in range(4)),
+                                       return_exceptions=True)
+        await gateway.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    rejected = [result for result in results if isinstance(result, LLMUnavailable)]
+    assert len(rejected) == 2 and all(error.reason == "saturé" for error in rejected)
+    stats = gateway.get_stats()["providers"]["stub"]
+    assert stats["rejected_saturated"] == 2
+    assert stats["circuit"] == CIRCUIT_CLOSED  # Local saturation is not a provider failure
+    assert app.state.calls == 2
+
+
+def test_identical_concurrent_prompts_are_deduplicated():
+    app = create_stub_llm_app(latency=0.05)
+    gateway = make_gateway(app)
+
+    async def scenario():
+        results = await asyncio.gather(*(gateway.complete("stub", ask("same prompt")) for _ in range(10)))
+        await gateway.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert app.state.calls == 1
+    assert all(result is results[0] for result in results)
+    assert gateway.get_stats()["dedupe"]["coalesced"] == 9
+
+
+def test_breaker_opens_then_half_opens_after_reset_timeout():
+    app = create_stub_llm_app(latency=0, failure_rate=1.0)
+    gateway = make_gateway(app, failure_threshold=2, reset_timeout=0.1)
+    breaker = gateway.breakers["stub"]
+
+    async def scenario():
+        for index in range(2):
+            with pytest.raises(LLMUnavailable, match="HTTP 503"):
+                await gateway.complete("stub", ask(f"failing {index}"))
+        assert breaker.state == CIRCUIT_OPEN
+
+        # Open: rejected without reaching the provider
+        with pytest.raises(LLMUnavailable) as rejected:
+            await gateway.complete("stub", ask("while open"))
+        assert rejected.value.reason == "disjoncteur ouvert"
+        assert app.state.calls == 2
+
+        # After reset_timeout one trial call goes through; its failure reopens the circuit
+        await asyncio.sleep(0.12)
+        with pytest.raises(LLMUnavailable, match="HTTP 503"):
+            await gateway.complete("stub", ask("trial"))
+        assert app.state.calls == 3
+        assert breaker.state == CIRCUIT_OPEN and breaker.trips == 2
+
+        # Half-open: a single trial in flight, other calls still rejected; its success closes the circuit
+        await asyncio.sleep(0.12)
+        app.state.failure_rate, app.state.latency = 0.0, 0.05
+        trial = asyncio.create_task(gateway.complete("stub", ask("recovered")))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        with pytest.raises(LLMUnavailable, match="disjoncteur ouvert"):
+            await gateway.complete("stub", ask("concurrent"))
+        result = await trial
+        await gateway.aclose()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["content"] == "stub:stub-model:recovered"
+    assert breaker.state == CIRCUIT_CLOSED and breaker.failures == 0
+    assert gateway.get_stats()["providers"]["stub"]["rejected_open"] == 2
+
+
+def test_slow_provider_times_out_and_counts_as_failure():
+    app = create_stub_llm_app(latency=0.5)
+    gateway = make_gateway(app, timeout=0.05)
+
+    async def scenario():
+        with pytest.raises(LLMUnavailable) as timed_out:
+            await gateway.complete("stub", ask("slow"))
+        await gateway.aclose()
+        return timed_out.value
+
+    error = asyncio.run(scenario())
+    assert error.reason == "délai dépassé"
+    stats = gateway.get_stats()["providers"]["stub"]
+    assert stats["timeouts"] == 1 and stats["errors"] == 1
+    assert gateway.breakers["stub"].failures == 1
+
+
+def test_abandoned_stream_releases_its_slot():
+    app = create_stub_llm_app(latency=0, chunks=8)
+    gateway = make_gateway(app, max_concurrency=1, queue_timeout=0.5)
+
+    async def scenario():
+        stream = gateway.stream("stub", ask("a long enough prompt to stream in chunks"))
+        first = await stream.__anext__()
+        assert gateway._semaphores["stub"].locked()
+        await stream.aclose()  # Client went away mid-stream
+        assert not gateway._semaphores["stub"].locked()
+
+        # The single slot is usable again
+        chunks = [chunk async for chunk in gateway.stream("stub", ask("next"))]
+        await gateway.aclose()
+        return first, chunks
+
+    first, chunks = asyncio.run(scenario())
+    assert first and "".join(chunks) == "stub:stub-model:next"
+    stats = gateway.get_stats()["providers"]["stub"]
+    assert stats["streams"] == 2 and stats["errors"] == 0 and stats["rejected_saturated"] == 0
+    assert gateway.breakers["stub"].state == CIRCUIT_CLOSED
@@ -0,0 +1,56 @@
+import asyncio
+import inspect
+import os
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from security_metrics import BlockingCallWatchdog, MetricsRegistry, RequestMetricsMiddleware
+from security_request import route_template
+
+SLEEP_LINE = {}
+
+
+def make_app(watchdog):
+    app = FastAPI()
+
+    @app.get("/api/slow/{item_id}")
+    async def slow_handler(item_id: str):
+        SLEEP_LINE["lineno"] = inspect.currentframe().f_lineno + 1
+        time.sleep(0.3)  # Blocks the event loop
+        return {"item_id": item_id}
+
+    return RequestMetricsMiddleware(app, MetricsRegistry(), route_template, watchdog=watchdog)
+
+
+def test_watchdog_reports_route_and_site_of_a_blocking_call():
+    watchdog = BlockingCallWatchdog(threshold=0.05, route_of=route_template)
+
+    async def scenario():
+        assert watchdog.ensure_started()
+        # Started at app startup in the server: let the probe arm before the request
+        await asyncio.sleep(watchdog.interval * 2)
+        transport = httpx.ASGITransport(app=make_app(watchdog))
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.get("/api/slow/42")
+            # Let the probe wake up and complete the report's duration
+            await asyncio.sleep(watchdog.interval * 4)
+        watchdog.stop()
+        return response
+
+    try:
+        response = asyncio.run(scenario())
+    finally:
+        watchdog.stop()
+
+    assert response.status_code == 200
+    assert len(watchdog.reports) == 1
+    report = watchdog.reports[0]
+    assert report["route"] == "/api/slow/{item_id}"
+    assert report["site"] == f"{os.path.basename(__file__)}:{SLEEP_LINE['lineno']} in slow_handler"
+    assert any("time.sleep(0.3)" in frame for frame in report["stack"])
+    assert report["blocked_ms"] >= 200
+    stats = watchdog.get_stats()
+    assert stats["sites"] == [{"route": "/api/slow/{item_id}", "site": report["site"], "count": 1}]
+    assert stats["stalls"]["count"] == 1
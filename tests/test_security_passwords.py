@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+
+import security_passwords
+from security_passwords import PasswordHashingOverloaded, PasswordHashPool
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Real bcrypt that only starts once the gate is opened"""
+    opened = threading.Event()
+    started = threading.Semaphore(0)
+    real_hash = security_passwords.hash_password_sync
+
+    def gated_hash(password, rounds):
+        started.release()
+        opened.wait(timeout=10)
+        return real_hash(password, rounds)
+
+    monkeypatch.setattr(security_passwords, "hash_password_sync", gated_hash)
+    yield opened, started
+    opened.set()
+
+
+async def wait_started(started, count=1):
+    for _ in range(count):
+        assert await asyncio.to_thread(started.acquire, True, 5)
+
+
+def test_hash_and_verify_roundtrip():
+    async def scenario():
+        pool = PasswordHashPool(rounds=4, workers=2)
+        hashed = await pool.hash_password("s3cret")
+        assert await pool.verify_password("s3cret", hashed)
+        assert not await pool.verify_password("wrong", hashed)
+        return pool.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hashed"] == 1 and stats["verified"] == 2 and stats["completed"] == 3
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+def test_full_queue_is_shed_immediately(gate):
+    opened, started = gate
+
+    async def scenario():
+        pool = PasswordHashPool(rounds=4, workers=1, max_queue=2, queue_timeout=5)
+        running = asyncio.create_task(pool.hash_password("a"))
+        await wait_started(started)
+        queued = [asyncio.create_task(pool.hash_password(f"q{index}")) for index in range(2)]
+        await asyncio.sleep(0)
+        assert pool.waiting == 2
+
+        with pytest.raises(PasswordHashingOverloaded) as overloaded:
+            await pool.hash_password("shed")
+        assert overloaded.value.reason == "file pleine"
+        assert overloaded.value.retry_after > 0
+
+        opened.set()
+        await asyncio.gather(running, *queued)
+        return pool.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_timeout"] == 0
+    assert stats["hashed"] == 3 and stats["max_waiting"] == 2
+
+
+def test_queue_wait_times_out_with_retry_after(gate):
+    opened, started = gate
+
+    async def scenario():
+        pool = PasswordHashPool(rounds=4, workers=1, max_queue=4, queue_timeout=0.05)
+        running = asyncio.create_task(pool.hash_password("a"))
+        await wait_started(started)
+
+        with pytest.raises(PasswordHashingOverloaded) as overloaded:
+            await pool.hash_password("late")
+        assert overloaded.value.reason == "attente expirée"
+        assert overloaded.value.retry_after > 0
+        assert pool.waiting == 0
+
+        opened.set()
+        await running
+        # The slot is available again after the timeout
+        await pool.hash_password("next")
+        return pool.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_timeout"] == 1 and stats["rejected_queue_full"] == 0
+    assert stats["hashed"] == 2 and stats["in_flight"] == 0
+
+
+def test_cancelled_caller_keeps_the_slot_until_bcrypt_finishes(gate):
+    opened, started = gate
+
+    async def scenario():
+        pool = PasswordHashPool(rounds=4, workers=1, max_queue=4, queue_timeout=5)
+        caller = asyncio.create_task(pool.hash_password("a"))
+        await wait_started(started)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+
+        # bcrypt is still running in its thread: the slot stays taken
+        assert pool.in_flight == 1 and pool._slots.locked()
+        waiter = asyncio.create_task(pool.hash_password("b"))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and pool.waiting == 1
+
+        opened.set()
+        await asyncio.wait_for(waiter, timeout=5)
+        return pool.get_stats()
+
+    stats = asyncio.run(scenario())
+    # The cancelled hash ran to completion before giving its slot back
+    assert stats["completed"] == 2 and stats["hashed"] == 1
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
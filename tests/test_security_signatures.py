@@ -0,0 +1,88 @@
+import re
+
+import pytest
+
+from security_module import SECURITY_CONFIG
+from security_signatures import SignatureEngine
+
+PATTERNS = SECURITY_CONFIG["suspicious_patterns"]
+
+ATTACKS = [
+    "/products?id=1 UNION  SELECT password FROM users",
+    "/search?q=' OR 'a'='a",
+    "/search?q=x' AnD '1'='1",
+    "id=1=1;DROP TABLE orders; delete from carts",
+    "name=x; Insert Into logs values(1); update users set role=admin",
+    "<ScRiPt src=x>alert(document.cookie)</script>",
+    "<img src=x onerror =confirm(1)>",
+    "javascript:eval (window.location)",
+    "../../../../etc/passwd",
+    "..\\..\\windows\\cmd.exe",
+    "/proc/self/environ /var/log/nginx",
+    "powershell -enc SQBFAFgA; certutil -decode a b",
+    "; bash -i; sh -c id; system('ls'); exec(cmd)",
+    "php://passthru shell_exec base64_decode phpinfo",
+    "/wp-admin/admin.php?config.php",
+    "/.env /.git/HEAD /.svn/entries",
+    "/backup/database.sql /logs/tmp/temp",
+    "(|(uid=*)) )|) *)(",
+    '{"user": { $ne: null}, "pw": {$gt: ""}, "q": {  $regex: ".*"}, "w": {$where: 1}, "l": {$lt: 1}}',
+    '<?xml version="1.0"?><!DOCTYPE x [<!ENTITY e SYSTEM "file:///etc/passwd">]>',
+    "<!--#exec cmd=\"ls\"--><!--#include virtual=\"/x\"-->",
+    "url=http://evil ftp://x https://y",
+    "A" * 150,
+    "offset=0xDEADbeef",
+    "rundll32 regsvr32 wscript cscript mshta bitsadmin",
+    "User-Agent: sqlmap/1.7 nmap nikto dirb gobuster",
+    "prompt (1) and 1 = 0",
+]
+
+BENIGN = [
+    "",
+    "/api/products",
+    "/api/products/argan-oil?page=2&sort=price",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36",
+    "Where is my order? I selected the blue one.",
+    "The update was great, thanks",
+    "crème brûlée à la française",
+    "a" * 99,
+    "0x",
+]
+
+# Non-ASCII texts: IGNORECASE matches that str.lower() would miss
+UNICODE = [
+    "ſelect * ſrom users",  # long s matches 's' under IGNORECASE
+    "/Kelvin/../ logs",  # Kelvin sign matches 'k'
+    "ÉVAL (1) <SCRIPT>x</SCRIPT> bAsH",
+    "İnsert into t",
+]
+
+
+def legacy_count(text):
+    """Per-regex loop the engine replaced"""
+    count = 0
+    for pattern in PATTERNS:
+        if re.search(pattern, text, re.IGNORECASE):
+            count += 1
+    return count
+
+
+@pytest.mark.parametrize("text", ATTACKS + BENIGN + UNICODE)
+def test_count_matches_the_legacy_regex_loop(text):
+    engine = SignatureEngine(PATTERNS)
+    assert engine.count(text) == legacy_count(text)
+    # The cached result agrees too
+    assert engine.count(text) == legacy_count(text)
+
+
+def test_scan_reports_the_same_rules_as_the_legacy_loop():
+    engine = SignatureEngine(PATTERNS)
+    for text in ATTACKS + BENIGN + UNICODE + [text.upper() for text in ATTACKS]:
+        expected = tuple(engine.rule_ids[index] for index, pattern in enumerate(PATTERNS)
+                         if re.search(pattern, text, re.IGNORECASE))
+        assert engine.scan(text) == expected, text
+
+
+def test_corpus_exercises_attacks_and_benign_text():
+    assert all(legacy_count(text) > 0 for text in ATTACKS)
+    assert legacy_count("/api/products") == 0
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import math
+import time
+
+from security_state import (
+    BLOCKED_HASH, NAMESPACE_FAILED_AUTH, NAMESPACE_HONEYPOT_HITS, BlockExpiryScheduler, InMemoryKVClient,
+    InProcessStateBackend, NetworkKVStateBackend, SharedMemoryStateBackend
+)
+
+
+def test_overlay_writes_visible_before_flush(tmp_path):
+    async def scenario():
+        backend = SharedMemoryStateBackend(path=str(tmp_path / "state"), capacity=64, flush_interval=3600)
+        other = SharedMemoryStateBackend(path=str(tmp_path / "state"), capacity=64, flush_interval=3600)
+        backend.block_ip("10.0.0.1")
+        assert backend.increment(NAMESPACE_HONEYPOT_HITS, "10.0.0.1") == 1
+        assert backend.increment(NAMESPACE_HONEYPOT_HITS, "10.0.0.1", 2) == 3
+
+        # Visible locally, not yet in the shared table
+        assert backend.is_blocked("10.0.0.1")
+        assert not other.is_blocked("10.0.0.1")
+        assert other.get_count(NAMESPACE_HONEYPOT_HITS, "10.0.0.1") == 0
+        assert backend.get_stats()["pending_ops"] == 3
+
+        await backend.flush()
+        assert backend.get_stats()["pending_ops"] == 0
+        assert backend.is_blocked("10.0.0.1")
+        assert backend.get_count(NAMESPACE_HONEYPOT_HITS, "10.0.0.1") == 3
+        await backend.close()
+        await other.close()
+
+    asyncio.run(scenario())
+
+
+def test_inflight_batch_stays_visible_during_sync(tmp_path):
+    async def scenario():
+        backend = SharedMemoryStateBackend(path=str(tmp_path / "state"), capacity=64, flush_interval=3600)
+        seen = {}
+        original_sync = backend._sync
+
+        async def observing_sync(batch):
+            # The batch has left the local overlay but is not written yet
+            seen["blocked"] = backend.is_blocked("10.0.0.2")
+            seen["count"] = backend.get_count(NAMESPACE_FAILED_AUTH, "alice")
+            seen["local"] = dict(backend._local_blocks)
+            await original_sync(batch)
+
+        backend._sync = observing_sync
+        backend.block_ip("10.0.0.2")
+        backend.increment(NAMESPACE_FAILED_AUTH, "alice", 4)
+        await backend.flush()
+        assert seen == {"blocked": True, "count": 4, "local": {}}
+        assert backend._inflight_blocks == {} and backend._inflight_counts == {}
+        assert backend.get_count(NAMESPACE_FAILED_AUTH, "alice") == 4
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_shared_memory_backend_is_shared_across_instances(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state")
+        first = SharedMemoryStateBackend(path=path, capacity=128, flush_interval=3600)
+        second = SharedMemoryStateBackend(path=path, capacity=128, flush_interval=3600)
+
+        first.block_ip("192.0.2.1")
+        first.block_ip("192.0.2.2", until=time.time() + 60)
+        first.increment(NAMESPACE_HONEYPOT_HITS, "192.0.2.1", 2)
+        second.increment(NAMESPACE_HONEYPOT_HITS, "192.0.2.1", 5)
+        await first.flush()
+        await second.flush()
+
+        assert second.is_blocked("192.0.2.1")
+        assert second.is_blocked("192.0.2.2")
+        assert first.get_count(NAMESPACE_HONEYPOT_HITS, "192.0.2.1") == 7
+        assert second.get_count(NAMESPACE_HONEYPOT_HITS, "192.0.2.1") == 7
+        assert second.blocked_count() == 2
+        assert second.counter_size(NAMESPACE_HONEYPOT_HITS) == 1
+
+        second.unblock_ip("192.0.2.1")
+        await second.flush()
+        assert not first.is_blocked("192.0.2.1")
+        assert first.blocked_count() == 1
+        await first.close()
+        await second.close()
+
+    asyncio.run(scenario())
+
+
+def test_shared_memory_ttl_counters_and_expired_slot_reuse(tmp_path):
+    async def scenario():
+        backend = SharedMemoryStateBackend(path=str(tmp_path / "state"), capacity=8, flush_interval=3600)
+        backend.MAX_PROBES = 8
+        for index in range(8):
+            backend.increment(NAMESPACE_FAILED_AUTH, f"user-{index}", 1, ttl=0.05)
+        await backend.flush()
+        assert backend.counter_size(NAMESPACE_FAILED_AUTH) == 8
+        assert backend.get_count(NAMESPACE_FAILED_AUTH, "user-0") == 1
+
+        await asyncio.sleep(0.1)
+        # Expired counters read as zero and restart from scratch
+        assert backend.get_count(NAMESPACE_FAILED_AUTH, "user-0") == 0
+        assert backend.counter_size(NAMESPACE_FAILED_AUTH) == 0
+        backend.increment(NAMESPACE_FAILED_AUTH, "user-0", 3, ttl=60)
+        await backend.flush()
+        assert backend.get_count(NAMESPACE_FAILED_AUTH, "user-0") == 3
+
+        # The table is full of expired slots: new keys reuse them instead of being dropped
+        for index in range(7):
+            backend.increment(NAMESPACE_HONEYPOT_HITS, f"10.1.0.{index}", 1)
+        await backend.flush()
+        assert backend.counter_size(NAMESPACE_HONEYPOT_HITS) == 7
+        assert all(backend.get_count(NAMESPACE_HONEYPOT_HITS, f"10.1.0.{index}") == 1 for index in range(7))
+        assert backend.get_count(NAMESPACE_FAILED_AUTH, "user-0") == 3
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_network_backend_against_in_memory_client():
+    async def scenario():
+        client = InMemoryKVClient()
+        first = NetworkKVStateBackend(client, flush_interval=3600, refresh_interval=0)
+        second = NetworkKVStateBackend(client, flush_interval=3600, refresh_interval=0)
+
+        first.block_ip("198.51.100.1")
+        first.block_ip("198.51.100.2", until=time.time() + 0.05)
+        assert first.increment(NAMESPACE_FAILED_AUTH, "bob", 1, ttl=60) == 1
+        assert first.is_blocked("198.51.100.1")
+        await first.flush()
+        assert client.batches == 1
+
+        # The other instance sees shared state once its replica is refreshed
+        assert not second.is_blocked("198.51.100.1")
+        second.increment(NAMESPACE_FAILED_AUTH, "bob", 2, ttl=60)
+        await second.flush()
+        assert second.is_blocked("198.51.100.1")
+        assert second.get_count(NAMESPACE_FAILED_AUTH, "bob") == 3
+        assert client.hashes[BLOCKED_HASH]["198.51.100.1"] == 0.0  # No expiry
+        assert math.isinf(second._blocked_replica["198.51.100.1"])
+
+        await asyncio.sleep(0.1)
+        await second.flush()
+        assert not second.is_blocked("198.51.100.2")
+        assert second.blocked_count() == 1
+
+        first.unblock_ip("198.51.100.1")
+        await first.flush()
+        await second.flush()
+        assert not second.is_blocked("198.51.100.1")
+        await first.close()
+        await second.close()
+
+    asyncio.run(scenario())
+
+
+
+def test_network_backend_refreshes_blocklist_on_its_own_interval():
+    async def scenario():
+        client = InMemoryKVClient()
+        writer = NetworkKVStateBackend(client, flush_interval=3600, refresh_interval=0)
+        reader = NetworkKVStateBackend(client, flush_interval=3600, refresh_interval=3600)
+
+        await reader.flush()
+        assert client.reads == 1
+        writer.block_ip("198.51.100.7")
+        reader.block_ip("198.51.100.8")
+        await writer.flush()
+        for _ in range(5):
+            await reader.flush()
+        # Write batches do not re-read the blocklist before the interval elapses
+        assert client.reads == 2  # reader's first flush + writer's flush
+        assert reader.is_blocked("198.51.100.8")  # Own ban applied to the replica
+        assert not reader.is_blocked("198.51.100.7")
+
+        await reader.refresh()
+        assert reader.is_blocked("198.51.100.7")
+        reader.unblock_ip("198.51.100.8")
+        await reader.flush()
+        assert not reader.is_blocked("198.51.100.8")
+        assert "198.51.100.8" not in client.hashes[BLOCKED_HASH]
+        await writer.close()
+        await reader.close()
+
+    asyncio.run(scenario())
+
+def scheduler(path=None, **options):
+    return BlockExpiryScheduler(InProcessStateBackend(), persist_path=path, **options)
+
+
+def test_block_scheduler_expires_bans_in_deadline_order():
+    blocks = scheduler()
+    now = time.time()
+    blocks.ban("10.1.0.1", 10, "honeypot_hit", now=now)
+    blocks.ban("10.1.0.2", 20, "geo_blocked", now=now)
+    # A shorter re-ban never shortens the current one; an extension does lengthen it
+    assert blocks.ban("10.1.0.1", 5, now=now) == now + 10
+    assert blocks.extend("10.1.0.2", 30, now=now) == now + 50
+
+    assert blocks.expire_due(now + 11) == 1
+    assert not blocks.state.is_blocked("10.1.0.1", now + 11)
+    assert blocks.state.is_blocked("10.1.0.2", now + 11)
+    assert blocks.expire_due(now + 21) == 0  # The stale heap entry is skipped
+    assert blocks.expire_due(now + 51) == 1
+    assert blocks.deadlines == {}
+
+
+def test_block_scheduler_persists_and_reloads_active_bans(tmp_path):
+    path = str(tmp_path / "blocks.json")
+
+    async def scenario():
+        first = scheduler(path, persist_interval=3600)
+        first.ban("10.1.1.1", 3600, "rate_limit_exceeded")
+        first.ban("10.1.1.2", 3600, "honeypot_hit")
+        first.unban("10.1.1.2")
+        await first.persist()
+
+        restarted = scheduler(path, persist_interval=3600)
+        assert set(restarted.deadlines) == {"10.1.1.1"}
+        assert restarted.deadlines["10.1.1.1"][1] == "rate_limit_exceeded"
+        assert restarted.state.is_blocked("10.1.1.1")
+
+    asyncio.run(scenario())
+
+
+def test_stale_worker_does_not_restore_a_ban_lifted_elsewhere(tmp_path):
+    path = str(tmp_path / "blocks.json")
+
+    async def scenario():
+        first = scheduler(path, persist_interval=3600)
+        first.ban("10.1.2.1", 3600, "honeypot_hit")
+        await first.persist()
+        second = scheduler(path, persist_interval=3600)  # Loads the ban at startup
+        assert second.state.is_blocked("10.1.2.1")
+
+        first.unban("10.1.2.1")
+        await first.persist()
+        # The second worker writes before re-reading: the merge drops the lifted ban
+        second.ban("10.1.2.2", 3600, "geo_blocked")
+        await second.persist()
+        assert "10.1.2.1" not in json.load(open(path))
+        assert "10.1.2.1" not in second.deadlines
+        assert not second.state.is_blocked("10.1.2.1")
+        assert second.get_stats()["unbanned_elsewhere"] == 1
+
+        # Nor does a restart bring it back
+        assert set(scheduler(path, persist_interval=3600).deadlines) == {"10.1.2.2"}
+
+    asyncio.run(scenario())
+
+
+def test_ban_set_again_after_a_remote_unban_is_kept(tmp_path):
+    path = str(tmp_path / "blocks.json")
+
+    async def scenario():
+        first = scheduler(path, persist_interval=3600)
+        first.ban("10.1.3.1", 60, "honeypot_hit")
+        await first.persist()
+        second = scheduler(path, persist_interval=3600)
+
+        first.unban("10.1.3.1")
+        await first.persist()
+        second.ban("10.1.3.1", 3600, "rate_limit_exceeded")  # Fresh offence on this worker
+        await second.persist()
+        assert "10.1.3.1" in json.load(open(path))
+        assert second.state.is_blocked("10.1.3.1")
+
+        await first.refresh()
+        assert first.state.is_blocked("10.1.3.1")
+
+    asyncio.run(scenario())
+
+
+def test_background_loop_applies_remote_bans_and_unbans(tmp_path):
+    path = str(tmp_path / "blocks.json")
+
+    async def wait_for(condition):
+        for _ in range(200):
+            if condition():
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def scenario():
+        first = scheduler(path, persist_interval=0.02)
+        second = scheduler(path, persist_interval=0.02)
+        second.ensure_started()
+
+        first.ban("10.1.4.1", 3600, "honeypot_hit")
+        assert await wait_for(lambda: second.state.is_blocked("10.1.4.1"))
+        first.unban("10.1.4.1")
+        assert await wait_for(lambda: not second.state.is_blocked("10.1.4.1"))
+        assert "10.1.4.1" not in json.load(open(path))
+
+        for blocks in (first, second):
+            blocks._task.cancel()
+            blocks._persist_task.cancel()
+
+    asyncio.run(scenario())
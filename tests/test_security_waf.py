@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import security_module
+from security_module import EnhancedWAF, security_middleware, waf_instance
+
+
+def make_request(path: str, ip: str, user_agent: str = "Mozilla/5.0", body: bytes = b"") -> Request:
+    headers = [(b"user-agent", user_agent.encode()), (b"x-forwarded-for", ip.encode())]
+    if body:
+        headers.append((b"content-length", str(len(body)).encode()))
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({
+        "type": "http", "method": "POST" if body else "GET", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "headers": headers,
+        "client": (ip, 40000), "server": ("testserver", 80), "scheme": "http", "root_path": ""
+    }, receive)
+
+
+def test_middleware_runs_the_enhanced_waf_pipeline():
+    assert isinstance(waf_instance, EnhancedWAF)
+    runs = waf_instance.get_pipeline_stats()["runs"]
+    seen = waf_instance.ml_detector.training_data.seen
+
+    result = asyncio.run(security_middleware(make_request("/api/products", "203.0.113.20")))
+
+    assert result["allowed"] and result["phase"] == "7_SENTINEL_CORE"
+    stats = waf_instance.get_pipeline_stats()
+    assert stats["runs"] == runs + 1
+    assert set(stats["stages"]) == {"ml", "behavioral", "evasion", "zero_day", "prediction"}
+    # Features extracted for inference also feed the training ring buffer
+    assert waf_instance.ml_detector.training_data.seen == seen + 1
+    # The request was counted before feature extraction
+    assert waf_instance.rate_limiter.hourly_count("203.0.113.20") == 1
+
+
+def test_middleware_blocks_honeypot_with_a_temporary_ban():
+    ip = "203.0.113.21"
+    with pytest.raises(HTTPException) as blocked:
+        asyncio.run(security_middleware(make_request("/admin/.env", ip)))
+
+    assert blocked.value.status_code == 403
+    assert blocked.value.detail["risk_score"] == 1.0
+    assert security_module.waf_state.is_blocked(ip)
+    assert ip in security_module.block_scheduler.deadlines
+    assert security_module.waf_decisions.values[("block", "honeypot_hit")] >= 1
+
+
+def test_middleware_rate_limits_a_burst():
+    ip = "203.0.113.22"
+    limit = security_module.SECURITY_CONFIG["max_requests_per_minute"]
+
+    async def burst():
+        for _ in range(limit):
+            assert (await security_middleware(make_request("/api/products", ip)))["allowed"]
+        await security_middleware(make_request("/api/products", ip))
+
+    with pytest.raises(HTTPException) as blocked:
+        asyncio.run(burst())
+
+    assert blocked.value.detail["reasons"] == ["rate_limit_exceeded"]
+    assert security_module.waf_state.is_blocked(ip)
+    assert security_module.waf_decisions.values[("block", "rate_limit_exceeded")] >= 1
+
+
+def test_middleware_blocks_sql_injection_in_the_body():
+    body = b'{"query": "x\' or \'a\'=\'a\' union select password from users"}'
+    request = make_request("/api/products/search", "203.0.113.23", body=body)
+
+    with pytest.raises(HTTPException) as blocked:
+        asyncio.run(security_middleware(request))
+
+    assert blocked.value.detail["reasons"] == ["suspicious_content"]
+    assert security_module.waf_state.is_blocked("203.0.113.23")
+    # The body stays readable for the route handler
+    assert asyncio.run(request.body()) == body
+
+
+def test_middleware_allows_a_benign_body():
+    body = b'{"query": "organic argan oil", "category": "cosmetics"}'
+    result = asyncio.run(security_middleware(make_request("/api/products/search", "203.0.113.24", body=body)))
+
+    assert result["allowed"]